@@ -1,3 +1,74 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 
-# Register your models here.
+from apps.jobs.queue import enqueue
+
+from .forms import ImportFileForm
+from .imports import guess_format
+from .models import Doctor, Patient
+from .uploads import stage_upload
+
+
+class BulkImportAdmin(admin.ModelAdmin):
+    """
+    Adds an "Import" page to the changelist. The file is staged and the
+    import runs in the job worker (accounts.import_people).
+    """
+    change_list_template = "admin/accounts/import_change_list.html"
+    import_kind = None
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path(
+                "import/",
+                self.admin_site.admin_view(self.import_view),
+                name="%s_%s_import" % info,
+            ),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect("admin:index")
+
+        form = ImportFileForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            upload = form.cleaned_data["file"]
+            fmt = form.cleaned_data["format"] or guess_format(upload.name)
+            enqueue("accounts.import_people", {
+                "kind": self.import_kind,
+                "path": stage_upload(upload, "imports"),
+                "fmt": fmt,
+            })
+            self.message_user(
+                request,
+                f"{upload.name} queued for import. Progress and errors are in the job log.",
+                messages.SUCCESS,
+            )
+            return redirect("admin:%s_%s_changelist" % (
+                self.model._meta.app_label, self.model._meta.model_name))
+
+        return TemplateResponse(request, "admin/accounts/import_form.html", {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "form": form,
+            "title": f"Import {self.model._meta.verbose_name_plural}",
+        })
+
+
+@admin.register(Doctor)
+class DoctorAdmin(BulkImportAdmin):
+    import_kind = "doctor"
+    list_display = ('id', 'full_name', 'specialization', 'city', 'created_at')
+    list_filter = ('specialization', 'city')
+    search_fields = ('full_name', 'user__email')
+
+
+@admin.register(Patient)
+class PatientAdmin(BulkImportAdmin):
+    import_kind = "patient"
+    list_display = ('id', 'full_name', 'gender', 'city')
+    list_filter = ('gender', 'city')
+    search_fields = ('full_name', 'user__email')
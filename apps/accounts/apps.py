@@ -3,3 +3,10 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.accounts'
+
+    def ready(self):
+        from django.contrib.auth.signals import user_logged_in
+
+        from .identity import cache_identity_on_login
+
+        user_logged_in.connect(cache_identity_on_login)
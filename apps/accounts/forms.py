@@ -0,0 +1,11 @@
+from django import forms
+
+from .imports import FORMATS
+
+
+class ImportFileForm(forms.Form):
+    file = forms.FileField(help_text="CSV, NDJSON or JSON with the registration fields")
+    format = forms.ChoiceField(
+        choices=[("", "From file extension")] + [(fmt, fmt.upper()) for fmt in FORMATS],
+        required=False,
+    )
@@ -0,0 +1,143 @@
+from functools import wraps
+
+from django.contrib.auth.models import User
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import ObjectDoesNotExist
+from django.shortcuts import redirect
+from django.urls import reverse
+
+
+# =====================================================
+# ROLE / IDENTITY RESOLUTION
+# =====================================================
+# The role and the Doctor/Patient ids of the logged-in user, loaded in one
+# query the first time a protected view needs them and then kept in the
+# session, so later requests need no profile/doctor/patient lookups.
+SESSION_KEY = "_identity"
+
+
+class Identity:
+    __slots__ = ("user_id", "role", "doctor_id", "patient_id")
+
+    def __init__(self, user_id, role=None, doctor_id=None, patient_id=None):
+        self.user_id = user_id
+        self.role = role
+        self.doctor_id = doctor_id
+        self.patient_id = patient_id
+
+    @property
+    def is_doctor(self):
+        return self.role == "doctor" and self.doctor_id is not None
+
+    @property
+    def is_patient(self):
+        return self.role == "patient" and self.patient_id is not None
+
+    @property
+    def complete(self):
+        # Worth caching only once the role row exists; right after
+        # registration it may not be there yet.
+        return self.is_doctor or self.is_patient
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _related_id(user, name):
+    try:
+        return getattr(user, name).id
+    except ObjectDoesNotExist:
+        return None
+
+
+def load_identity(user_id):
+    """
+    One query: the user joined with profile, doctor and patient.
+    """
+    user = User.objects.select_related("profile", "doctor", "patient").get(pk=user_id)
+
+    try:
+        role = user.profile.role
+    except ObjectDoesNotExist:
+        role = None
+
+    return Identity(
+        user_id=user.pk,
+        role=role,
+        doctor_id=_related_id(user, "doctor"),
+        patient_id=_related_id(user, "patient"),
+    )
+
+
+def get_identity(request):
+    """
+    Identity of request.user, or None for anonymous users. Memoized on the
+    request and cached in the session.
+    """
+    if hasattr(request, "_identity"):
+        return request._identity
+
+    identity = None
+    if request.user.is_authenticated:
+        stored = request.session.get(SESSION_KEY)
+        if stored and stored.get("user_id") == request.user.pk:
+            identity = Identity(**stored)
+        else:
+            identity = load_identity(request.user.pk)
+            if identity.complete:
+                request.session[SESSION_KEY] = identity.as_dict()
+
+    request._identity = identity
+    return identity
+
+
+def remember_identity(request, user):
+    """
+    Resolve and store the identity at login so the first protected view
+    does not pay for it.
+    """
+    identity = load_identity(user.pk)
+    if identity.complete:
+        request.session[SESSION_KEY] = identity.as_dict()
+    request._identity = identity
+
+
+def cache_identity_on_login(sender, request, user, **kwargs):
+    # user_logged_in receiver, connected in AccountsConfig.ready()
+    if request is not None and hasattr(request, "session"):
+        remember_identity(request, user)
+
+
+def forget_identity(request):
+    request.session.pop(SESSION_KEY, None)
+    if hasattr(request, "_identity"):
+        del request._identity
+
+
+# =====================================================
+# VIEW DECORATORS
+# =====================================================
+def _role_required(check, login_url_name):
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return redirect_to_login(request.get_full_path(), reverse(login_url_name))
+
+            identity = get_identity(request)
+            if not check(identity):
+                return redirect(login_url_name)
+
+            request.identity = identity
+            return view_func(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# Logged-in doctor with a Doctor row; sets request.identity
+doctor_required = _role_required(lambda identity: identity.is_doctor, "doctor_login")
+
+# Logged-in patient with a Patient row; sets request.identity
+patient_required = _role_required(lambda identity: identity.is_patient, "patient_login")
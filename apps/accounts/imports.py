@@ -0,0 +1,262 @@
+import csv
+import io
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from apps.appointments.cache import DOCTORS, invalidate
+
+from .models import Doctor, Patient, Profile
+from .serializers import DoctorRegisterSerializer, PatientRegisterSerializer
+
+
+# =====================================================
+# BULK IMPORT OF DOCTORS / PATIENTS (CSV, NDJSON, JSON)
+# =====================================================
+# Rows are read and inserted CHUNK_SIZE at a time: validated with the
+# registration serializers plus the extra checks the register APIs do,
+# passwords hashed in a process pool, then User/Profile/Doctor|Patient
+# bulk-inserted in one transaction per chunk. A bad row is reported and
+# skipped; it never aborts the chunk. When the bulk insert still hits a
+# unique constraint (an email registered since it was checked), that
+# chunk is inserted row by row, each in its own savepoint.
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+KINDS = {
+    "doctor": (Doctor, DoctorRegisterSerializer),
+    "patient": (Patient, PatientRegisterSerializer),
+}
+FORMATS = ("csv", "ndjson", "json")
+
+
+def guess_format(filename):
+    name = filename.lower()
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if name.endswith(".json"):
+        return "json"
+    return "csv"
+
+
+def read_rows(fh, fmt):
+    """
+    Yield dict rows from a binary file. CSV and NDJSON are streamed; a
+    JSON document (a list of objects) is parsed in one go.
+    """
+    if fmt == "json":
+        yield from json.load(fh)
+        return
+
+    text = io.TextIOWrapper(fh, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        yield from csv.DictReader(text)
+    else:
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# ---------- validation ----------
+def _clean(kind, row):
+    """
+    (validated_data, None) or (None, errors) for one row.
+    """
+    _, serializer_class = KINDS[kind]
+    row = {key: value for key, value in row.items() if key != "profile_image"}
+
+    serializer = serializer_class(data=row)
+    if not serializer.is_valid():
+        return None, {field: [str(e) for e in errs] for field, errs in serializer.errors.items()}
+
+    data = dict(serializer.validated_data)
+    data["email"] = data["email"].strip().lower()
+    data["full_name"] = data["full_name"].strip()
+    data["password"] = data["password"].strip()
+    phone = data["phone"].strip()
+
+    errors = {}
+    if len(data["full_name"]) < 3:
+        errors["full_name"] = "Name must be at least 3 characters"
+    if len(data["password"]) < 6:
+        errors["password"] = "Password must be at least 6 characters"
+
+    if kind == "doctor":
+        if not phone.isdigit() or len(phone) != 10:
+            errors["phone"] = "Phone number must be 10 digits"
+    else:
+        phone = phone.replace("+", "").replace(" ", "")
+        if not phone.isdigit() or len(phone) < 10:
+            errors["phone"] = "Enter valid phone number"
+        data["city"] = data["city"].strip()
+    data["phone"] = phone
+
+    return (None, errors) if errors else (data, None)
+
+
+# ---------- password hashing ----------
+def _init_hasher():
+    # Pool workers started with "spawn" have no configured apps yet
+    django.setup()
+
+
+def hash_passwords(passwords, pool=None):
+    """
+    make_password() for every entry, each with its own salt: rows that
+    share a password must not share a hash. PBKDF2 costs ~0.3 s per
+    hash, hence the process pool.
+    """
+    if pool is None:
+        return [make_password(pw) for pw in passwords]
+    return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // 64)))
+
+
+# ---------- import ----------
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.rows = 0
+        self.failed = 0
+        self.errors = []  # (row number, {field: message})
+        self.started = time.perf_counter()
+
+    def error(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, errors))
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "failed": self.failed,
+            "seconds": round(self.seconds, 2),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "errors": self.errors,
+        }
+
+
+def _registered(emails):
+    return set(User.objects.filter(username__in=emails).values_list("username", flat=True))
+
+
+def _insert(kind, rows):
+    """
+    Create the User, Profile and Doctor|Patient of every (data, password
+    hash) pair.
+    """
+    model, _ = KINDS[kind]
+    # bulk_create skips the create_profile post_save signal; profiles
+    # are inserted here with their role instead
+    users = User.objects.bulk_create([
+        User(username=data["email"], email=data["email"], password=password_hash)
+        for data, password_hash in rows
+    ])
+    Profile.objects.bulk_create([Profile(user=user, role=kind) for user in users])
+    model.objects.bulk_create([
+        model(user=user, **{k: v for k, v in data.items() if k != "email"})
+        for user, (data, _) in zip(users, rows)
+    ])
+
+
+def _import_chunk(kind, numbered_rows, report, seen, pool, hash_enabled):
+    valid = []
+    for number, row in numbered_rows:
+        data, errors = _clean(kind, row)
+        if errors:
+            report.error(number, errors)
+        elif data["email"] in seen:
+            report.error(number, {"email": "Duplicate email in file"})
+        else:
+            seen.add(data["email"])
+            valid.append((number, data))
+
+    existing = _registered([data["email"] for _, data in valid])
+    for number, data in valid:
+        if data["email"] in existing:
+            report.error(number, {"email": "Email already registered"})
+    valid = [(number, data) for number, data in valid if data["email"] not in existing]
+
+    if not valid:
+        return
+
+    passwords = [data.pop("password") for _, data in valid]
+    if hash_enabled:
+        hashes = hash_passwords(passwords, pool)
+    else:
+        # Unusable, one random string per row; users reset
+        hashes = [make_password(None) for _ in valid]
+    rows = [(data, password_hash) for (_, data), password_hash in zip(valid, hashes)]
+
+    try:
+        with transaction.atomic():
+            _insert(kind, rows)
+    except IntegrityError:
+        # Registered by someone else since the check above: find out
+        # which rows, keeping the others
+        for (number, _), row in zip(valid, rows):
+            try:
+                with transaction.atomic():
+                    _insert(kind, [row])
+            except IntegrityError:
+                report.error(number, {"email": "Email already registered"})
+            else:
+                report.created += 1
+        return
+
+    report.created += len(valid)
+
+
+def import_file(kind, fh, fmt="csv", chunk_size=CHUNK_SIZE, workers=None,
+                hash_passwords_enabled=True, progress=None):
+    """
+    Import every row of `fh` as a doctor or patient. `workers` is the size
+    of the password-hashing process pool (None: one per CPU, 0: hash in
+    this process). `progress(report)` is called after every chunk.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind {kind!r}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}")
+
+    report = ImportReport()
+    seen = set()
+    pool = None
+    if hash_passwords_enabled and workers != 0:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_hasher)
+
+    try:
+        numbered = enumerate(read_rows(fh, fmt), start=1)
+        for chunk in chunked(numbered, chunk_size):
+            report.rows += len(chunk)
+            _import_chunk(kind, chunk, report, seen, pool, hash_passwords_enabled)
+            if progress:
+                progress(report)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if kind == "doctor" and report.created:
+        invalidate(DOCTORS)  # bulk_create sends no post_save
+
+    return report
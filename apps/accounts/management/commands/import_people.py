@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.imports import CHUNK_SIZE, FORMATS, KINDS, guess_format, import_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-import doctors or patients from a CSV, NDJSON or JSON file. "
+        "Columns match the registration APIs (email, password, full_name, ...)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(KINDS))
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMATS,
+                            help="Defaults to the file extension")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Password hashing processes (default: one per CPU, 0: none)")
+        parser.add_argument("--no-passwords", action="store_true",
+                            help="Skip hashing; accounts get unusable passwords and must reset")
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or guess_format(options["path"])
+
+        def progress(report):
+            self.stdout.write(
+                f"{report.rows} rows, {report.created} created, {report.failed} failed "
+                f"({report.rows_per_second:.0f} rows/s)"
+            )
+
+        try:
+            with open(options["path"], "rb") as fh:
+                report = import_file(
+                    options["kind"], fh, fmt,
+                    chunk_size=options["chunk_size"],
+                    workers=options["workers"],
+                    hash_passwords_enabled=not options["no_passwords"],
+                    progress=progress,
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for number, errors in report.errors:
+            self.stdout.write(self.style.WARNING(f"row {number}: {errors}"))
+        if report.failed > len(report.errors):
+            self.stdout.write(f"... {report.failed - len(report.errors)} more failed rows")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.created} of {report.rows} {options['kind']} rows in "
+            f"{report.seconds:.1f}s ({report.rows_per_second:.0f} rows/s)"
+        ))
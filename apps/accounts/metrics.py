@@ -0,0 +1,79 @@
+import threading
+from collections import defaultdict, deque
+from math import ceil
+
+
+# =====================================================
+# ROLLING PER-VIEW REQUEST METRICS (in-process)
+# =====================================================
+# Each worker process keeps the last WINDOW samples per view. Nothing is
+# shared between processes; the metrics endpoint shows the worker that
+# served it.
+WINDOW = 500
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_samples = defaultdict(lambda: deque(maxlen=WINDOW))
+_totals = defaultdict(int)
+_lock = threading.Lock()
+
+
+def percentile(values, pct):
+    # nearest-rank percentile
+    ordered = sorted(values)
+    index = max(0, ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def record(view, total_ms, db_ms, queries, template_ms, status):
+    with _lock:
+        _samples[view].append((total_ms, db_ms, queries, template_ms, status))
+        _totals[view] += 1
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _totals.clear()
+
+
+def _histogram(latencies):
+    counts = dict.fromkeys([f"le_{edge}" for edge in LATENCY_BUCKETS_MS] + ["inf"], 0)
+    for value in latencies:
+        for edge in LATENCY_BUCKETS_MS:
+            if value <= edge:
+                counts[f"le_{edge}"] += 1
+                break
+        else:
+            counts["inf"] += 1
+    return counts
+
+
+def snapshot():
+    """
+    Latency percentiles, a latency histogram and mean DB/template cost
+    for every view seen in the current window.
+    """
+    with _lock:
+        windows = {view: list(samples) for view, samples in _samples.items()}
+        totals = dict(_totals)
+
+    views = {}
+    for view, samples in sorted(windows.items()):
+        total = [s[0] for s in samples]
+        n = len(samples)
+        views[view] = {
+            "requests": totals[view],
+            "window": n,
+            "p50_ms": round(percentile(total, 50), 2),
+            "p95_ms": round(percentile(total, 95), 2),
+            "p99_ms": round(percentile(total, 99), 2),
+            "max_ms": round(max(total), 2),
+            "db_ms_avg": round(sum(s[1] for s in samples) / n, 2),
+            "queries_avg": round(sum(s[2] for s in samples) / n, 2),
+            "queries_max": max(s[2] for s in samples),
+            "template_ms_avg": round(sum(s[3] for s in samples) / n, 2),
+            "errors": sum(1 for s in samples if s[4] >= 500),
+            "histogram_ms": _histogram(total),
+        }
+
+    return views
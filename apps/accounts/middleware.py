@@ -1,29 +1,305 @@
+import logging
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
 from django.shortcuts import redirect
+from django.template.base import Template
 from django.urls import reverse, NoReverseMatch
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from config import db_router
+
+from . import metrics
 
 
 class RedirectAuthenticatedUserMiddleware:
     """
     Redirect authenticated users away from auth pages.
     Safe for Render + DEBUG=False.
+
+    The auth URLs are reversed once when the middleware is built. Any
+    other path is passed straight through without touching request.user,
+    so static, API and admin requests never load the session or user.
     """
 
+    AUTH_URL_NAMES = ("doctor_login", "patient_login")
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.auth_paths = frozenset(self._reverse_all(self.AUTH_URL_NAMES))
+        self.home_url = next(iter(self._reverse_all(["home"])), "/")
 
-    def __call__(self, request):
-        if request.user.is_authenticated:
+    @staticmethod
+    def _reverse_all(names):
+        paths = []
+        for name in names:
             try:
-                auth_paths = {
-                    reverse("doctor_login"),
-                    reverse("patient_login"),
-                }
-
-                if request.path in auth_paths:
-                    # Redirect based on role later if needed
-                    return redirect("home")
-
+                paths.append(reverse(name))
             except NoReverseMatch:
                 pass  # Never crash middleware
+        return paths
+
+    def __call__(self, request):
+        if request.path in self.auth_paths and request.user.is_authenticated:
+            # Redirect based on role later if needed
+            return redirect(self.home_url)
 
         return self.get_response(request)
+
+
+# =====================================================
+# QUERY / LATENCY PROFILING
+# =====================================================
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("request_profile", default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(queries):
+    """
+    Declare how many queries a view may run. Over budget is logged, or
+    raised as QueryBudgetExceeded when QUERY_BUDGET_STRICT is on (tests).
+    Put it outermost so the resolved view still carries the attribute.
+    """
+    def decorator(view_func):
+        view_func.query_budget = queries
+        return view_func
+
+    return decorator
+
+
+class RequestProfile:
+    __slots__ = ("queries", "db_seconds", "template_seconds", "template_depth", "budget")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.budget = None
+
+
+def _count_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries += 1
+        profile.db_seconds += perf_counter() - started
+
+
+def _install_query_counter(connection, **kwargs):
+    # Stays on the connection for good and counts for whichever request
+    # is current in the context that runs the query. Async views run ORM
+    # work on other threads (other connections), so wrapping only the
+    # request thread's connections would miss those queries.
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def _instrument_templates():
+    """
+    Time Template.render for profiled requests. Included and extended
+    templates render inside their parent, so only the outermost call counts.
+    """
+    if getattr(Template.render, "profiled", False):
+        return
+
+    original = Template.render
+
+    @wraps(original)
+    def render(self, context):
+        profile = _current.get()
+        if profile is None:
+            return original(self, context)
+
+        profile.template_depth += 1
+        started = perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            profile.template_depth -= 1
+            if not profile.template_depth:
+                profile.template_seconds += perf_counter() - started
+
+    render.profiled = True
+    Template.render = render
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "unresolved"
+
+
+class QueryProfilingMiddleware:
+    """
+    Per request: query count, DB time, template time and total latency.
+    Recorded in the rolling per-view metrics and, with SERVER_TIMING_HEADER
+    (defaults to DEBUG), sent back as a Server-Timing header. Queries run
+    while a streaming response is consumed are not counted. Works in both
+    the sync and the async (ASGI) middleware chain.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+        _instrument_templates()
+        connection_created.connect(_install_query_counter, dispatch_uid="query_counter")
+        for conn in connections.all(initialized_only=True):
+            _install_query_counter(conn)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return self._finish(request, response, profile, started)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return self._finish(request, response, profile, started)
+
+    def _finish(self, request, response, profile, started):
+        total_ms = (perf_counter() - started) * 1000
+        db_ms = profile.db_seconds * 1000
+        template_ms = profile.template_seconds * 1000
+        view = _view_name(request)
+
+        metrics.record(view, total_ms, db_ms, profile.queries, template_ms,
+                       response.status_code)
+
+        if getattr(settings, "SERVER_TIMING_HEADER", settings.DEBUG):
+            response["Server-Timing"] = (
+                f'db;dur={db_ms:.1f};desc="{profile.queries} queries", '
+                f"tpl;dur={template_ms:.1f}, total;dur={total_ms:.1f}"
+            )
+
+        if profile.budget is not None and profile.queries > profile.budget:
+            message = f"{view} ran {profile.queries} queries (budget {profile.budget})"
+            if getattr(settings, "QUERY_BUDGET_STRICT", False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current.get()
+        if profile is not None:
+            profile.budget = getattr(view_func, "query_budget", None)
+
+
+# =====================================================
+# STATIC FILES UNDER ASGI
+# =====================================================
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware that can also sit in the async middleware chain.
+    WhiteNoise 6 is sync-only, which makes Django run every request
+    below it through the single thread-sensitive thread under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # DEBUG only: looks the file up on disk
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+# =====================================================
+# READ REPLICA: READ-YOUR-WRITES PINNING
+# =====================================================
+class ReplicaPinningMiddleware:
+    """
+    Sets up the per-request routing state for config.db_router. Clients
+    whose request wrote to the database get a cookie that keeps their
+    reads on the primary for REPLICA_PIN_SECONDS. Goes before
+    SessionMiddleware so that session writes (logins) count too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state, token = db_router.start_request(db_router.PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            db_router.end_request(token)
+        return self._pin(state, response)
+
+    async def __acall__(self, request):
+        state, token = db_router.start_request(db_router.PIN_COOKIE in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            db_router.end_request(token)
+        return self._pin(state, response)
+
+    @staticmethod
+    def _pin(state, response):
+        if state.wrote and settings.REPLICA_DATABASE:
+            response.set_cookie(
+                db_router.PIN_COOKIE, "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+# icontains/istartswith compile to UPPER(col::text) LIKE UPPER(%s) on
+# Postgres, so the trigram indexes are built on that exact expression.
+SEARCH_COLUMNS = ("full_name", "city", "specialization")
+
+
+def create_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS accounts_doctor_{column}_trgm "
+            f"ON accounts_doctor USING gin (UPPER({column}::text) gin_trgm_ops)"
+        )
+
+
+def drop_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS accounts_doctor_{column}_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_doctor_profile_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trgm_indexes, drop_trgm_indexes),
+    ]
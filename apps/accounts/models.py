@@ -20,6 +20,11 @@ class Profile(models.Model):
         return f"{self.user.email} - {self.role}"
 
 
+# Card-sized variant of Doctor.profile_image, generated eagerly by the
+# accounts.generate_profile_thumbnail job.
+PROFILE_THUMBNAIL = {"width": 300, "height": 220, "crop": "fill", "gravity": "face"}
+
+
 class Doctor(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
 
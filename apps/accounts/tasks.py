@@ -0,0 +1,61 @@
+import logging
+
+import cloudinary.uploader
+
+from apps.jobs.queue import enqueue, task
+
+from .imports import import_file
+from .models import Doctor, PROFILE_THUMBNAIL
+from .uploads import staging_storage
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================
+# BACKGROUND: DOCTOR PROFILE IMAGE
+# =====================================================
+@task("accounts.upload_profile_image", max_attempts=5, timeout=120)
+def upload_profile_image(doctor_id, path):
+    storage = staging_storage()
+
+    doctor = Doctor.objects.filter(id=doctor_id).first()
+    if doctor is None:
+        storage.delete(path)
+        return
+
+    with storage.open(path, "rb") as fh:
+        doctor.profile_image = cloudinary.uploader.upload_resource(fh, folder="doctors")
+
+    doctor.save(update_fields=["profile_image"])
+    storage.delete(path)
+
+    enqueue(
+        "accounts.generate_profile_thumbnail",
+        {"public_id": doctor.profile_image.public_id},
+    )
+
+
+@task("accounts.generate_profile_thumbnail", max_attempts=5, timeout=60)
+def generate_profile_thumbnail(public_id):
+    # Eager transformation: Cloudinary renders and stores the derived
+    # image now instead of on the first page view that asks for it.
+    cloudinary.uploader.explicit(
+        public_id,
+        type="upload",
+        eager=[PROFILE_THUMBNAIL],
+    )
+
+
+# =====================================================
+# BACKGROUND: BULK IMPORT (admin upload)
+# =====================================================
+@task("accounts.import_people", max_attempts=1, timeout=25 * 60)
+def import_people(kind, path, fmt):
+    storage = staging_storage()
+    try:
+        with storage.open(path, "rb") as fh:
+            report = import_file(kind, fh, fmt)
+    finally:
+        storage.delete(path)
+
+    logger.info("Imported %s: %s", path, report.as_dict())
@@ -1,3 +1,385 @@
-from django.test import TestCase
+import io
+import json
+import os
+import unittest
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from config import db_router, pooled_postgresql
+from config.pooled_postgresql.base import DatabaseWrapper as PooledDatabaseWrapper
+
+from .identity import doctor_required, patient_required
+from .imports import import_file
+from .middleware import (
+    QueryBudgetExceeded, QueryProfilingMiddleware, ReplicaPinningMiddleware, query_budget,
+)
+from .models import Doctor, Patient, Profile
+
+
+# PBKDF2 at full strength would make every import test take seconds
+FAST_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+DOCTOR_HEADER = (
+    "email,password,full_name,phone,specialization,qualification,"
+    "experience_years,clinic_name,city,consultation_fee\n"
+)
+
+
+def doctor_csv(*rows):
+    lines = [
+        f"{email},{password},Doctor {i},98765432{i:02d},Cardiology,MBBS,5,Clinic,Pune,500.00\n"
+        for i, (email, password) in enumerate(rows)
+    ]
+    return io.BytesIO((DOCTOR_HEADER + "".join(lines)).encode())
+
+
+# =====================================================
+# BULK IMPORT
+# =====================================================
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ImportFileTests(TestCase):
+    def test_creates_users_profiles_and_doctors(self):
+        report = import_file("doctor", doctor_csv(("a@x.com", "secret1"), ("b@x.com", "secret2")), workers=0)
+
+        self.assertEqual((report.rows, report.created, report.failed), (2, 2, 0))
+        doctor = Doctor.objects.select_related("user__profile").get(user__username="a@x.com")
+        self.assertEqual(doctor.user.profile.role, "doctor")
+        self.assertTrue(check_password("secret1", doctor.user.password))
+
+    def test_shared_password_gets_a_hash_per_user(self):
+        import_file("doctor", doctor_csv(("a@x.com", "Welcome123"), ("b@x.com", "Welcome123")), workers=0)
+
+        hashes = list(User.objects.filter(username__in=["a@x.com", "b@x.com"]).values_list("password", flat=True))
+        self.assertEqual(len(set(hashes)), 2)
+        for password_hash in hashes:
+            self.assertTrue(check_password("Welcome123", password_hash))
+
+    def test_no_passwords_gives_each_user_its_own_unusable_password(self):
+        import_file(
+            "doctor", doctor_csv(("a@x.com", "secret1"), ("b@x.com", "secret2")),
+            workers=0, hash_passwords_enabled=False,
+        )
+
+        users = list(User.objects.filter(username__in=["a@x.com", "b@x.com"]))
+        self.assertEqual(len({user.password for user in users}), 2)
+        self.assertFalse(any(user.has_usable_password() for user in users))
+
+    def test_bad_and_duplicate_rows_are_reported_and_skipped(self):
+        User.objects.create_user(username="taken@x.com", email="taken@x.com", password="x")
+        report = import_file(
+            "doctor",
+            doctor_csv(("a@x.com", "secret1"), ("a@x.com", "secret2"), ("taken@x.com", "secret3"), ("c@x.com", "123")),
+            workers=0,
+        )
+
+        self.assertEqual((report.created, report.failed), (1, 3))
+        self.assertEqual(sorted(number for number, _ in report.errors), [2, 3, 4])
+
+    def test_emails_registered_during_the_import_fall_back_to_row_inserts(self):
+        User.objects.create_user(username="late@x.com", email="late@x.com", password="x")
+        # the chunk's existence check ran before late@x.com registered
+        with mock.patch("apps.accounts.imports._registered", return_value=set()):
+            report = import_file(
+                "doctor", doctor_csv(("a@x.com", "secret1"), ("late@x.com", "secret2"), ("c@x.com", "secret3")),
+                workers=0,
+            )
+
+        self.assertEqual((report.created, report.failed), (2, 1))
+        self.assertEqual(report.errors, [(2, {"email": "Email already registered"})])
+        self.assertEqual(Doctor.objects.filter(user__username__in=["a@x.com", "c@x.com"]).count(), 2)
+
+
+# =====================================================
+# ROLE DECORATORS
+# =====================================================
+def whoami(request):
+    return HttpResponse(f"{request.identity.doctor_id}/{request.identity.patient_id}")
+
+
+class RoleRequiredTests(TestCase):
+    def setUp(self):
+        self.doctor_user = User.objects.create_user(username="doc@x.com", password="x")
+        Profile.objects.create(user=self.doctor_user, role="doctor")
+        self.doctor = Doctor.objects.create(
+            user=self.doctor_user, full_name="Doc", phone="9876543210", specialization="Cardiology",
+            qualification="MBBS", experience_years=5, clinic_name="Clinic", city="Pune",
+            consultation_fee=500,
+        )
+        self.patient_user = User.objects.create_user(username="pat@x.com", password="x")
+        Profile.objects.create(user=self.patient_user, role="patient")
+        self.patient = Patient.objects.create(
+            user=self.patient_user, full_name="Pat", phone="9876543210", gender="Female",
+            date_of_birth=date(1990, 1, 1), city="Pune",
+        )
+
+    def get(self, view, user, session=None):
+        request = RequestFactory().get("/private/")
+        request.user = user
+        request.session = {} if session is None else session
+        return view(request)
+
+    def test_anonymous_users_are_sent_to_the_role_login(self):
+        response = self.get(doctor_required(whoami), AnonymousUser())
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, f"{reverse('doctor_login')}?next=/private/")
+
+    def test_the_other_role_is_rejected(self):
+        response = self.get(doctor_required(whoami), self.patient_user)
+        self.assertEqual((response.status_code, response.url), (302, reverse("doctor_login")))
+
+        response = self.get(patient_required(whoami), self.doctor_user)
+        self.assertEqual((response.status_code, response.url), (302, reverse("patient_login")))
+
+    def test_doctor_profile_without_a_doctor_row_is_rejected(self):
+        self.doctor.delete()
+        response = self.get(doctor_required(whoami), self.doctor_user)
+        self.assertEqual(response.status_code, 302)
+
+    def test_matching_role_gets_its_ids_and_keeps_them_in_the_session(self):
+        session = {}
+        response = self.get(patient_required(whoami), self.patient_user, session)
+        self.assertEqual(response.content.decode(), f"None/{self.patient.id}")
+
+        with self.assertNumQueries(0):
+            response = self.get(patient_required(whoami), self.patient_user, session)
+        self.assertEqual(response.content.decode(), f"None/{self.patient.id}")
+
+
+# =====================================================
+# QUERY BUDGETS
+# =====================================================
+def view_running(queries):
+    def view(request):
+        for _ in range(queries):
+            User.objects.exists()
+        return HttpResponse()
+    return view
+
+
+class QueryBudgetTests(TestCase):
+    def get(self, view):
+        def get_response(request):
+            # what the handler does between the middleware and the view
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = QueryProfilingMiddleware(get_response)
+        return middleware(RequestFactory().get("/"))
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_strict_mode_raises_over_budget(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, "ran 3 queries (budget 2)"):
+            self.get(query_budget(2)(view_running(3)))
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_over_budget_is_logged_otherwise(self):
+        with self.assertLogs("apps.accounts.middleware", "WARNING") as logs:
+            self.assertEqual(self.get(query_budget(2)(view_running(3))).status_code, 200)
+        self.assertIn("ran 3 queries (budget 2)", logs.output[0])
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_within_budget_or_without_one_passes(self):
+        with self.assertNoLogs("apps.accounts.middleware", "WARNING"):
+            self.assertEqual(self.get(query_budget(2)(view_running(2))).status_code, 200)
+            self.assertEqual(self.get(view_running(5)).status_code, 200)
+
+
+# =====================================================
+# POOLED POSTGRES CONNECTIONS
+# =====================================================
+class PoolRegistryTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(pooled_postgresql, "_pools", {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_pool_per_alias_and_database(self):
+        factory = mock.Mock(side_effect=lambda: mock.Mock())
+
+        pool = pooled_postgresql.get_pool("default", "app", factory)
+        self.assertIs(pooled_postgresql.get_pool("default", "app", factory), pool)
+        other_alias = pooled_postgresql.get_pool("replica", "app", factory)
+        self.assertIsNot(other_alias, pool)
+
+        # the test runner points the alias at test_app
+        test_pool = pooled_postgresql.get_pool("default", "test_app", factory)
+        self.assertIsNot(test_pool, pool)
+        pool.close.assert_called_once_with()
+        other_alias.close.assert_not_called()
+        self.assertEqual(factory.call_count, 3)
+
+    def test_forked_child_builds_its_own_pool_and_leaves_the_parents_open(self):
+        parent_pool = pooled_postgresql.get_pool("default", "app", mock.Mock)
+
+        with mock.patch("os.getpid", return_value=os.getpid() + 1):
+            child_pool = pooled_postgresql.get_pool("default", "app", mock.Mock)
+            self.assertEqual(pooled_postgresql._own_pools(), [("default", child_pool)])
+
+        self.assertIsNot(child_pool, parent_pool)
+        parent_pool.close.assert_not_called()
+
+
+class PooledCloseTests(SimpleTestCase):
+    def wrapper(self, in_atomic_block):
+        wrapper = PooledDatabaseWrapper({**connections.settings[DEFAULT_DB_ALIAS], "OPTIONS": {}}, "pooled")
+        wrapper.connection = mock.Mock()
+        wrapper.in_atomic_block = in_atomic_block
+        pool = mock.Mock()
+        patcher = mock.patch.object(
+            PooledDatabaseWrapper, "pool", new_callable=mock.PropertyMock, return_value=pool
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return wrapper, pool
+
+    def test_connection_goes_back_to_the_pool(self):
+        wrapper, pool = self.wrapper(in_atomic_block=False)
+        connection = wrapper.connection
+        wrapper._close()
+
+        connection.close.assert_not_called()
+        pool.putconn.assert_called_once_with(connection)
+
+    def test_connection_closed_inside_an_atomic_block_is_discarded(self):
+        wrapper, pool = self.wrapper(in_atomic_block=True)
+        connection = wrapper.connection
+        wrapper._close()
+
+        connection.close.assert_called_once_with()
+        pool.putconn.assert_called_once_with(connection)
+
+
+# =====================================================
+# READ REPLICA ROUTING
+# =====================================================
+@override_settings(REPLICA_DATABASE="replica")
+class ReplicaRouterTests(SimpleTestCase):
+    router = db_router.ReplicaRouter()
+
+    def read_db(self, model, pinned=False, replica=True):
+        state, token = db_router.start_request(pinned)
+        try:
+            state.replica = replica
+            return self.router.db_for_read(model)
+        finally:
+            db_router.end_request(token)
+
+    def test_replica_views_read_app_models_from_the_replica(self):
+        self.assertEqual(self.read_db(Doctor), "replica")
+
+    def test_everything_else_reads_from_the_primary(self):
+        self.assertIsNone(self.read_db(User))  # sessions and users
+        self.assertIsNone(self.read_db(Doctor, replica=False))
+        self.assertIsNone(self.read_db(Doctor, pinned=True))
+        self.assertIsNone(self.router.db_for_read(Doctor))  # outside a request
+        with override_settings(REPLICA_DATABASE=None):
+            self.assertIsNone(self.read_db(Doctor))
+
+    def test_use_replica_only_lasts_for_the_view(self):
+        @db_router.use_replica
+        def view(request):
+            return self.router.db_for_read(Doctor)
+
+        state, token = db_router.start_request(False)
+        try:
+            self.assertEqual(view(None), "replica")
+            self.assertFalse(state.replica)
+        finally:
+            db_router.end_request(token)
+
+    def test_writes_go_to_the_primary_and_mark_the_request(self):
+        state, token = db_router.start_request(False)
+        try:
+            self.assertEqual(self.router.db_for_write(Doctor), DEFAULT_DB_ALIAS)
+            self.assertTrue(state.wrote)
+        finally:
+            db_router.end_request(token)
+
+    def test_replica_is_never_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica", "appointments"))
+        self.assertIsNone(self.router.allow_migrate(DEFAULT_DB_ALIAS, "appointments"))
+
+
+@override_settings(REPLICA_DATABASE="replica", REPLICA_PIN_SECONDS=10)
+class ReplicaPinningTests(TestCase):
+    def get(self, view, cookies=None):
+        request = RequestFactory().get("/")
+        request.COOKIES.update(cookies or {})
+        return ReplicaPinningMiddleware(view)(request)
+
+    def test_writing_request_pins_the_client_to_the_primary(self):
+        def view(request):
+            User.objects.create_user(username="pin@x.com", password="x")
+            return HttpResponse()
+
+        cookie = self.get(view).cookies[db_router.PIN_COOKIE]
+        self.assertEqual(cookie["max-age"], 10)
+        self.assertTrue(cookie["httponly"])
+
+    def test_reads_leave_the_client_unpinned(self):
+        def view(request):
+            User.objects.exists()
+            return HttpResponse()
+
+        self.assertNotIn(db_router.PIN_COOKIE, self.get(view).cookies)
+        with override_settings(REPLICA_DATABASE=None):
+            self.assertNotIn(db_router.PIN_COOKIE, self.get(view).cookies)
+
+    def test_pinned_client_reads_its_own_writes(self):
+        def view(request):
+            return HttpResponse(str(db_router.read_your_writes()))
+
+        self.assertEqual(self.get(view).content, b"False")
+        self.assertEqual(self.get(view, {db_router.PIN_COOKIE: "1"}).content, b"True")
+
+
+@unittest.skipUnless(settings.REPLICA_DATABASE, "needs a replica database alias")
+class ReplicaRoundTripTests(TransactionTestCase):
+    """
+    Through the full middleware stack against a second database alias
+    (in tests the replica alias mirrors the primary's test database).
+    """
+
+    databases = "__all__"
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="doctor@x.com", password="secret")
+        Profile.objects.create(user=user, role="doctor")
+        Doctor.objects.create(
+            user=user, full_name="Replica Doctor", phone="9876543210", specialization="Cardiology",
+            qualification="MBBS", experience_years=5, clinic_name="Clinic", city="Pune",
+            consultation_fee=500,
+        )
+
+    def doctor_reads(self):
+        cache.clear()
+        with CaptureQueriesContext(connections["replica"]) as replica, \
+                CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary:
+            self.assertEqual(self.client.get(reverse("doctor_list_page")).status_code, 200)
+        return [
+            alias for alias, queries in (("replica", replica), ("primary", primary))
+            if any('"accounts_doctor"' in q["sql"] for q in queries)
+        ]
+
+    def test_login_pins_reads_to_the_primary(self):
+        self.assertEqual(self.doctor_reads(), ["replica"])
+
+        response = self.client.post(
+            reverse("doctor_login"), json.dumps({"email": "doctor@x.com", "password": "secret"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(db_router.PIN_COOKIE, response.cookies)
+
+        self.assertEqual(self.doctor_reads(), ["primary"])
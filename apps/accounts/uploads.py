@@ -0,0 +1,18 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+
+# =====================================================
+# LOCAL STAGING FOR UPLOADS HANDLED BY THE JOB WORKER
+# =====================================================
+@lru_cache(maxsize=None)
+def staging_storage():
+    # The worker reads these files back, so it has to run on the same
+    # host (or shared volume) as the web process.
+    return FileSystemStorage(location=settings.UPLOAD_STAGING_ROOT)
+
+
+def stage_upload(uploaded_file, prefix):
+    return staging_storage().save(f"{prefix}/{uploaded_file.name}", uploaded_file)
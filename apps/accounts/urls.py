@@ -21,7 +21,9 @@ urlpatterns = [
     # apps/accounts/urls.py
 # apps/accounts/urls.py
 path("logout/", views.logout_view, name="logout"),
- path("patient/login/", views.patient_login, name="patient_login")
- 
+ path("patient/login/", views.patient_login, name="patient_login"),
+
+    # REQUEST METRICS (staff only)
+    path("metrics/", views.metrics_view, name="metrics"),
 
 ]
@@ -2,6 +2,7 @@ import json
 from datetime import datetime
 
 from django.shortcuts import render, redirect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.db import transaction
@@ -15,6 +16,11 @@ from rest_framework.response import Response
 
 from drf_spectacular.utils import extend_schema
 
+from apps.appointments.cache import cache_stats
+from apps.jobs.queue import enqueue
+from config.pooled_postgresql import pool_stats
+
+from . import metrics
 from .models import Doctor, Patient, Profile
 from .serializers import (
     DoctorRegisterSerializer,
@@ -22,6 +28,7 @@ from .serializers import (
     PatientRegisterSerializer,
     PatientLoginSerializer,
 )
+from .uploads import stage_upload
 
 # =====================================================
 # PATIENT REGISTER PAGE (HTML)
@@ -77,7 +84,7 @@ def doctor_register_api(request):
 
     Profile.objects.create(user=user, role="doctor")
 
-    Doctor.objects.create(
+    doctor = Doctor.objects.create(
         user=user,
         full_name=full_name,
         phone=phone,
@@ -87,9 +94,16 @@ def doctor_register_api(request):
         clinic_name=data.get("clinic_name"),
         city=data.get("city"),
         consultation_fee=data.get("consultation_fee"),
-        profile_image=request.FILES.get("profile_image"),
     )
 
+    # Cloudinary upload happens in the job worker, outside this transaction
+    profile_image = request.FILES.get("profile_image")
+    if profile_image:
+        enqueue(
+            "accounts.upload_profile_image",
+            {"doctor_id": doctor.id, "path": stage_upload(profile_image, "profile_images")},
+        )
+
     return Response(
         {"success": "Doctor registered successfully"},
         status=201,
@@ -221,6 +235,24 @@ def patient_register_api(request):
 def logout_view(request):
     logout(request)
     return redirect("/")
+
+
+# =====================================================
+# REQUEST METRICS (staff only)
+# =====================================================
+@staff_member_required
+def metrics_view(request):
+    """
+    Rolling per-view latency/query metrics, cache hit ratios and DB pool
+    statistics for the worker process that serves this request.
+    """
+    return JsonResponse({
+        "views": metrics.snapshot(),
+        "cache": cache_stats(),
+        "db_pools": pool_stats(),
+    })
+
+
 # =====================================================
 # PATIENT LOGIN (HTML + AJAX)
 # =====================================================
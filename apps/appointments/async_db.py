@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.http import HttpResponseNotAllowed
+from django.utils.log import log_response
+
+
+# =====================================================
+# ORM WORK FROM ASYNC VIEWS
+# =====================================================
+# Django 4.2's async ORM methods (aget, acount, async for, ...) are
+# sync_to_async wrappers that all run on the one thread-sensitive thread
+# of the process, so concurrent requests still wait for each other's
+# queries. With ASYNC_DB_THREADS > 0, self-contained units of ORM work
+# run on a pool of DB threads instead, each thread keeping its own
+# connection (recycled per CONN_MAX_AGE, like a request's). 0 keeps
+# Django's behaviour, which tests need: they see their own transaction.
+_executor = None
+_override = None
+
+
+def db_executor():
+    global _executor
+    if _override is not None:
+        return _override
+    if _executor is None and settings.ASYNC_DB_THREADS:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_DB_THREADS, thread_name_prefix="async-db"
+        )
+    return _executor
+
+
+@contextmanager
+def use_db_executor(executor):
+    """
+    Run run_db() work on `executor` inside the block (benchmarks).
+    """
+    global _override
+    previous, _override = _override, executor
+    try:
+        yield executor
+    finally:
+        _override = previous
+
+
+def _in_db_thread(func, args, kwargs):
+    # Drop broken or expired connections around each unit of work, as the
+    # request signals do; never inside a transaction shared with the caller
+    if not connection.in_atomic_block:
+        close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        if not connection.in_atomic_block:
+            close_old_connections()
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    await func(*args, **kwargs) run on a DB thread. func must not depend
+    on the calling thread (no open transaction, no thread-local state).
+    """
+    executor = db_executor()
+    if executor is None:
+        return await sync_to_async(func)(*args, **kwargs)
+    return await sync_to_async(_in_db_thread, thread_sensitive=False, executor=executor)(
+        func, args, kwargs
+    )
+
+
+def async_require_http_methods(methods):
+    """
+    require_http_methods() for async views; Django 4.2's decorator only
+    wraps sync views.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def inner(request, *args, **kwargs):
+            if request.method not in methods:
+                response = HttpResponseNotAllowed(methods)
+                log_response(
+                    "Method Not Allowed (%s): %s", request.method, request.path,
+                    response=response, request=request,
+                )
+                return response
+            return await view_func(request, *args, **kwargs)
+
+        return inner
+
+    return decorator
+
+
+async_require_GET = async_require_http_methods(["GET"])
+async_require_POST = async_require_http_methods(["POST"])
@@ -0,0 +1,538 @@
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.accounts.metrics import percentile
+
+from .seed import CITIES, SPECIALIZATIONS
+
+
+# =====================================================
+# SCENARIO REGISTRY
+# =====================================================
+SCENARIOS = {}
+
+
+def scenario(name):
+    """
+    Register a benchmark. The function receives a BenchContext and must
+    return a list of Sample.
+    """
+    def decorator(func):
+        SCENARIOS[name] = func
+        return func
+
+    return decorator
+
+
+class Sample:
+    __slots__ = ("seconds", "queries", "status")
+
+    def __init__(self, seconds, queries=0, status=200):
+        self.seconds = seconds
+        self.queries = queries
+        self.status = status
+
+
+class BenchContext:
+    """
+    Seeded dataset plus ready-made logged-in clients for the scenarios.
+    """
+
+    def __init__(self, data, iterations, seed=0, patient_clients=20, concurrency=16):
+        self.data = data
+        self.iterations = iterations
+        self.concurrency = concurrency
+        self.rng = random.Random(seed)
+
+        self.anonymous = Client(HTTP_HOST="localhost")
+
+        self.doctor = data["doctors"][0]
+        self.doctor_client = Client(HTTP_HOST="localhost")
+        self.doctor_client.force_login(self.doctor.user)
+
+        self.patient_clients = []
+        for patient in data["patients"][:patient_clients]:
+            client = Client(HTTP_HOST="localhost")
+            client.force_login(patient.user)
+            self.patient_clients.append(client)
+
+        # appointments with a medical note, preferring the logged-in doctor's
+        noted = [note.appointment for note in data["notes"]]
+        self.noted = [a.id for a in noted if a.doctor_id == self.doctor.id] \
+            or [a.id for a in noted]
+
+    def request(self, method, client, path, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+
+        return Sample(elapsed, len(queries), response.status_code)
+
+    def repeat(self, func):
+        return [func(i) for i in range(self.iterations)]
+
+
+# =====================================================
+# SUMMARY / BASELINE
+# =====================================================
+def summarize(samples):
+    ms = [sample.seconds * 1000 for sample in samples]
+    statuses = {}
+    for sample in samples:
+        statuses[sample.status] = statuses.get(sample.status, 0) + 1
+
+    total = sum(sample.seconds for sample in samples)
+
+    return {
+        "n": len(samples),
+        "per_second": round(len(samples) / total, 1) if total else 0.0,
+        "p50": round(percentile(ms, 50), 3),
+        "p95": round(percentile(ms, 95), 3),
+        "p99": round(percentile(ms, 99), 3),
+        "queries": round(sum(sample.queries for sample in samples) / len(samples), 2),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Names of scenarios whose p95 got slower than baseline * (1 + tolerance)
+    or that now run more queries per request.
+    """
+    regressions = {}
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+
+        reasons = []
+        if current["p95"] > before["p95"] * (1 + tolerance):
+            reasons.append(f"p95 {before['p95']} -> {current['p95']} ms")
+        if current["queries"] > before["queries"]:
+            reasons.append(f"queries {before['queries']} -> {current['queries']}")
+        if reasons:
+            regressions[name] = reasons
+
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh).get("scenarios", {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results, meta):
+    with open(path, "w") as fh:
+        json.dump({"meta": meta, "scenarios": results}, fh, indent=2, sort_keys=True)
+
+
+# =====================================================
+# ENDPOINT SCENARIOS
+# =====================================================
+@scenario("api_search_doctors")
+def bench_search(ctx):
+    path = reverse("api_search_doctors")
+    doctors = ctx.data["doctors"]
+
+    def one(i):
+        params = {
+            "name": ctx.rng.choice(doctors).full_name.split()[0][:3],
+            "city": ctx.rng.choice(CITIES) if i % 2 else "",
+            "specialization": ctx.rng.choice(SPECIALIZATIONS)[:4] if i % 3 else "",
+        }
+        return ctx.request("get", ctx.anonymous, path, data=params)
+
+    return ctx.repeat(one)
+
+
+@scenario("api_doctor_slots")
+def bench_doctor_slots(ctx):
+    doctors = ctx.data["doctors"]
+
+    def one(i):
+        path = reverse("api_doctor_slots", args=[ctx.rng.choice(doctors).id])
+        return ctx.request("get", ctx.anonymous, path)
+
+    return ctx.repeat(one)
+
+
+@scenario("api_nearest_slots")
+def bench_nearest_slots(ctx):
+    path = reverse("api_nearest_slots")
+
+    def one(i):
+        params = {
+            "specialization": ctx.rng.choice(SPECIALIZATIONS),
+            "city": ctx.rng.choice(CITIES) if i % 2 else "",
+            "time_from": "10:00" if i % 3 else "",
+        }
+        return ctx.request("get", ctx.anonymous, path, data=params)
+
+    return ctx.repeat(one)
+
+
+@scenario("create_appointment_api")
+def bench_booking(ctx):
+    path = reverse("create_appointment_api")
+    slots = ctx.data["slots"]
+
+    def one(i):
+        body = json.dumps({"availability_id": ctx.rng.choice(slots).id})
+        client = ctx.patient_clients[i % len(ctx.patient_clients)]
+        return ctx.request("post", client, path, data=body, content_type="application/json")
+
+    return ctx.repeat(one)
+
+
+@scenario("doctor_today_appointments")
+def bench_doctor_today(ctx):
+    path = reverse("doctor_today_appointments")
+
+    def one(i):
+        params = {"window": "week" if i % 2 else "today"}
+        return ctx.request("get", ctx.doctor_client, path, data=params)
+
+    return ctx.repeat(one)
+
+
+@scenario("doctor_availability_list")
+def bench_doctor_availability(ctx):
+    path = reverse("doctor_availability_list")
+    return ctx.repeat(lambda i: ctx.request("get", ctx.doctor_client, path))
+
+
+@scenario("patient_history")
+def bench_patient_history(ctx):
+    path = reverse("api_patient_appointments")
+    filters = ("all", "upcoming", "past", "cancelled")
+
+    def one(i):
+        client = ctx.patient_clients[i % len(ctx.patient_clients)]
+        return ctx.request("get", client, path, data={"filter": filters[i % len(filters)]})
+
+    return ctx.repeat(one)
+
+
+@scenario("save_notes")
+def bench_save_notes(ctx):
+    if not ctx.noted:
+        return []
+
+    def one(i):
+        path = reverse("save_notes", args=[ctx.rng.choice(ctx.noted)])
+        data = {
+            "notes": f"Benchmark note {i}. " * 20,
+            "prescription": "Paracetamol 500mg",
+            "follow_up": "One week",
+        }
+        return ctx.request("post", ctx.doctor_client, path, data=data)
+
+    return ctx.repeat(one)
+
+
+@scenario("generate_report")
+def bench_generate_report(ctx):
+    if not ctx.noted:
+        return []
+
+    def one(i):
+        path = reverse("generate_report", args=[ctx.rng.choice(ctx.noted)])
+        return ctx.request("get", ctx.doctor_client, path)
+
+    return ctx.repeat(one)
+
+
+# =====================================================
+# REPORT RENDERING (ONE CORE)
+# =====================================================
+# render_report() called in this process, so per_second is reports per
+# second per core; the batch download scales it by REPORT_RENDER_WORKERS.
+LONG_NOTE = "Patient reports intermittent chest pain on exertion, no radiation. " * 8 + "\n"
+
+
+def _noted_appointments(ctx):
+    from .models import Appointment
+
+    return list(
+        Appointment.objects.select_related("doctor", "patient", "medical_note")
+        .filter(id__in=ctx.noted[:50])
+    )
+
+
+def _render_samples(ctx, appointments, note_for):
+    from .reports import render_report
+
+    samples = []
+    for i in range(ctx.iterations):
+        appointment = appointments[i % len(appointments)]
+        note = note_for(appointment)
+        started = time.perf_counter()
+        render_report(appointment, note)
+        samples.append(Sample(time.perf_counter() - started))
+    return samples
+
+
+@scenario("render_report")
+def bench_render_report(ctx):
+    appointments = _noted_appointments(ctx)
+    if not appointments:
+        return []
+    return _render_samples(ctx, appointments, lambda appointment: appointment.medical_note)
+
+
+@scenario("render_report_multipage")
+def bench_render_report_multipage(ctx):
+    """
+    Notes long enough to run over several pages.
+    """
+    from .models import MedicalNote
+
+    appointments = _noted_appointments(ctx)
+    if not appointments:
+        return []
+
+    def long_note(appointment):
+        note = appointment.medical_note
+        return MedicalNote(
+            appointment=appointment,
+            notes=LONG_NOTE * 40,
+            prescription=note.prescription,
+            follow_up=note.follow_up,
+            updated_at=note.updated_at,
+        )
+
+    return _render_samples(ctx, appointments, long_note)
+
+
+# =====================================================
+# MIDDLEWARE MICROBENCHMARKS
+# =====================================================
+MIDDLEWARE_BATCH = 1000
+UNRELATED_PATHS = (
+    "/static/css/style.css",
+    "/appointments/api/doctors/search/",
+    "/admin/",
+    "/appointments/doctors/",
+)
+
+
+def _logged_in_requests(ctx, count):
+    # Fresh requests with a lazy user backed by the doctor's session, the
+    # way SessionMiddleware + AuthenticationMiddleware leave them
+    from django.contrib.auth import get_user
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.test import RequestFactory
+    from django.utils.functional import SimpleLazyObject
+
+    factory = RequestFactory(HTTP_HOST="localhost")
+    session_key = ctx.doctor_client.session.session_key
+    requests = []
+    for i in range(count):
+        request = factory.get(UNRELATED_PATHS[i % len(UNRELATED_PATHS)])
+        request.session = SessionStore(session_key=session_key)
+        request.user = SimpleLazyObject(lambda request=request: get_user(request))
+        requests.append(request)
+    return requests
+
+
+@scenario("redirect_middleware_x1000")
+def bench_redirect_middleware(ctx):
+    """
+    Cost of RedirectAuthenticatedUserMiddleware on top of a no-op view,
+    per batch of MIDDLEWARE_BATCH logged-in requests to unrelated paths.
+    """
+    from django.http import HttpResponse
+
+    from apps.accounts.middleware import RedirectAuthenticatedUserMiddleware
+
+    def view(request):
+        return HttpResponse()
+
+    middleware = RedirectAuthenticatedUserMiddleware(view)
+    samples = []
+    for _ in range(ctx.iterations):
+        requests = _logged_in_requests(ctx, MIDDLEWARE_BATCH)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for request in requests:
+                middleware(request)
+            elapsed = time.perf_counter() - started
+        samples.append(Sample(elapsed, len(queries)))
+
+    return samples
+
+
+# =====================================================
+# ASGI CONCURRENCY
+# =====================================================
+# The same batch of ctx.concurrency read requests (search, doctor slots,
+# nearest slots), sent one after the other through the WSGI test client
+# and all at once through the ASGI one. One sample is one batch, so
+# per_second is batches per second. Queries are only worth overlapping
+# when they take time: use --db-latency-ms on SQLite.
+def _read_batch(ctx):
+    doctors = ctx.data["doctors"]
+    batch = []
+    for i in range(ctx.concurrency):
+        kind = i % 3
+        if kind == 0:
+            batch.append((reverse("api_search_doctors"), {
+                "name": ctx.rng.choice(doctors).full_name.split()[0][:3],
+                "city": ctx.rng.choice(CITIES) if i % 2 else "",
+            }))
+        elif kind == 1:
+            batch.append((reverse("api_doctor_slots", args=[ctx.rng.choice(doctors).id]), {}))
+        else:
+            batch.append((reverse("api_nearest_slots"), {
+                "specialization": ctx.rng.choice(SPECIALIZATIONS),
+            }))
+    return batch
+
+
+def _batch_status(statuses):
+    # A batch of error pages would time the error handler, not the views
+    bad = sorted(status for status in statuses if status != 200)
+    if bad:
+        raise RuntimeError(f"read batch answered {bad}")
+    return 200
+
+
+def _shared_connection_executor(workers):
+    """
+    DB threads that use this thread's connection, and so see the seeded,
+    uncommitted data, instead of opening their own. Returns
+    (executor, release); call release() after shutting the executor down.
+    """
+    shared = connections[DEFAULT_DB_ALIAS]
+    started = []
+
+    def share():
+        shared.inc_thread_sharing()
+        started.append(1)
+        connections[DEFAULT_DB_ALIAS] = shared
+
+    def release():
+        for _ in started:
+            shared.dec_thread_sharing()
+
+    return ThreadPoolExecutor(max_workers=workers, initializer=share), release
+
+
+@scenario("reads_wsgi_serial")
+def bench_reads_serial(ctx):
+    samples = []
+    for _ in range(ctx.iterations):
+        batch = _read_batch(ctx)
+        statuses = set()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for path, params in batch:
+                statuses.add(ctx.anonymous.get(path, data=params).status_code)
+            elapsed = time.perf_counter() - started
+        samples.append(Sample(elapsed, len(queries), _batch_status(statuses)))
+
+    return samples
+
+
+@scenario("reads_asgi_concurrent")
+def bench_reads_concurrent(ctx):
+    """
+    Needs the views to be async (run_db on a DB thread pool); sync views
+    would be served one at a time on the thread-sensitive thread.
+    """
+    import asyncio
+
+    from .async_db import use_db_executor
+
+    # Sends Host: testserver, allowed by the command's ISOLATED_SETTINGS
+    client = AsyncClient()
+
+    async def send(batch):
+        return await asyncio.gather(*(client.get(path, data=params) for path, params in batch))
+
+    executor, release = _shared_connection_executor(ctx.concurrency)
+    samples = []
+    try:
+        with use_db_executor(executor):
+            for _ in range(ctx.iterations):
+                batch = _read_batch(ctx)
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    # async_to_sync keeps thread-sensitive work (middleware,
+                    # signals) on this thread and its connection
+                    responses = async_to_sync(send)(batch)
+                    elapsed = time.perf_counter() - started
+                status = _batch_status(response.status_code for response in responses)
+                samples.append(Sample(elapsed, len(queries), status))
+    finally:
+        executor.shutdown()
+        release()
+
+    return samples
+
+
+# =====================================================
+# SLOT LOOKUPS: ORM vs IN-MEMORY INDEX
+# =====================================================
+# LOOKUP_BATCH "open slots of doctor X between two dates" lookups per
+# sample, with no HTTP or page cache around them. The index is loaded
+# for every doctor before timing, as a warm process would have it.
+LOOKUP_BATCH = 100
+
+
+def _slot_lookups(ctx):
+    from datetime import date, timedelta
+
+    today = date.today()
+    lookups = []
+    for _ in range(LOOKUP_BATCH):
+        start = today + timedelta(days=ctx.rng.randrange(7))
+        end = start + timedelta(days=ctx.rng.choice((1, 7, 30)))
+        lookups.append((ctx.rng.choice(ctx.data["doctors"]).user_id, start, end))
+    return lookups
+
+
+def _lookup_samples(ctx, doctor_slots):
+    samples = []
+    for _ in range(ctx.iterations):
+        lookups = _slot_lookups(ctx)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for doctor_user_id, start, end in lookups:
+                doctor_slots(doctor_user_id, start, end)
+            elapsed = time.perf_counter() - started
+        samples.append(Sample(elapsed, len(queries)))
+
+    return samples
+
+
+@scenario("doctor_slots_orm_x100")
+def bench_slot_lookups_orm(ctx):
+    from .slots import doctor_slots
+
+    return _lookup_samples(ctx, doctor_slots)
+
+
+@scenario("doctor_slots_index_x100")
+def bench_slot_lookups_index(ctx):
+    from . import slot_index
+
+    slot_index.clear()
+    for doctor in ctx.data["doctors"]:
+        slot_index.doctor_index(doctor.user_id)
+
+    return _lookup_samples(ctx, slot_index.doctor_slots)
@@ -0,0 +1,107 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import ACTIVE_STATUSES, CANCELLED_STATUSES, Appointment, DoctorAvailability
+
+
+class BookingError(Exception):
+    pass
+
+
+# =====================================================
+# ATOMIC SLOT BOOKING
+# =====================================================
+def _has_active_booking(patient_id, availability_id, exclude=None):
+    # What unique_patient_availability guards; checked after an
+    # IntegrityError so that other violations are not mistaken for it
+    return Appointment.objects.filter(
+        patient_id=patient_id,
+        availability_id=availability_id,
+        status__in=ACTIVE_STATUSES
+    ).exclude(pk=exclude).exists()
+
+
+def book_slot(patient_id, availability_id):
+    """
+    Book one seat on a slot for the patient.
+
+    The seat is claimed with a conditional
+    UPDATE ... SET booked_count = booked_count + 1 WHERE booked_count < capacity,
+    so concurrent requests can never push a slot past its capacity.
+    A second active booking of the same slot by the same patient is
+    stopped by the partial unique_patient_availability constraint and
+    rolls the claim back; after a cancellation the patient may book again.
+
+    Raises DoctorAvailability.DoesNotExist / Doctor.DoesNotExist for
+    unknown slots and BookingError when the slot cannot be booked.
+    """
+    try:
+        with transaction.atomic():
+            claimed = DoctorAvailability.objects.filter(
+                id=availability_id,
+                booked_count__lt=F("capacity")
+            ).update(booked_count=F("booked_count") + 1)
+
+            if not claimed:
+                if not DoctorAvailability.objects.filter(id=availability_id).exists():
+                    raise DoctorAvailability.DoesNotExist
+                raise BookingError("Slot is full")
+
+            availability = DoctorAvailability.objects.select_related(
+                "doctor__doctor"
+            ).get(id=availability_id)
+
+            return Appointment.objects.create(
+                doctor=availability.doctor.doctor,
+                patient_id=patient_id,
+                availability=availability,
+                appointment_date=availability.date,
+                start_time=availability.start_time,
+                end_time=availability.end_time,
+                status="scheduled"
+            )
+    except IntegrityError:
+        if _has_active_booking(patient_id, availability_id):
+            raise BookingError("You already booked this slot")
+        raise
+
+
+# =====================================================
+# STATUS CHANGES
+# =====================================================
+def change_status(appointment, status):
+    """
+    Save the appointment with a new status, keeping the slot's
+    booked_count in step in the same transaction.
+
+    Moving into CANCELLED_STATUSES releases the seat with a conditional
+    UPDATE ... SET booked_count = booked_count - 1; moving back out claims
+    one again and raises BookingError when the slot has filled up since.
+    The stored status is re-read under a row lock, so two concurrent
+    cancellations release only one seat. Undoing a cancellation after the
+    patient booked the slot again raises BookingError as well.
+    """
+    try:
+        with transaction.atomic():
+            current = Appointment.objects.select_for_update().values_list(
+                "status", flat=True
+            ).get(pk=appointment.pk)
+
+            was_cancelled = current in CANCELLED_STATUSES
+            if appointment.availability_id and was_cancelled != (status in CANCELLED_STATUSES):
+                slot = DoctorAvailability.objects.filter(id=appointment.availability_id)
+                if not was_cancelled:
+                    slot.filter(booked_count__gt=0).update(booked_count=F("booked_count") - 1)
+                elif not slot.filter(booked_count__lt=F("capacity")).update(
+                    booked_count=F("booked_count") + 1
+                ):
+                    raise BookingError("Slot is full")
+
+            appointment.status = status
+            appointment.save()
+    except IntegrityError:
+        appointment.status = current
+        if _has_active_booking(appointment.patient_id, appointment.availability_id, exclude=appointment.pk):
+            raise BookingError("The patient has booked this slot again")
+        raise
+    return appointment
@@ -0,0 +1,86 @@
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from config.db_router import read_your_writes
+
+
+# =====================================================
+# READ-THROUGH CACHE FOR PUBLIC DIRECTORY PAGES
+# =====================================================
+# Entries live under a namespace whose version number is part of every
+# key. Invalidating a namespace bumps its version, which orphans all of
+# its entries at once (they then age out through their TTL).
+DEFAULT_TIMEOUT = 5 * 60
+
+DOCTORS = "doctors"
+
+_MISSING = object()
+_stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+_stats_lock = threading.Lock()
+
+
+def slots_namespace(doctor_user_id):
+    # DoctorAvailability.doctor points at the User, not the Doctor row
+    return f"slots:{doctor_user_id}"
+
+
+def namespace_version(namespace):
+    # Seeded from the clock so a lost version key can never resurrect
+    # entries written under an older version
+    return cache.get_or_set(f"{namespace}:version", time.time_ns, timeout=None)
+
+
+def _record(name, hit):
+    with _stats_lock:
+        _stats[name]["hits" if hit else "misses"] += 1
+
+
+def cached(name, namespaces, parts, builder, timeout=DEFAULT_TIMEOUT):
+    """
+    Return the cached value for (name, parts), calling builder() and
+    storing its result on a miss. The entry is dropped as soon as any of
+    `namespaces` is invalidated. Hits and misses are counted per name.
+
+    A client pinned to the primary after a write always rebuilds: an entry
+    built from a lagging replica after the invalidation could still hold
+    the old data. Its fresh value replaces that entry for everyone.
+    """
+    versions = [f"{ns}@{namespace_version(ns)}" for ns in namespaces]
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    key = f"{name}:{':'.join(versions)}:{digest}"
+
+    value = _MISSING if read_your_writes() else cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _record(name, hit=True)
+        return value
+
+    _record(name, hit=False)
+    value = builder()
+    cache.set(key, value, timeout)
+    return value
+
+
+def invalidate(namespace):
+    try:
+        cache.incr(f"{namespace}:version")
+    except ValueError:
+        # version key was evicted; the next read seeds a fresh one
+        pass
+
+
+def cache_stats():
+    """
+    Per-process hit/miss counters, keyed by cache entry name.
+    """
+    with _stats_lock:
+        stats = {name: dict(counts) for name, counts in _stats.items()}
+
+    for counts in stats.values():
+        total = counts["hits"] + counts["misses"]
+        counts["hit_ratio"] = round(counts["hits"] / total, 3) if total else None
+
+    return stats
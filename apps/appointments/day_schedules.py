@@ -0,0 +1,244 @@
+from datetime import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from apps.accounts.models import Doctor
+from apps.jobs.queue import enqueue
+
+from .models import Appointment, DoctorAvailability, DoctorDaySchedule
+
+
+# =====================================================
+# DENORMALIZED DOCTOR DAYS
+# =====================================================
+# A DoctorDaySchedule row holds one doctor's day as JSON: slots with
+# booked/remaining counts, appointments with a patient summary (ordered by
+# start time, id) and per-status counters. Rows are never patched: any
+# change queues a job that rebuilds the whole day from the source tables
+# once the change has committed, under a lock on the row, so two
+# concurrent rebuilds can never leave an older picture behind. Requests
+# only insert the job; bookings never queue up on a busy day's row. A
+# doctor's own changes also rebuild their day in the request
+# (refresh_on_commit), so the page they land on is current without a worker.
+REBUILD_BATCH_SIZE = 500
+STATUSES = [key for key, _ in Appointment.STATUS_CHOICES]
+
+
+def _slot_entry(slot):
+    return {
+        "id": slot.id,
+        "start_time": slot.start_time.isoformat(),
+        "end_time": slot.end_time.isoformat(),
+        "capacity": slot.capacity,
+        "booked": slot.booked_count,
+        "remaining": max(slot.capacity - slot.booked_count, 0),
+    }
+
+
+def _appointment_entry(appointment):
+    patient = appointment.patient
+    return {
+        "id": appointment.id,
+        "slot_id": appointment.availability_id,
+        "start_time": appointment.start_time.isoformat(),
+        "end_time": appointment.end_time.isoformat(),
+        "status": appointment.status,
+        "patient": {
+            "id": patient.id,
+            "full_name": patient.full_name,
+            "email": patient.user.email,
+            "phone": patient.phone,
+            "gender": patient.gender,
+            "date_of_birth": patient.date_of_birth.isoformat() if patient.date_of_birth else None,
+            "city": patient.city,
+        },
+    }
+
+
+def build_day(slots, appointments):
+    """
+    Field values of a DoctorDaySchedule for the given slot and appointment
+    rows (both ordered by start time, id).
+    """
+    counts = dict.fromkeys(STATUSES, 0)
+    for appointment in appointments:
+        counts[appointment.status] = counts.get(appointment.status, 0) + 1
+
+    return {
+        "slots": [_slot_entry(slot) for slot in slots],
+        "appointments": [_appointment_entry(appointment) for appointment in appointments],
+        "status_counts": counts,
+    }
+
+
+def _models(registry=None):
+    """
+    (Doctor, DoctorAvailability, Appointment, DoctorDaySchedule), from
+    `registry` when given (the historical models of a migration).
+    """
+    if registry is None:
+        return Doctor, DoctorAvailability, Appointment, DoctorDaySchedule
+    return (
+        registry.get_model("accounts", "Doctor"),
+        registry.get_model("appointments", "DoctorAvailability"),
+        registry.get_model("appointments", "Appointment"),
+        registry.get_model("appointments", "DoctorDaySchedule"),
+    )
+
+
+def _day_sources(doctor_ids, day=None, start=None, end=None, registry=None):
+    """
+    (slots, appointments) of the doctors, both annotated with
+    schedule_doctor_id and ordered by doctor, date, start time, id.
+    """
+    _, DoctorAvailability, Appointment, _ = _models(registry)
+    slots = DoctorAvailability.objects.filter(doctor__doctor__in=doctor_ids).annotate(
+        schedule_doctor_id=F("doctor__doctor__id")
+    )
+    appointments = Appointment.objects.filter(doctor_id__in=doctor_ids).annotate(
+        schedule_doctor_id=F("doctor_id")
+    )
+    if day is not None:
+        slots = slots.filter(date=day)
+        appointments = appointments.filter(appointment_date=day)
+    if start:
+        slots = slots.filter(date__gte=start)
+        appointments = appointments.filter(appointment_date__gte=start)
+    if end:
+        slots = slots.filter(date__lte=end)
+        appointments = appointments.filter(appointment_date__lte=end)
+
+    return (
+        slots.order_by("schedule_doctor_id", "date", "start_time", "id"),
+        appointments.select_related("patient__user").order_by(
+            "doctor_id", "appointment_date", "start_time", "id"
+        ),
+    )
+
+
+# ---------- incremental upkeep ----------
+def refresh_day(doctor_id, day):
+    """
+    Rebuild one doctor's day from the source tables (a day with nothing
+    left is deleted).
+    """
+    try:
+        with transaction.atomic():
+            schedule, _ = DoctorDaySchedule.objects.select_for_update().get_or_create(
+                doctor_id=doctor_id, date=day
+            )
+            slots, appointments = _day_sources([doctor_id], day=day)
+            slots, appointments = list(slots), list(appointments)
+
+            if not slots and not appointments:
+                schedule.delete()
+                return
+
+            for field, value in build_day(slots, appointments).items():
+                setattr(schedule, field, value)
+            schedule.save()
+    except IntegrityError:
+        # Fine if the doctor was deleted since the change was made; anything
+        # else fails the job, which is retried with backoff
+        if Doctor.objects.filter(id=doctor_id).exists():
+            raise
+
+
+def refresh_on_commit(doctor_id, day):
+    """
+    Rebuild the day in this request once the change commits: for a
+    doctor changing their own day, who is redirected to a page reading
+    it. The job the signals queue still runs, and takes over if this
+    rebuild fails. Changes made for other doctors stay on the queue.
+    """
+    transaction.on_commit(lambda: refresh_day(doctor_id, day), robust=True)
+
+
+def queue_refresh(day, doctor_id=None, doctor_user_id=None):
+    """
+    Queue refresh_day() on the job queue (tasks.refresh_day_schedule).
+    The job joins the current transaction, so a worker only sees it once
+    the change has committed; the request itself never waits on the
+    day's row lock. Slots only know the doctor's user id.
+    """
+    if day is None or (doctor_id is None and doctor_user_id is None):
+        return
+    if not isinstance(day, str):
+        day = day.isoformat()
+
+    enqueue("appointments.refresh_day_schedule", {
+        "day": day, "doctor_id": doctor_id, "doctor_user_id": doctor_user_id,
+    })
+
+
+# ---------- full rebuild ----------
+def rebuild_schedules(doctor_ids=None, start=None, end=None, batch_size=REBUILD_BATCH_SIZE,
+                      registry=None):
+    """
+    Recompute every day (optionally only some doctors or a date range)
+    from scratch, batch_size doctors at a time with two reads each.
+    Migrations pass their app registry. Returns the number of rows written.
+    Rows are replaced without the lock refresh_day() takes: for migrations
+    and the rebuild command, not for request paths (use queue_refresh()).
+    """
+    Doctor, _, _, DoctorDaySchedule = _models(registry)
+    if doctor_ids is None:
+        doctor_ids = Doctor.objects.order_by("id").values_list("id", flat=True)
+    doctor_ids = list(doctor_ids)
+
+    written = 0
+    for offset in range(0, len(doctor_ids), batch_size):
+        chunk = doctor_ids[offset:offset + batch_size]
+        slots, appointments = _day_sources(chunk, start=start, end=end, registry=registry)
+
+        days = {}
+        for slot in slots:
+            days.setdefault((slot.schedule_doctor_id, slot.date), ([], []))[0].append(slot)
+        for appointment in appointments:
+            key = (appointment.doctor_id, appointment.appointment_date)
+            days.setdefault(key, ([], []))[1].append(appointment)
+
+        rows = [
+            DoctorDaySchedule(doctor_id=doctor_id, date=day, **build_day(*days[doctor_id, day]))
+            for doctor_id, day in sorted(days)
+        ]
+
+        with transaction.atomic():
+            stale = DoctorDaySchedule.objects.filter(doctor_id__in=chunk)
+            if start:
+                stale = stale.filter(date__gte=start)
+            if end:
+                stale = stale.filter(date__lte=end)
+            stale.delete()
+            DoctorDaySchedule.objects.bulk_create(rows, batch_size=batch_size)
+
+        written += len(rows)
+
+    return written
+
+
+# ---------- reads ----------
+def doctor_days(doctor_id):
+    return DoctorDaySchedule.objects.filter(doctor_id=doctor_id).order_by("date")
+
+
+def day_slots(days):
+    """
+    The slots of `days` as dicts with real date/time values, each with the
+    patients booked on it.
+    """
+    rows = []
+    for day in days:
+        patients = {}
+        for entry in day.appointments:
+            patients.setdefault(entry["slot_id"], []).append(entry["patient"]["full_name"])
+        for entry in day.slots:
+            rows.append({
+                **entry,
+                "date": day.date,
+                "start_time": time.fromisoformat(entry["start_time"]),
+                "end_time": time.fromisoformat(entry["end_time"]),
+                "patients": patients.get(entry["id"], []),
+            })
+    return rows
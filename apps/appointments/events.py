@@ -0,0 +1,100 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+
+# =====================================================
+# IN-PROCESS PUB/SUB FOR APPOINTMENT STATUS CHANGES
+# =====================================================
+# Publishers are ordinary (sync) Appointment saves; subscribers are SSE
+# streams waiting on an asyncio.Queue in the ASGI event loop. Only streams
+# served by the same process see an event, so the stream always starts
+# from a database snapshot and clients reconnect periodically.
+QUEUE_SIZE = 100
+
+_subscribers = defaultdict(set)
+_lock = threading.Lock()
+
+
+class Subscription:
+    def __init__(self, doctor_id):
+        self.doctor_id = doctor_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Runs in the subscriber's loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow reader: it resyncs from a fresh snapshot instead
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """
+        Next event, or None when nothing arrived within `timeout` seconds.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def subscribe(doctor_id):
+    """
+    Must be called from the event loop that will consume the events.
+    """
+    subscription = Subscription(doctor_id)
+    with _lock:
+        _subscribers[doctor_id].add(subscription)
+    return subscription
+
+
+def unsubscribe(subscription):
+    with _lock:
+        subscribers = _subscribers.get(subscription.doctor_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del _subscribers[subscription.doctor_id]
+
+
+def publish(doctor_id, event):
+    """
+    Hand `event` to every stream of this doctor. Safe to call from any
+    thread; never blocks.
+    """
+    with _lock:
+        subscribers = list(_subscribers.get(doctor_id, ()))
+
+    for subscription in subscribers:
+        try:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+        except RuntimeError:
+            # loop already closed; the stream is gone
+            unsubscribe(subscription)
+
+
+def subscriber_count():
+    with _lock:
+        return sum(len(subscribers) for subscribers in _subscribers.values())
+
+
+# =====================================================
+# EVENT PAYLOADS / SSE FRAMING
+# =====================================================
+def appointment_event(appointment, deleted=False):
+    return {
+        "id": appointment.pk,
+        # str() also covers dates still holding the raw POSTed string
+        "date": str(appointment.appointment_date),
+        "status": None if deleted else appointment.status,
+        "status_label": None if deleted else appointment.get_status_display(),
+        "deleted": deleted,
+    }
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
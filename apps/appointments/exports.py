@@ -0,0 +1,113 @@
+import csv
+import json
+from datetime import date
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from .models import Appointment
+
+
+# =====================================================
+# STREAMING APPOINTMENT EXPORT (CSV / NDJSON)
+# =====================================================
+# One query (appointment joined with doctor, patient, patient user and a
+# LEFT JOIN on the medical note) read through iterator(), which uses a
+# server-side cursor on Postgres, and turned into text row by row. Memory
+# stays flat whatever the number of rows.
+EXPORT_CHUNK_SIZE = 2000
+FORMATS = ("csv", "ndjson")
+
+EXPORT_FIELDS = (
+    ("appointment_id", "id"),
+    ("appointment_date", "appointment_date"),
+    ("start_time", "start_time"),
+    ("end_time", "end_time"),
+    ("status", "status"),
+    ("reason", "reason"),
+    ("created_at", "created_at"),
+    ("doctor_id", "doctor_id"),
+    ("doctor_name", "doctor__full_name"),
+    ("specialization", "doctor__specialization"),
+    ("clinic_name", "doctor__clinic_name"),
+    ("doctor_city", "doctor__city"),
+    ("patient_id", "patient_id"),
+    ("patient_name", "patient__full_name"),
+    ("patient_email", "patient__user__email"),
+    ("patient_gender", "patient__gender"),
+    ("patient_city", "patient__city"),
+    ("notes", "medical_note__notes"),
+    ("prescription", "medical_note__prescription"),
+    ("follow_up", "medical_note__follow_up"),
+)
+HEADERS = [header for header, _ in EXPORT_FIELDS]
+
+
+def parse_export_filters(start=None, end=None, doctor=None, status=None):
+    """
+    Filters from raw strings; dates default to today, status may be a
+    comma separated list. Raises ValueError for malformed input.
+    """
+    start = date.fromisoformat(start) if start else date.today()
+    end = date.fromisoformat(end) if end else start
+    if end < start:
+        raise ValueError("end is before start")
+
+    statuses = [s for s in (status or "").split(",") if s]
+    known = {key for key, _ in Appointment.STATUS_CHOICES}
+    unknown = set(statuses) - known
+    if unknown:
+        raise ValueError(f"Unknown status: {', '.join(sorted(unknown))}")
+
+    return {
+        "start": start,
+        "end": end,
+        "doctor_id": int(doctor) if doctor else None,
+        "statuses": statuses,
+    }
+
+
+def export_rows(start, end, doctor_id=None, statuses=(), chunk_size=EXPORT_CHUNK_SIZE):
+    appointments = Appointment.objects.filter(appointment_date__range=(start, end))
+    if doctor_id:
+        appointments = appointments.filter(doctor_id=doctor_id)
+    if statuses:
+        appointments = appointments.filter(status__in=statuses)
+
+    return appointments.order_by("appointment_date", "start_time", "id").values_list(
+        *[lookup for _, lookup in EXPORT_FIELDS]
+    ).iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    # csv.writer target that hands back each formatted line
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADERS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(HEADERS, row)), default=str) + "\n"
+
+
+def export_lines(fmt, **filters):
+    rows = export_rows(**filters)
+    return csv_lines(rows) if fmt == "csv" else ndjson_lines(rows)
+
+
+async def async_batches(lines, batch_size=500):
+    """
+    Serve a sync generator of str or bytes from ASGI without buffering it
+    whole (Django 4.2 would list() a sync iterator). Batches are pulled on
+    the thread-sensitive executor, i.e. the thread that owns the cursor.
+    """
+    next_batch = sync_to_async(lambda: list(islice(lines, batch_size)))
+    while batch := await next_batch():
+        yield batch[0][:0].join(batch)
@@ -1,7 +1,54 @@
+from datetime import datetime, timedelta
+
 from django import forms
 from .models import DoctorAvailability
 
 class DoctorAvailabilityForm(forms.ModelForm):
     class Meta:
         model = DoctorAvailability
-        fields = ['date', 'start_time', 'end_time', 'capacity']
\ No newline at end of file
+        fields = ['date', 'start_time', 'end_time', 'capacity']
+
+
+class RecurringAvailabilityForm(forms.Form):
+    """
+    A weekly template, e.g. Mon–Fri 09:00–13:00 in 30-minute slots,
+    capacity 4, for 12 weeks.
+    """
+    WEEKDAY_CHOICES = (
+        (0, 'Mon'),
+        (1, 'Tue'),
+        (2, 'Wed'),
+        (3, 'Thu'),
+        (4, 'Fri'),
+        (5, 'Sat'),
+        (6, 'Sun'),
+    )
+
+    weekdays = forms.TypedMultipleChoiceField(
+        choices=WEEKDAY_CHOICES,
+        coerce=int,
+        widget=forms.CheckboxSelectMultiple,
+    )
+    start_date = forms.DateField()
+    weeks = forms.IntegerField(min_value=1, max_value=52, initial=12)
+
+    start_time = forms.TimeField()
+    end_time = forms.TimeField()
+    slot_minutes = forms.IntegerField(min_value=5, max_value=480, initial=30)
+    capacity = forms.IntegerField(min_value=1, initial=4)
+
+    def clean(self):
+        cleaned = super().clean()
+        start_time = cleaned.get("start_time")
+        end_time = cleaned.get("end_time")
+        slot_minutes = cleaned.get("slot_minutes")
+
+        if start_time and end_time and slot_minutes:
+            day = datetime.min
+            window = datetime.combine(day, end_time) - datetime.combine(day, start_time)
+            if window < timedelta(minutes=slot_minutes):
+                raise forms.ValidationError(
+                    "End time must leave room for at least one slot after the start time."
+                )
+
+        return cleaned
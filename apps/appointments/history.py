@@ -0,0 +1,126 @@
+from datetime import date
+
+from django.db.models import Count, Q
+from django.urls import reverse
+
+from .models import ACTIVE_STATUSES, CANCELLED_STATUSES, Appointment
+from .pagination import paginate_keyset
+
+
+# =====================================================
+# PATIENT APPOINTMENT HISTORY
+# =====================================================
+# Filters split a patient's appointments into three disjoint groups:
+# upcoming (still active, today or later), cancelled, and past
+# (everything else). Pages are keyset-paginated over
+# (appointment_date, start_time, id), served by appt_patient_date_time_idx;
+# upcoming reads soonest first, the others most recent first.
+HISTORY_ORDER = ("appointment_date", "start_time", "id")
+HISTORY_FILTERS = ("all", "upcoming", "past", "cancelled")
+HISTORY_PAGE_SIZE = 20
+
+
+def history_filters(today=None):
+    today = today or date.today()
+    upcoming = Q(appointment_date__gte=today, status__in=ACTIVE_STATUSES)
+    cancelled = Q(status__in=CANCELLED_STATUSES)
+    return {
+        "upcoming": upcoming,
+        "cancelled": cancelled,
+        "past": ~upcoming & ~cancelled,
+    }
+
+
+def history_counts(patient_id, today=None):
+    """
+    {"all": n, "upcoming": n, "past": n, "cancelled": n} in one query.
+    """
+    counts = Appointment.objects.filter(patient_id=patient_id).aggregate(
+        all=Count("id"),
+        **{
+            name: Count("id", filter=condition)
+            for name, condition in history_filters(today).items()
+        }
+    )
+    return {name: counts[name] for name in HISTORY_FILTERS}
+
+
+def patient_history(patient_id, history_filter="all", cursor=None,
+                    limit=HISTORY_PAGE_SIZE, today=None):
+    """
+    One page of a patient's appointments with their doctor as
+    (appointments, next_cursor). Raises ValueError for an unknown filter
+    or a bad cursor.
+    """
+    if history_filter not in HISTORY_FILTERS:
+        raise ValueError(f"filter must be one of {', '.join(HISTORY_FILTERS)}")
+
+    appointments = Appointment.objects.filter(patient_id=patient_id)
+    if history_filter != "all":
+        appointments = appointments.filter(history_filters(today)[history_filter])
+
+    return paginate_keyset(
+        appointments.select_related("doctor"),
+        HISTORY_ORDER,
+        cursor=cursor,
+        limit=limit,
+        descending=history_filter != "upcoming",
+    )
+
+
+# =====================================================
+# DOCTOR APPOINTMENTS (doctor_today_appointments)
+# =====================================================
+# One date window of a doctor's appointments, keyset-paginated over
+# HISTORY_ORDER and served by appt_doctor_date_time_idx.
+def doctor_window(doctor_id, start, end):
+    return Appointment.objects.filter(doctor_id=doctor_id, appointment_date__range=(start, end))
+
+
+def window_counts(doctor_id, start, end):
+    """
+    {"total": n, <status>: n, ...} for the window in one query.
+    """
+    return doctor_window(doctor_id, start, end).aggregate(
+        total=Count("id"),
+        **{
+            key: Count("id", filter=Q(status=key))
+            for key, _ in Appointment.STATUS_CHOICES
+        }
+    )
+
+
+def doctor_appointments(doctor_id, start, end, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """
+    One page of the window with each patient as (appointments,
+    next_cursor), earliest first. Raises ValueError for a bad cursor.
+    """
+    return paginate_keyset(
+        doctor_window(doctor_id, start, end).select_related("patient", "patient__user"),
+        HISTORY_ORDER,
+        cursor=cursor,
+        limit=limit,
+    )
+
+
+def history_to_dict(appointment):
+    status = appointment.status
+    return {
+        "id": appointment.id,
+        "doctor": {
+            "id": appointment.doctor_id,
+            "full_name": appointment.doctor.full_name,
+            "specialization": appointment.doctor.specialization,
+        },
+        "appointment_date": appointment.appointment_date.isoformat(),
+        "start_time": appointment.start_time.strftime("%H:%M"),
+        "end_time": appointment.end_time.strftime("%H:%M"),
+        "status": status,
+        "status_label": appointment.get_status_display(),
+        "checkin_url": reverse("patient_checkin_appointment", args=[appointment.id])
+        if status == "scheduled" else None,
+        "cancel_url": reverse("patient_cancel_appointment", args=[appointment.id])
+        if status == "scheduled" else None,
+        "report_url": reverse("report_preview", args=[appointment.id]) + "?download=1"
+        if status == "completed" else None,
+    }
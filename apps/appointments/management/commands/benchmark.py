@@ -0,0 +1,156 @@
+import logging
+import platform
+import time
+from contextlib import ExitStack
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection, transaction
+from django.test.utils import override_settings
+
+from apps.appointments import reports
+from apps.appointments.benchmarks import (
+    SCENARIOS, BenchContext, compare, load_baseline, save_baseline, summarize,
+)
+from apps.appointments.seed import seed_data
+
+
+class Rollback(Exception):
+    pass
+
+
+def _delayed(seconds):
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    return wrapper
+
+
+# Benchmarks must not touch the shared cache or the real report storage.
+# AsyncClient always sends Host: testserver (its scope has no HTTP_HOST
+# default to override), so that host is allowed for the run.
+ISOLATED_SETTINGS = {
+    "ALLOWED_HOSTS": ["localhost", "testserver"],
+    "CACHES": {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "benchmark",
+        }
+    },
+    "REPORT_FILE_STORAGE": "django.core.files.storage.InMemoryStorage",
+}
+COLD_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway dataset, drive every appointments endpoint through "
+        "the test client and report p50/p95/p99 latency and queries per "
+        "request. Optionally compare against a saved baseline and fail on "
+        "regressions. Nothing is kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--doctors", type=int, default=100)
+        parser.add_argument("--patients", type=int, default=1000)
+        parser.add_argument("--slots-per-doctor", type=int, default=40)
+        parser.add_argument("--appointments", type=int, default=3000)
+        parser.add_argument("--iterations", type=int, default=100)
+        parser.add_argument("--only", nargs="+", choices=sorted(SCENARIOS),
+                            help="Run just these scenarios")
+        parser.add_argument("--concurrency", type=int, default=16,
+                            help="Requests in flight for the ASGI concurrency scenarios")
+        parser.add_argument("--db-latency-ms", type=float, default=0,
+                            help="Add this much latency to every query (simulates a networked database)")
+        parser.add_argument("--cold-cache", action="store_true",
+                            help="Disable the cache so every read hits the database")
+        parser.add_argument("--baseline", help="JSON file to compare against")
+        parser.add_argument("--save-baseline", help="Write the results to this JSON file")
+        parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="Allowed p95 slowdown over the baseline (0.2 = 20%%)")
+
+    def handle(self, *args, **options):
+        names = options["only"] or list(SCENARIOS)
+        settings = dict(ISOLATED_SETTINGS)
+        if options["cold_cache"]:
+            settings["CACHES"] = COLD_CACHE
+
+        # The test client fires request_started/finished, which would close
+        # the connection (and lose the seeded data) inside our transaction
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        reports.report_storage.cache_clear()
+
+        # Expected 4xx responses (full slots, double bookings) are not news here
+        request_log = logging.getLogger("django.request")
+        log_level = request_log.level
+        request_log.setLevel(logging.ERROR)
+
+        results = {}
+        try:
+            with override_settings(**settings), transaction.atomic(), ExitStack() as stack:
+                if options["db_latency_ms"]:
+                    stack.enter_context(connection.execute_wrapper(
+                        _delayed(options["db_latency_ms"] / 1000)
+                    ))
+                data = seed_data(
+                    doctors=options["doctors"],
+                    patients=options["patients"],
+                    slots_per_doctor=options["slots_per_doctor"],
+                    appointments=options["appointments"],
+                )
+                ctx = BenchContext(
+                    data, iterations=options["iterations"], concurrency=options["concurrency"]
+                )
+
+                for name in names:
+                    samples = SCENARIOS[name](ctx)
+                    if not samples:
+                        self.stdout.write(self.style.WARNING(f"{name:<32} skipped (no data)"))
+                        continue
+                    results[name] = summarize(samples)
+                    self.write_row(name, results[name])
+
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+            reports.report_storage.cache_clear()
+            request_log.setLevel(log_level)
+
+        if options["save_baseline"]:
+            save_baseline(options["save_baseline"], results, {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "vendor": connection.vendor,
+                "python": platform.python_version(),
+                "iterations": options["iterations"],
+                "cold_cache": options["cold_cache"],
+                "concurrency": options["concurrency"],
+                "db_latency_ms": options["db_latency_ms"],
+            })
+            self.stdout.write(f"Baseline written to {options['save_baseline']}")
+
+        if options["baseline"]:
+            baseline = load_baseline(options["baseline"])
+            if not baseline:
+                raise CommandError(f"No baseline found at {options['baseline']}")
+
+            regressions = compare(results, baseline, options["tolerance"])
+            for name, reasons in regressions.items():
+                self.stdout.write(self.style.ERROR(f"REGRESSION {name}: {'; '.join(reasons)}"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} scenario(s) regressed")
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
+
+    def write_row(self, name, row):
+        statuses = " ".join(f"{code}x{count}" for code, count in row["statuses"].items())
+        self.stdout.write(
+            f"{name:<32} n={row['n']:<5} {row['per_second']:>8.1f}/s "
+            f"p50={row['p50']:>8.2f}ms "
+            f"p95={row['p95']:>8.2f}ms p99={row['p99']:>8.2f}ms "
+            f"queries={row['queries']:>6.2f}  [{statuses}]"
+        )
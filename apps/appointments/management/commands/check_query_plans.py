@@ -0,0 +1,178 @@
+import re
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+
+from apps.appointments import slot_index
+from apps.appointments.booking import book_slot
+from apps.appointments.day_schedules import doctor_days, refresh_day
+from apps.appointments.history import (
+    doctor_appointments, history_counts, patient_history, window_counts,
+)
+from apps.appointments.models import Appointment, DoctorAvailability
+from apps.appointments.reports import report_appointments
+from apps.appointments.search import doctor_listing, search_doctors
+from apps.appointments.seed import seed_data
+from apps.appointments.slots import nearest_open_slots, upcoming
+
+# Statements worth a plan; inserts and transaction control are left out
+EXPLAINED = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+class Rollback(Exception):
+    pass
+
+
+def hot_paths(data, vendor):
+    """
+    What each view runs, as (name, call, indexes) triples: call goes
+    through the same helper the view uses, against ids taken from the
+    seeded dataset, and indexes names the indexes its plans must use on
+    this backend. Primary key and unique lookups are named on Postgres
+    only; SQLite calls those sqlite_autoindex_<table>_<n>.
+    """
+    pg = vendor == "postgresql"
+    doctor = data["doctors"][0]
+    patient = data["appointments"][0].patient
+    appointment = data["appointments"][0]
+    today = date.today()
+
+    booked = Appointment.objects.filter(
+        patient_id=patient.id, availability__isnull=False
+    ).values("availability_id")
+    free_slot = DoctorAvailability.objects.filter(
+        upcoming(), booked_count__lt=F("capacity")
+    ).exclude(id__in=booked).order_by("id").first()
+
+    def doctor_slot_index():
+        slot_index.clear()
+        slot_index.doctor_index(doctor.user_id)
+
+    paths = [
+        # substring search needs pg_trgm; SQLite has no index for LIKE '%x%'
+        ("api_search_doctors", lambda: search_doctors({"full_name": doctor.full_name}),
+         ("accounts_doctor_full_name_trgm",) if pg else ()),
+        ("api_doctor_slots", doctor_slot_index, ("avail_doctor_date_time_idx",)),
+        # should walk the open-slot partial index, probing doctors by user_id
+        ("api_nearest_slots", lambda: nearest_open_slots(
+            today, today + timedelta(days=30),
+            specialization=doctor.specialization, city=doctor.city,
+        ), ("avail_open_date_time_idx",)),
+        ("doctor_availability_list", lambda: list(doctor_days(doctor.id)),
+         ("unique_doctor_day_schedule",) if pg else ()),
+        ("doctor_today_appointments: counters", lambda: window_counts(doctor.id, today, today + timedelta(days=6)),
+         ("appt_doctor_date_time_idx",)),
+        ("doctor_today_appointments: page", lambda: doctor_appointments(doctor.id, today, today + timedelta(days=6)),
+         ("appt_doctor_date_time_idx",)),
+        # what the refresh_day_schedule job runs after a change
+        ("refresh_day", lambda: refresh_day(doctor.id, today),
+         ("avail_doctor_date_time_idx", "appt_doctor_date_time_idx")),
+        ("patient_appointments_status: counters", lambda: history_counts(patient.id),
+         ("appt_patient_date_time_idx",)),
+        ("patient_appointments_status: page", lambda: patient_history(patient.id, "past"),
+         ("appt_patient_date_time_idx",)),
+        ("generate_report", lambda: report_appointments().get(id=appointment.id),
+         ("appointments_appointment_pkey",) if pg else ()),
+        # unfiltered listing: every row is read, a table scan is the right plan
+        ("doctor_list_page", lambda: list(doctor_listing()), ()),
+    ]
+    if free_slot is not None:
+        paths.insert(1, ("create_appointment_api", lambda: book_slot(patient.id, free_slot.id),
+                         ("appointments_doctoravailability_pkey",) if pg else ()))
+    return paths
+
+
+def explain(sql, vendor):
+    with connection.cursor() as cursor:
+        if vendor == "postgresql":
+            cursor.execute(f"EXPLAIN {sql}")
+            return "\n".join(row[0] for row in cursor.fetchall())
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+
+def sequential_scans(plan, vendor):
+    if vendor == "postgresql":
+        return re.findall(r"Seq Scan on (\w+)", plan)
+    if vendor == "sqlite":
+        # "SCAN t" is a full table scan, "SCAN t USING [COVERING] INDEX i" is not
+        return re.findall(r"\bSCAN (\w+)(?! USING)", plan)
+    return []
+
+
+def used_indexes(plan, vendor):
+    if vendor == "postgresql":
+        return set(re.findall(r"(?:Index (?:Only )?Scan(?: Backward)? using|Bitmap Index Scan on) (\w+)", plan))
+    return set(re.findall(r"USING (?:COVERING )?INDEX (\w+)", plan))
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway dataset, run the helpers behind each appointments "
+        "view, EXPLAIN every query they send with the planner's default "
+        "settings and fail if a view's plans do not use the indexes it "
+        "relies on. Nothing is kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--doctors", type=int, default=200)
+        parser.add_argument("--patients", type=int, default=2000)
+        parser.add_argument("--slots-per-doctor", type=int, default=40)
+        parser.add_argument("--appointments", type=int, default=5000)
+        parser.add_argument("--show-plans", action="store_true")
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in ("postgresql", "sqlite"):
+            raise CommandError(f"Plan checks are not implemented for {vendor}")
+
+        failures = []
+        try:
+            with transaction.atomic():
+                data = seed_data(
+                    doctors=options["doctors"],
+                    patients=options["patients"],
+                    slots_per_doctor=options["slots_per_doctor"],
+                    appointments=options["appointments"],
+                )
+
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+
+                for name, call, indexes in hot_paths(data, vendor):
+                    with CaptureQueriesContext(connection) as queries:
+                        call()
+
+                    plans = [
+                        (q["sql"], explain(q["sql"], vendor)) for q in queries
+                        if q["sql"].lstrip().upper().startswith(EXPLAINED)
+                    ]
+                    used = set()
+                    scans = set()
+                    for _, plan in plans:
+                        used |= used_indexes(plan, vendor)
+                        scans |= set(sequential_scans(plan, vendor))
+                    missing = [index for index in indexes if index not in used]
+
+                    if missing:
+                        failures.append(name)
+                        self.stdout.write(self.style.ERROR(f"MISSING   {name}: {', '.join(missing)}"))
+                    else:
+                        self.stdout.write(self.style.SUCCESS(f"ok        {name}"))
+                    if scans:
+                        # A scan of a small or mostly-read table can be the cheaper plan
+                        self.stdout.write(f"          table scan: {', '.join(sorted(scans))}")
+
+                    if missing or options["show_plans"]:
+                        for sql, plan in plans:
+                            self.stdout.write(f"{sql}\n{plan}\n")
+
+                raise Rollback
+        except Rollback:
+            pass
+
+        if failures:
+            raise CommandError(f"{len(failures)} view(s) do not use their indexes")
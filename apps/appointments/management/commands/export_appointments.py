@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.appointments.exports import (
+    EXPORT_CHUNK_SIZE, FORMATS, export_rows, csv_lines, ndjson_lines, parse_export_filters,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream appointments with doctor, patient and medical note data as CSV "
+        "or NDJSON. Dates default to today."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="YYYY-MM-DD (default: today)")
+        parser.add_argument("--end", help="YYYY-MM-DD (default: --start)")
+        parser.add_argument("--doctor", help="Doctor id")
+        parser.add_argument("--status", help="Comma separated statuses")
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--output", help="File to write (default: stdout)")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_export_filters(
+                options["start"], options["end"], options["doctor"], options["status"]
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        rows = export_rows(**filters, chunk_size=options["chunk_size"])
+        lines = csv_lines(rows) if options["format"] == "csv" else ndjson_lines(rows)
+
+        out = open(options["output"], "w", newline="") if options["output"] else sys.stdout
+        count = -1 if options["format"] == "csv" else 0  # header line
+        try:
+            for line in lines:
+                out.write(line)
+                count += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        if options["output"]:
+            self.stdout.write(self.style.SUCCESS(f"Exported {count} appointments to {options['output']}"))
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.appointments.day_schedules import rebuild_schedules
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the denormalized doctor day schedules from appointments "
+        "and availability slots (all doctors and dates by default)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--doctor", type=int, action="append", help="Doctor id (repeatable)")
+        parser.add_argument("--start", help="YYYY-MM-DD")
+        parser.add_argument("--end", help="YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else None
+            end = date.fromisoformat(options["end"]) if options["end"] else None
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if start and end and end < start:
+            raise CommandError("end is before start")
+
+        written = rebuild_schedules(doctor_ids=options["doctor"], start=start, end=end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} doctor days"))
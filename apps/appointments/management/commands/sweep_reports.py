@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.appointments.models import Appointment
+from apps.appointments.reports import report_name_from_url, report_storage, stale_reports
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored report PDFs that no appointment points at any more "
+        "(superseded by edited notes or left over by concurrent renders)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=60,
+                            help="Only files last written this many minutes ago (default 60), "
+                                 "so renders in flight are left alone")
+        parser.add_argument("--dry-run", action="store_true", help="List the files without deleting them")
+
+    def handle(self, *args, **options):
+        storage = report_storage()
+        referenced = {
+            report_name_from_url(url)
+            for url in Appointment.objects.exclude(report_pdf="").exclude(
+                report_pdf__isnull=True
+            ).values_list("report_pdf", flat=True).iterator()
+        }
+        older_than = timezone.now() - timedelta(minutes=options["older_than"])
+
+        try:
+            stale = stale_reports(storage, referenced, older_than)
+        except NotImplementedError:
+            raise CommandError("The report storage cannot list its files")
+
+        for name in stale:
+            if options["dry_run"]:
+                self.stdout.write(name)
+            else:
+                storage.delete(name)
+
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(stale)} report file(s)"))
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:17
+
+from django.db import migrations, models
+
+
+def detach_duplicate_bookings(apps, schema_editor):
+    # The old exists()-then-create check let a patient book the same slot
+    # twice. Keep one booking per (patient, slot), preferring one that is
+    # still active, and unlink the others from the slot (their date and
+    # times stay) so that unique_patient_availability can be added.
+    Appointment = apps.get_model('appointments', 'Appointment')
+
+    duplicated = (
+        Appointment.objects
+        .filter(availability__isnull=False)
+        .values_list('patient', 'availability')
+        .annotate(total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+    for patient_id, availability_id, _ in duplicated:
+        bookings = Appointment.objects.filter(
+            patient_id=patient_id, availability_id=availability_id
+        ).annotate(
+            inactive=models.Case(
+                models.When(status__in=('cancelled_by_patient', 'doctor_unavailable'), then=1),
+                default=0,
+                output_field=models.IntegerField(),
+            )
+        ).order_by('inactive', 'id')
+        keep = bookings.values_list('id', flat=True).first()
+        bookings.exclude(id=keep).update(availability=None)
+
+
+def backfill_booked_count(apps, schema_editor):
+    DoctorAvailability = apps.get_model('appointments', 'DoctorAvailability')
+    Appointment = apps.get_model('appointments', 'Appointment')
+
+    counts = (
+        Appointment.objects
+        .filter(availability__isnull=False)
+        .values_list('availability')
+        .annotate(total=models.Count('id'))
+    )
+    for availability_id, total in counts:
+        DoctorAvailability.objects.filter(pk=availability_id).update(booked_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0009_appointment_availability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctoravailability',
+            name='booked_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        # Counts what is left once duplicates are unlinked
+        migrations.RunPython(detach_duplicate_bookings, migrations.RunPython.noop),
+        migrations.RunPython(backfill_booked_count, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(fields=('patient', 'availability'), name='unique_patient_availability'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0010_doctoravailability_booked_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicalnote',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
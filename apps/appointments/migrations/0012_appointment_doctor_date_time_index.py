@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0011_medicalnote_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'appointment_date', 'start_time'], name='appt_doctor_date_time_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0012_appointment_doctor_date_time_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status__in', ('scheduled', 'checked_in', 'in_progress'))), fields=['doctor', 'appointment_date'], name='appt_doctor_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctoravailability',
+            index=models.Index(fields=['doctor', 'date', 'start_time'], name='avail_doctor_date_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctoravailability',
+            index=models.Index(condition=models.Q(('booked_count__lt', models.F('capacity'))), fields=['date', 'start_time'], name='avail_open_date_time_idx'),
+        ),
+    ]
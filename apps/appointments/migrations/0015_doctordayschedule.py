@@ -0,0 +1,39 @@
+# Generated by Django 4.2.11 on 2026-10-18 20:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_day_schedules(apps, schema_editor):
+    # The doctor pages read nothing but this table
+    from apps.appointments.day_schedules import rebuild_schedules
+
+    rebuild_schedules(registry=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_doctor_search_trgm_indexes'),
+        ('appointments', '0014_appointment_patient_date_time_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorDaySchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('slots', models.JSONField(default=list)),
+                ('appointments', models.JSONField(default=list)),
+                ('status_counts', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_schedules', to='accounts.doctor')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='doctordayschedule',
+            constraint=models.UniqueConstraint(fields=('doctor', 'date'), name='unique_doctor_day_schedule'),
+        ),
+        migrations.RunPython(fill_day_schedules, migrations.RunPython.noop),
+    ]
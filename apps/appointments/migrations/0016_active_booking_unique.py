@@ -0,0 +1,21 @@
+# Generated by Django 4.2.11 on 2026-10-18 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0015_doctordayschedule'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='appointment',
+            name='unique_patient_availability',
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('scheduled', 'checked_in', 'in_progress'))), fields=('patient', 'availability'), name='unique_patient_availability'),
+        ),
+    ]
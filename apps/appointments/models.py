@@ -10,6 +10,11 @@ from apps.accounts.models import Doctor, Patient
 from django.db import models
 from django.utils import timezone
 
+# Appointments that still need the doctor's attention
+ACTIVE_STATUSES = ("scheduled", "checked_in", "in_progress")
+CANCELLED_STATUSES = ("cancelled_by_patient", "doctor_unavailable")
+
+
 class Appointment(models.Model):
 
     STATUS_CHOICES = (
@@ -60,6 +65,35 @@ class Appointment(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # one live booking per patient and slot; a cancelled booking
+            # does not stop the patient from booking the slot again
+            models.UniqueConstraint(
+                fields=["patient", "availability"],
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+                name="unique_patient_availability",
+            ),
+        ]
+        indexes = [
+            # doctor_today_appointments: date window + keyset order
+            models.Index(
+                fields=["doctor", "appointment_date", "start_time"],
+                name="appt_doctor_date_time_idx",
+            ),
+            # active appointments only: queue/status views for a doctor's day
+            models.Index(
+                fields=["doctor", "appointment_date"],
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+                name="appt_doctor_active_idx",
+            ),
+            # patient history: per-patient filters + keyset order
+            models.Index(
+                fields=["patient", "appointment_date", "start_time"],
+                name="appt_patient_date_time_idx",
+            ),
+        ]
+
     def is_upcoming(self):
         return self.appointment_date >= timezone.now().date()
 
@@ -80,6 +114,7 @@ class MedicalNote(models.Model):
     follow_up = models.TextField(blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Notes for {self.appointment}"
@@ -106,6 +141,12 @@ class DoctorAvailability(models.Model):
         default=5
     )  # Maximum patients per slot
 
+    # Denormalized number of appointments on this slot, kept in step by
+    # booking.book_slot() and the Appointment post_delete signal.
+    booked_count = models.PositiveIntegerField(
+        default=0
+    )
+
     # ✅ Correct way (no auto_now_add here)
     created_at = models.DateTimeField(
         default=timezone.now
@@ -113,6 +154,56 @@ class DoctorAvailability(models.Model):
 
     class Meta:
         ordering = ['date', 'start_time']
+        indexes = [
+            # book_appointment_page / doctor_availability_list
+            models.Index(
+                fields=["doctor", "date", "start_time"],
+                name="avail_doctor_date_time_idx",
+            ),
+            # future slots that still have room (cross-doctor slot lookups)
+            models.Index(
+                fields=["date", "start_time"],
+                condition=models.Q(booked_count__lt=models.F("capacity")),
+                name="avail_open_date_time_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor} - {self.date} {self.start_time} to {self.end_time}"
+
+#==============================================
+# DENORMALIZED DOCTOR DAY (availability list reads)
+#==============================================
+class DoctorDaySchedule(models.Model):
+    """
+    One doctor's day as the availability list shows it: every slot with its
+    booked/remaining counts, every appointment with a patient summary and
+    per-status counters, so a day is read as one row instead of joining
+    Appointment, Patient, User and DoctorAvailability. Rebuilt by a job
+    queued after each change (day_schedules.queue_refresh, see
+    signals.py) and by the rebuild_day_schedules command.
+    """
+
+    doctor = models.ForeignKey(
+        Doctor,
+        on_delete=models.CASCADE,
+        related_name="day_schedules"
+    )
+    date = models.DateField()
+
+    slots = models.JSONField(default=list)
+    appointments = models.JSONField(default=list)
+    status_counts = models.JSONField(default=dict)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["doctor", "date"],
+                name="unique_doctor_day_schedule",
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.doctor} - {self.date} {self.start_time} to {self.end_time}"
\ No newline at end of file
+        return f"{self.doctor_id} - {self.date}"
@@ -0,0 +1,89 @@
+import base64
+import json
+from operator import attrgetter
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+# =====================================================
+# OPAQUE KEYSET CURSORS
+# =====================================================
+def encode_cursor(values):
+    """
+    Pack the sort key of the last row into an opaque, URL-safe token.
+    """
+    raw = json.dumps(list(values), default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, size):
+    """
+    Unpack a token made by encode_cursor().
+    Raises ValueError for anything that was not produced by us.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+
+    return values
+
+
+def parse_limit(value, default=20, maximum=50):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return default
+
+    return max(1, min(limit, maximum))
+
+
+# =====================================================
+# KEYSET PAGINATION
+# =====================================================
+def keyset_after(fields, values, descending=False):
+    """
+    Q matching rows strictly after `values` in (fields...) order, e.g. for
+    ("date", "start_time", "id"):
+        date > d OR (date = d AND start_time > t) OR (date = d AND start_time = t AND id > i)
+    """
+    op = "lt" if descending else "gt"
+    condition = Q()
+
+    for i, field in enumerate(fields):
+        step = Q(**{f"{field}__{op}": values[i]})
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            step &= Q(**{prev_field: prev_value})
+        condition |= step
+
+    return condition
+
+
+def paginate_keyset(queryset, fields, cursor=None, limit=20, descending=False):
+    """
+    Return (rows, next_cursor) for one page of `queryset` ordered by
+    `fields`, which must end with a unique column (normally "id").
+    Raises ValueError for a bad cursor.
+    """
+    if cursor:
+        try:
+            queryset = queryset.filter(
+                keyset_after(fields, decode_cursor(cursor, len(fields)), descending)
+            )
+        except ValidationError as exc:
+            raise ValueError("Invalid cursor") from exc
+
+    ordering = [f"-{field}" if descending else field for field in fields]
+    rows = list(queryset.order_by(*ordering)[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(attrgetter(*fields)(rows[limit - 1]))
+
+    return rows[:limit], next_cursor
+
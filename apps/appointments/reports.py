@@ -0,0 +1,539 @@
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils.module_loading import import_string
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.utils import simpleSplit
+from reportlab.platypus import (
+    BaseDocTemplate, Flowable, Frame, PageBreak, PageTemplate,
+)
+
+from .models import Appointment
+
+
+# Bump when the PDF layout changes so cached reports are re-rendered.
+REPORT_LAYOUT_VERSION = 2
+
+
+# =====================================================
+# REPORT LAYOUT (BUILT ONCE AT IMPORT)
+# =====================================================
+# Styles and coordinates are module constants shared by every render.
+# The fixed part of a report (title, appointment, doctor and patient
+# details) is one flowable drawn straight on the canvas, one font switch
+# per style; the notes are TextBlock flowables that platypus flows onto
+# as many pages as they need. Frames and page templates keep state while a
+# document is built, so each document gets its own (cheap) instances.
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN_X = 50
+MARGIN_TOP = 32
+MARGIN_BOTTOM = 60  # footer lives below this
+FOOTER_Y = 40
+FOOTER_TEXT = "Generated by DocApp – Digital Medical Record"
+
+SECTION_STYLE = ParagraphStyle(
+    "ReportSection", fontName="Helvetica-Bold", fontSize=14, leading=18,
+    spaceBefore=14, spaceAfter=6, keepWithNext=1,
+)
+NOTE_STYLE = ParagraphStyle(
+    "ReportNote", fontName="Helvetica", fontSize=12, leading=16, leftIndent=20,
+)
+
+# Header geometry: baselines measured down from the top of the frame
+HEADER_HEIGHT = 270
+TITLE_Y = 18
+META_Y = 58
+DETAILS_TITLE_Y = 129
+DETAILS_Y = 154
+LINE_GAP = 18
+PATIENT_X = 280
+VALUE_OFFSET = 120
+
+
+class TextBlock(Flowable):
+    """
+    Plain text in a single style, wrapped to the frame width and drawn
+    line by line. Unlike a Paragraph there is no markup to parse (or to
+    escape), and it splits between pages at any line.
+    """
+
+    def __init__(self, text, style, lines=None):
+        super().__init__()
+        self.text = text
+        self.style = style
+        self.lines = lines
+
+    def _wrap_lines(self, avail_width):
+        width = avail_width - self.style.leftIndent
+        lines = []
+        for line in self.text.splitlines():
+            lines += simpleSplit(line, self.style.fontName, self.style.fontSize, width) or [""]
+        return lines
+
+    def wrap(self, avail_width, avail_height):
+        if self.lines is None:
+            self.lines = self._wrap_lines(avail_width)
+        self.width = avail_width
+        self.height = len(self.lines) * self.style.leading
+        return self.width, self.height
+
+    def split(self, avail_width, avail_height):
+        self.wrap(avail_width, avail_height)
+        fit = int(avail_height // self.style.leading)
+        if fit <= 0:
+            return []
+        if fit >= len(self.lines):
+            return [self]
+        return [
+            TextBlock(self.text, self.style, self.lines[:fit]),
+            TextBlock(self.text, self.style, self.lines[fit:]),
+        ]
+
+    def draw(self):
+        style = self.style
+        text = self.canv.beginText(style.leftIndent, self.height - style.fontSize)
+        text.setFont(style.fontName, style.fontSize, style.leading)
+        for line in self.lines:
+            text.textLine(line)
+        self.canv.drawText(text)
+
+
+class ReportHeader(Flowable):
+    """
+    Title, appointment and the doctor/patient columns of one report.
+    """
+
+    def __init__(self, appointment):
+        super().__init__()
+        self.appointment = appointment
+
+    def wrap(self, avail_width, avail_height):
+        self.width = avail_width
+        return avail_width, HEADER_HEIGHT
+
+    def draw(self):
+        c = self.canv
+        appointment = self.appointment
+        doctor = appointment.doctor
+        patient = appointment.patient
+        top = HEADER_HEIGHT
+
+        columns = (
+            (0, [
+                ("Name", f"Dr. {doctor.full_name}"),
+                ("Specialization", doctor.specialization),
+                ("Qualification", doctor.qualification),
+                ("Experience", f"{doctor.experience_years} years"),
+                ("Clinic", doctor.clinic_name),
+                ("City", doctor.city),
+                ("Contact", doctor.phone),
+            ]),
+            (PATIENT_X, [
+                ("Name", patient.full_name),
+                ("Gender", patient.gender),
+                ("Age", f"{patient.age} years"),
+                ("City", patient.city),
+                ("Contact", patient.phone),
+            ]),
+        )
+
+        c.setFont("Helvetica-Bold", 18)
+        c.drawCentredString(self.width / 2, top - TITLE_Y, "MEDICAL REPORT")
+
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(0, top - DETAILS_TITLE_Y, "Doctor Details")
+        c.drawString(PATIENT_X, top - DETAILS_TITLE_Y, "Patient Details")
+
+        c.setFont("Helvetica-Bold", 11)
+        for x, rows in columns:
+            for i, (label, _) in enumerate(rows):
+                c.drawString(x, top - DETAILS_Y - i * LINE_GAP, f"{label}:")
+
+        c.setFont("Helvetica", 11)
+        for i, line in enumerate((
+            f"Appointment ID: {appointment.id}",
+            f"Date: {appointment.appointment_date.strftime('%d %b %Y')}",
+            f"Time: {appointment.start_time.strftime('%I:%M %p')} "
+            f"to {appointment.end_time.strftime('%I:%M %p')}",
+        )):
+            c.drawString(0, top - META_Y - i * LINE_GAP, line)
+        for x, rows in columns:
+            for i, (_, value) in enumerate(rows):
+                c.drawString(x + VALUE_OFFSET, top - DETAILS_Y - i * LINE_GAP, str(value))
+
+
+def report_story(appointment, note):
+    """
+    Flowables of one report. Expects appointment.doctor and
+    appointment.patient to be loaded already.
+    """
+    story = [ReportHeader(appointment)]
+
+    for title, text in (
+        ("Medical Notes", note.notes),
+        ("Prescription", note.prescription),
+        ("Follow Up", note.follow_up),
+    ):
+        story.append(TextBlock(title, SECTION_STYLE))
+        if text:
+            story.append(TextBlock(text, NOTE_STYLE))
+
+    return story
+
+
+def _draw_footer(c, doc):
+    c.saveState()
+    c.setFont("Helvetica-Oblique", 9)
+    c.drawString(MARGIN_X, FOOTER_Y, FOOTER_TEXT)
+    c.drawRightString(PAGE_WIDTH - MARGIN_X, FOOTER_Y, f"Page {doc.page}")
+    c.restoreState()
+
+
+def build_pdf(story, title):
+    buffer = BytesIO()
+    doc = BaseDocTemplate(
+        buffer, pagesize=A4, title=title, author="DocApp",
+        leftMargin=MARGIN_X, rightMargin=MARGIN_X,
+        topMargin=MARGIN_TOP, bottomMargin=MARGIN_BOTTOM,
+    )
+    frame = Frame(
+        doc.leftMargin, doc.bottomMargin, doc.width, doc.height,
+        leftPadding=0, rightPadding=0, topPadding=0, bottomPadding=0,
+    )
+    doc.addPageTemplates([PageTemplate(id="report", frames=[frame], onPage=_draw_footer)])
+    doc.build(story)
+    return buffer.getvalue()
+
+
+# ---------- rendering ----------
+
+def render_report(appointment, note):
+    """
+    Render the medical report of an appointment and return the PDF bytes.
+    Expects appointment.doctor and appointment.patient to be loaded already.
+    """
+    return build_pdf(report_story(appointment, note), f"Medical report {appointment.id}")
+
+
+# =====================================================
+# CONTENT-ADDRESSED REPORT CACHE
+# =====================================================
+@lru_cache(maxsize=None)
+def report_storage():
+    return import_string(settings.REPORT_FILE_STORAGE)()
+
+
+def report_key(appointment, note):
+    """
+    Hash of everything that ends up in the PDF. Any change to the note
+    (tracked by note.updated_at), the people on it or the layout gives
+    a new key, so stored artifacts never need to be invalidated in place.
+    """
+    doctor = appointment.doctor
+    patient = appointment.patient
+    parts = [
+        REPORT_LAYOUT_VERSION,
+        appointment.id,
+        appointment.appointment_date,
+        appointment.start_time,
+        appointment.end_time,
+        doctor.full_name,
+        doctor.specialization,
+        doctor.qualification,
+        doctor.experience_years,
+        doctor.clinic_name,
+        doctor.city,
+        doctor.phone,
+        patient.full_name,
+        patient.gender,
+        patient.age,
+        patient.city,
+        patient.phone,
+        note.notes,
+        note.prescription,
+        note.follow_up,
+        note.updated_at.isoformat(),
+    ]
+    raw = "\x1f".join(str(part) for part in parts)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def report_name(key):
+    return f"reports/{key}.pdf"
+
+
+REPORT_URL_NAME = re.compile(r"reports/[0-9a-f]{64}\.pdf")
+
+
+def report_name_from_url(url):
+    """
+    Storage name of the report an Appointment.report_pdf URL points at.
+    """
+    match = REPORT_URL_NAME.search(url or "")
+    return match.group(0) if match else None
+
+
+def _delete_report(storage, name):
+    try:
+        storage.delete(name)
+    except (FileNotFoundError, OSError):
+        pass
+
+
+def get_or_render_report(appointment, note, key=None):
+    """
+    Return an open file for the report PDF, rendering and storing it
+    first when it is not in storage yet. Appointment.report_pdf is
+    pointed at the stored artifact and the report it replaces (older
+    notes) is deleted.
+    """
+    key = key or report_key(appointment, note)
+    name = report_name(key)
+    storage = report_storage()
+    url = storage.url(name)
+
+    if appointment.report_pdf == url:
+        try:
+            return storage.open(name, "rb")
+        except (FileNotFoundError, OSError):
+            pass  # removed from storage; render it again
+
+    if not storage.exists(name):
+        saved_name = storage.save(name, ContentFile(render_report(appointment, note)))
+        if saved_name != name:
+            # Another request stored the same report first and the storage
+            # renamed ours; theirs has the same bytes
+            _delete_report(storage, saved_name)
+
+    if appointment.report_pdf != url:
+        previous = report_name_from_url(appointment.report_pdf)
+        Appointment.objects.filter(pk=appointment.pk).update(report_pdf=url)
+        appointment.report_pdf = url
+        if previous and previous != name:
+            _delete_report(storage, previous)
+
+    return storage.open(name, "rb")
+
+
+def stale_reports(storage, referenced, older_than):
+    """
+    Names of stored reports that no appointment points at (superseded
+    before get_or_render_report() deleted them, or copies left by a lost
+    race) and that were last written before `older_than`. Raises
+    NotImplementedError when the storage cannot list files.
+    """
+    try:
+        _, files = storage.listdir("reports")
+    except FileNotFoundError:
+        return []
+
+    stale = []
+    for filename in files:
+        name = f"reports/{filename}"
+        if name not in referenced and storage.get_modified_time(name) < older_than:
+            stale.append(name)
+    return stale
+
+
+# =====================================================
+# BATCH RENDERING (ZIP / MERGED PDF)
+# =====================================================
+# Every report of a date range from one query (appointment, doctor,
+# patient and note joined). reportlab is pure Python and holds the GIL,
+# so the reports are rendered in a process pool and written to the ZIP
+# in order as they come back. Reports already in storage are read back
+# instead of rendered again. The merged PDF is one document built in one
+# process, which is why it takes far fewer reports than the ZIP.
+BATCH_FORMATS = ("zip", "pdf")
+BATCH_STATUSES = ("completed",)
+MAX_BATCH_REPORTS = 500
+MAX_MERGED_REPORTS = 50
+
+
+def report_appointments():
+    """
+    Appointments with everything a report shows loaded in the same query.
+    """
+    return Appointment.objects.select_related("doctor", "patient", "medical_note")
+
+
+def batch_appointments(doctor_id, start, end, statuses=BATCH_STATUSES):
+    """
+    Appointments of a doctor between start and end that have notes,
+    with doctor, patient and medical_note loaded, in schedule order.
+    At most MAX_BATCH_REPORTS + 1 rows so callers can refuse bigger ranges.
+    """
+    appointments = report_appointments().filter(
+        doctor_id=doctor_id,
+        appointment_date__range=(start, end),
+        medical_note__isnull=False,
+    )
+    if statuses:
+        appointments = appointments.filter(status__in=statuses)
+
+    return list(
+        appointments.order_by("appointment_date", "start_time", "id")[:MAX_BATCH_REPORTS + 1]
+    )
+
+
+def report_filename(appointment):
+    return f"medical_report_{appointment.id}.pdf"
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def render_pool():
+    """
+    The process pool of this web process, created on first use and
+    shared by every batch download (None when
+    settings.REPORT_RENDER_WORKERS is 0). Workers come from a forkserver
+    (spawn where there is none), so they never inherit the threads,
+    locks and database connections of the process that asks for them.
+    """
+    global _pool, _pool_pid
+
+    if not settings.REPORT_RENDER_WORKERS:
+        return None
+    with _pool_lock:
+        # A forked child (gunicorn --preload) cannot use its parent's pool
+        if _pool is None or _pool_pid != os.getpid():
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.REPORT_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context(method),
+                # Workers start without configured apps. Not a function of
+                # this module: unpickling one would import the models first
+                initializer=django.setup,
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _discard_pool(pool):
+    # A worker died (out of memory, killed); the next download starts a new pool
+    global _pool
+
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_entry(appointment):
+    return render_report(appointment, appointment.medical_note)
+
+
+def _stored_report(storage, appointment):
+    if not appointment.report_pdf:
+        return None
+    try:
+        with storage.open(report_name(report_key(appointment, appointment.medical_note)), "rb") as fh:
+            return fh.read()
+    except (FileNotFoundError, OSError):
+        return None  # notes changed since it was stored
+
+
+def render_reports(appointments, parallel=True):
+    """
+    Yield (appointment, pdf bytes) in the given order, rendering in
+    render_pool() unless `parallel` is false or there is no pool.
+    Leaving the generator early cancels the renders that have not started.
+    """
+    storage = report_storage()
+
+    stored = {appointment.id: _stored_report(storage, appointment) for appointment in appointments}
+    pending = [appointment for appointment in appointments if stored[appointment.id] is None]
+
+    pool = render_pool() if parallel and len(pending) > 1 else None
+    if pool is None:
+        rendered = map(_render_entry, pending)
+        for appointment in appointments:
+            pdf = stored[appointment.id]
+            yield appointment, pdf if pdf is not None else next(rendered)
+        return
+
+    futures = [pool.submit(_render_entry, appointment) for appointment in pending]
+    try:
+        rendered = iter(futures)
+        for appointment in appointments:
+            pdf = stored[appointment.id]
+            yield appointment, pdf if pdf is not None else next(rendered).result()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+class _ChunkBuffer:
+    # Unseekable zipfile target; zipfile then writes data descriptors
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def zip_reports(reports):
+    """
+    Stream a ZIP of (appointment, pdf) pairs, one chunk per report.
+    PDFs are already compressed, so entries are stored as-is.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for appointment, pdf in reports:
+            archive.writestr(report_filename(appointment), pdf)
+            yield buffer.pop()
+    yield buffer.pop()  # central directory
+
+
+def _merge_reports(appointments):
+    story = []
+    for appointment in appointments:
+        if story:
+            story.append(PageBreak())
+        story += report_story(appointment, appointment.medical_note)
+    return build_pdf(story, "Medical reports")
+
+
+def merged_report(appointments):
+    """
+    One PDF with every report, each starting on a new page. A single
+    document cannot be split across processes, so it is built by one
+    worker of render_pool() (in the calling process when there is none).
+    Callers keep it to MAX_MERGED_REPORTS reports.
+    """
+    pool = render_pool()
+    if pool is None:
+        return _merge_reports(appointments)
+    try:
+        return pool.submit(_merge_reports, appointments).result()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
@@ -0,0 +1,91 @@
+from datetime import time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+
+from .cache import invalidate, slots_namespace
+from .day_schedules import queue_refresh
+from .models import DoctorAvailability
+from .slot_index import forget_changed
+
+
+# =====================================================
+# RECURRING AVAILABILITY
+# =====================================================
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def expand_schedule(start_date, weeks, weekdays, start_time, end_time, slot_minutes):
+    """
+    List of (date, start_time, end_time) for every slot of the template.
+    A trailing remainder shorter than slot_minutes is not turned into a slot.
+    """
+    day_slots = [
+        (time(m // 60, m % 60), time((m + slot_minutes) // 60, (m + slot_minutes) % 60))
+        for m in range(_minutes(start_time), _minutes(end_time) - slot_minutes + 1, slot_minutes)
+    ]
+
+    slots = []
+    for i in range(weeks * 7):
+        day = start_date + timedelta(days=i)
+        if day.weekday() in weekdays:
+            slots.extend((day, start, end) for start, end in day_slots)
+
+    return slots
+
+
+def create_recurring_slots(doctor_user, start_date, weeks, weekdays,
+                           start_time, end_time, slot_minutes, capacity):
+    """
+    Expand a weekly template and insert it with one bulk_create.
+
+    Existing slots that overlap the template are fetched with a single
+    query (same weekdays, same date range, overlapping time window); any
+    generated slot that collides with one of them is skipped. The check
+    and the insert run in one transaction holding a lock on the doctor's
+    user row, so two generators for the same doctor take turns and the
+    second one sees the slots of the first.
+    Returns (created, skipped).
+    """
+    candidates = expand_schedule(start_date, weeks, weekdays, start_time, end_time, slot_minutes)
+    if not candidates:
+        return 0, 0
+
+    window_end = max(end for _, _, end in candidates)
+
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(pk=doctor_user.pk).values_list("pk"))
+
+        existing = {}
+        for day, start, end in DoctorAvailability.objects.filter(
+            Q(doctor=doctor_user),
+            Q(date__range=(candidates[0][0], candidates[-1][0])),
+            Q(date__iso_week_day__in=[weekday + 1 for weekday in weekdays]),
+            Q(start_time__lt=window_end, end_time__gt=start_time),
+        ).values_list("date", "start_time", "end_time"):
+            existing.setdefault(day, []).append((start, end))
+
+        new_slots = [
+            DoctorAvailability(
+                doctor=doctor_user,
+                date=day,
+                start_time=start,
+                end_time=end,
+                capacity=capacity,
+            )
+            for day, start, end in candidates
+            if not any(start < taken_end and end > taken_start
+                       for taken_start, taken_end in existing.get(day, ()))
+        ]
+
+        DoctorAvailability.objects.bulk_create(new_slots, batch_size=1000)
+        # bulk_create sends no post_save signals
+        for day in sorted({slot.date for slot in new_slots}):
+            queue_refresh(day, doctor_user_id=doctor_user.id)
+
+    invalidate(slots_namespace(doctor_user.id))
+    forget_changed(doctor_user.id)
+
+    return len(new_slots), len(candidates) - len(new_slots)
@@ -0,0 +1,93 @@
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from apps.accounts.models import Doctor, PROFILE_THUMBNAIL
+from .pagination import decode_cursor, encode_cursor
+
+
+# =====================================================
+# DOCTOR SEARCH
+# =====================================================
+# Every field is matched with icontains, which Postgres serves from the
+# pg_trgm GIN indexes on UPPER(<field>) (accounts migration 0004).
+SEARCH_FIELDS = ("full_name", "city", "specialization")
+
+
+def _field_rank(field, term):
+    # exact match > prefix match > substring match
+    return Case(
+        When(**{f"{field}__iexact": term}, then=Value(3)),
+        When(**{f"{field}__istartswith": term}, then=Value(2)),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+
+
+def doctor_search_queryset(terms):
+    """
+    Doctors matching every non-empty term, annotated with a relevance rank.
+    """
+    doctors = Doctor.objects.select_related("user")
+    rank = Value(0, output_field=IntegerField())
+
+    for field in SEARCH_FIELDS:
+        term = terms.get(field)
+        if term:
+            doctors = doctors.filter(**{f"{field}__icontains": term})
+            rank = rank + _field_rank(field, term)
+
+    return doctors.annotate(rank=rank)
+
+
+def doctor_listing():
+    """
+    Every doctor for the public list page, latest first.
+    """
+    return Doctor.objects.select_related("user").order_by("-id")
+
+
+def search_doctors(terms, cursor=None, limit=20):
+    """
+    Return (doctors, next_cursor) for one page of results,
+    best matches first.
+    """
+    doctors = doctor_search_queryset(terms)
+
+    if cursor:
+        last_rank, last_id = decode_cursor(cursor, 2)
+        try:
+            last_rank, last_id = int(last_rank), int(last_id)
+        except (TypeError, ValueError) as exc:
+            raise ValueError("Invalid cursor") from exc
+
+        doctors = doctors.filter(
+            Q(rank__lt=last_rank) | Q(rank=last_rank, id__gt=last_id)
+        )
+
+    page = list(doctors.order_by("-rank", "id")[:limit + 1])
+
+    next_cursor = None
+    if len(page) > limit:
+        last = page[limit - 1]
+        next_cursor = encode_cursor([last.rank, last.id])
+
+    return page[:limit], next_cursor
+
+
+def doctor_to_dict(doc):
+    return {
+        "id": doc.id,
+        "name": doc.full_name,
+        "email": doc.user.email,
+        "phone": doc.phone,
+        "specialization": doc.specialization,
+        "qualification": doc.qualification,
+        "experience_years": doc.experience_years,
+        "clinic_name": doc.clinic_name,
+        "city": doc.city,
+        "consultation_fee": doc.consultation_fee,
+        "profile_image": doc.profile_image.url if doc.profile_image else None,
+        "profile_thumbnail": (
+            doc.profile_image.build_url(**PROFILE_THUMBNAIL)
+            if doc.profile_image else None
+        ),
+    }
@@ -0,0 +1,152 @@
+import random
+import uuid
+from datetime import date, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+
+from apps.accounts.models import Doctor, Patient, Profile
+from .day_schedules import rebuild_schedules
+from .models import Appointment, DoctorAvailability, MedicalNote
+
+
+CITIES = ["Pune", "Mumbai", "Delhi", "Bengaluru", "Chennai", "Hyderabad", "Kolkata", "Jaipur"]
+SPECIALIZATIONS = [
+    "Cardiology", "Dermatology", "Neurology", "Orthopedics",
+    "Pediatrics", "Psychiatry", "Gynecology", "General Physician",
+]
+FIRST_NAMES = ["Asha", "Rahul", "Priya", "Vikram", "Neha", "Arjun", "Kavya", "Rohan", "Meera", "Sanjay"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Reddy", "Gupta", "Nair", "Singh", "Das", "Joshi", "Khan"]
+
+SEED_PASSWORD = "seed-password"
+
+
+# =====================================================
+# SYNTHETIC DATASET (benchmarks / query-plan checks)
+# =====================================================
+def seed_data(doctors=50, patients=500, slots_per_doctor=30, appointments=2000,
+              notes_ratio=0.3, seed=0, batch_size=1000):
+    """
+    Bulk-insert a synthetic clinic: doctors with future slots, patients,
+    appointments spread over those slots (never above capacity) and
+    medical notes for a share of them.
+
+    Every seeded user gets the password SEED_PASSWORD. Returns the created
+    objects so callers can pick ids to query with.
+    """
+    rng = random.Random(seed)
+    tag = uuid.uuid4().hex[:8]
+    password = make_password(SEED_PASSWORD)  # hash once, reuse for every row
+    today = date.today()
+
+    def name():
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+    # ---------- users + profiles ----------
+    doctor_users = User.objects.bulk_create([
+        User(username=f"seed-{tag}-doctor-{i}@example.com",
+             email=f"seed-{tag}-doctor-{i}@example.com", password=password)
+        for i in range(doctors)
+    ], batch_size=batch_size)
+    patient_users = User.objects.bulk_create([
+        User(username=f"seed-{tag}-patient-{i}@example.com",
+             email=f"seed-{tag}-patient-{i}@example.com", password=password)
+        for i in range(patients)
+    ], batch_size=batch_size)
+
+    Profile.objects.bulk_create(
+        [Profile(user=user, role="doctor") for user in doctor_users]
+        + [Profile(user=user, role="patient") for user in patient_users],
+        batch_size=batch_size,
+    )
+
+    # ---------- doctors / patients ----------
+    doctor_rows = Doctor.objects.bulk_create([
+        Doctor(
+            user=user,
+            full_name=name(),
+            phone=f"9{rng.randrange(10 ** 9):09d}",
+            specialization=rng.choice(SPECIALIZATIONS),
+            qualification="MBBS, MD",
+            experience_years=rng.randint(1, 35),
+            clinic_name=f"{rng.choice(LAST_NAMES)} Clinic",
+            city=rng.choice(CITIES),
+            consultation_fee=rng.choice([300, 500, 800, 1200]),
+        )
+        for user in doctor_users
+    ], batch_size=batch_size)
+    patient_rows = Patient.objects.bulk_create([
+        Patient(
+            user=user,
+            full_name=name(),
+            phone=f"8{rng.randrange(10 ** 9):09d}",
+            gender=rng.choice(["Male", "Female", "Other"]),
+            date_of_birth=date(rng.randint(1950, 2015), rng.randint(1, 12), rng.randint(1, 28)),
+            city=rng.choice(CITIES),
+        )
+        for user in patient_users
+    ], batch_size=batch_size)
+
+    # ---------- slots: consecutive 30 minute slots from 09:00 ----------
+    slots = []
+    for doctor in doctor_rows:
+        for i in range(slots_per_doctor):
+            day = today + timedelta(days=i // 8)
+            minutes = 9 * 60 + (i % 8) * 30
+            slots.append(DoctorAvailability(
+                doctor_id=doctor.user_id,
+                date=day,
+                start_time=time(minutes // 60, minutes % 60),
+                end_time=time((minutes + 30) // 60, (minutes + 30) % 60),
+                capacity=rng.randint(2, 6),
+            ))
+
+    # ---------- appointments: respect capacity and (patient, slot) ----------
+    doctor_by_user = {doctor.user_id: doctor for doctor in doctor_rows}
+    taken = set()
+    appointment_rows = []
+    attempts = 0
+    while slots and patient_rows and len(appointment_rows) < appointments \
+            and attempts < appointments * 5:
+        attempts += 1
+        slot = rng.choice(slots)
+        patient = rng.choice(patient_rows)
+        if slot.booked_count >= slot.capacity or (patient.id, id(slot)) in taken:
+            continue
+
+        taken.add((patient.id, id(slot)))
+        slot.booked_count += 1
+        appointment_rows.append(Appointment(
+            doctor=doctor_by_user[slot.doctor_id],
+            patient=patient,
+            availability=slot,
+            appointment_date=slot.date,
+            start_time=slot.start_time,
+            end_time=slot.end_time,
+            status=rng.choice([key for key, _ in Appointment.STATUS_CHOICES]),
+        ))
+
+    slots = DoctorAvailability.objects.bulk_create(slots, batch_size=batch_size)
+    appointment_rows = Appointment.objects.bulk_create(appointment_rows, batch_size=batch_size)
+
+    notes = MedicalNote.objects.bulk_create([
+        MedicalNote(
+            appointment=appointment,
+            notes="Patient reports mild symptoms. Vitals normal.\n" * rng.randint(1, 5),
+            prescription="Paracetamol 500mg twice daily for 3 days",
+            follow_up="Review after one week",
+        )
+        for appointment in appointment_rows
+        if rng.random() < notes_ratio
+    ], batch_size=batch_size)
+
+    # bulk_create sends no signals: build the dashboard days in one pass
+    rebuild_schedules(doctor_ids=[doctor.id for doctor in doctor_rows], batch_size=batch_size)
+
+    return {
+        "doctors": doctor_rows,
+        "patients": patient_rows,
+        "slots": slots,
+        "appointments": appointment_rows,
+        "notes": notes,
+    }
@@ -0,0 +1,156 @@
+from django.db import transaction
+from django.db.models import F
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from apps.accounts.models import Doctor, Patient
+from .cache import DOCTORS, invalidate, slots_namespace
+from .day_schedules import queue_refresh
+from .events import appointment_event, publish
+from .models import CANCELLED_STATUSES, Appointment, DoctorAvailability
+from .slot_index import forget_changed
+
+
+# =====================================================
+# KEEP DoctorAvailability.booked_count IN STEP
+# =====================================================
+# Status changes go through booking.change_status(), which moves the
+# counter in the same transaction; a cancelled appointment gave its seat
+# back already, so deleting it releases nothing.
+@receiver(post_delete, sender=Appointment)
+def release_booked_slot(sender, instance, **kwargs):
+    if instance.availability_id:
+        if instance.status not in CANCELLED_STATUSES:
+            DoctorAvailability.objects.filter(
+                pk=instance.availability_id,
+                booked_count__gt=0
+            ).update(booked_count=F("booked_count") - 1)
+
+        # update() sends no signal: refresh the slot's day when a
+        # reschedule moved the appointment off it
+        slot_day = DoctorAvailability.objects.filter(
+            pk=instance.availability_id
+        ).values_list("doctor_id", "date").first()
+        instance._slot_owner = slot_day[0] if slot_day else None  # for invalidate_booked_slot
+        if slot_day and slot_day[1] != instance.appointment_date:
+            queue_refresh(slot_day[1], doctor_user_id=slot_day[0])
+
+
+# =====================================================
+# CACHE INVALIDATION
+# =====================================================
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def invalidate_doctor_directory(sender, instance, **kwargs):
+    invalidate(DOCTORS)
+
+
+@receiver(post_save, sender=DoctorAvailability)
+@receiver(post_delete, sender=DoctorAvailability)
+def invalidate_doctor_slots(sender, instance, **kwargs):
+    invalidate(slots_namespace(instance.doctor_id))
+    forget_changed(instance.doctor_id)
+
+
+def _slot_owner(appointment):
+    """
+    User id of the doctor whose slot the appointment is on, without
+    loading the slot: book_slot() hands over the slot it loaded, and
+    release_booked_slot() has already looked the owner up on delete.
+    """
+    if Appointment.availability.is_cached(appointment):
+        return appointment.availability.doctor_id
+    if hasattr(appointment, "_slot_owner"):
+        return appointment._slot_owner
+    return DoctorAvailability.objects.filter(
+        pk=appointment.availability_id
+    ).values_list("doctor_id", flat=True).first()
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_booked_slot(sender, instance, **kwargs):
+    # A booking, a deletion or a move into or out of CANCELLED_STATUSES
+    # changes the slot's booked_count
+    cancelled = instance.status in CANCELLED_STATUSES
+    seat_moved = kwargs.get("created", True) or cancelled != instance._was_cancelled
+    instance._was_cancelled = cancelled
+    if instance.availability_id and seat_moved:
+        owner = _slot_owner(instance)
+        if owner is not None:
+            invalidate(slots_namespace(owner))
+            forget_changed(owner)
+
+
+# =====================================================
+# LIVE QUEUE EVENTS (doctor_queue_events SSE stream)
+# =====================================================
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def publish_appointment_change(sender, instance, **kwargs):
+    # Build the payload now (a deleted instance loses its pk later) and
+    # only announce it once the change is committed
+    doctor_id = instance.doctor_id
+    event = appointment_event(instance, deleted="created" not in kwargs)
+    transaction.on_commit(lambda: publish(doctor_id, event))
+
+
+# =====================================================
+# DoctorDaySchedule UPKEEP (day_schedules.py)
+# =====================================================
+# post_init remembers which day an instance belonged to when it was
+# loaded, so that moving it (a reschedule) refreshes the old day as well.
+# Read from __dict__: touching a deferred field would cost a query.
+@receiver(post_init, sender=Appointment)
+def remember_appointment_day(sender, instance, **kwargs):
+    instance._schedule_day = (
+        instance.__dict__.get("doctor_id"), instance.__dict__.get("appointment_date")
+    )
+    # for invalidate_booked_slot
+    instance._was_cancelled = instance.__dict__.get("status") in CANCELLED_STATUSES
+
+
+@receiver(post_init, sender=DoctorAvailability)
+def remember_slot_day(sender, instance, **kwargs):
+    instance._schedule_day = (instance.__dict__.get("doctor_id"), instance.__dict__.get("date"))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def refresh_appointment_day(sender, instance, **kwargs):
+    current = (instance.doctor_id, instance.appointment_date)
+    for doctor_id, day in {instance._schedule_day, current}:
+        queue_refresh(day, doctor_id=doctor_id)
+    instance._schedule_day = current
+
+
+@receiver(post_save, sender=DoctorAvailability)
+@receiver(post_delete, sender=DoctorAvailability)
+def refresh_slot_day(sender, instance, **kwargs):
+    current = (instance.doctor_id, instance.date)
+    for doctor_user_id, day in {instance._schedule_day, current}:
+        queue_refresh(day, doctor_user_id=doctor_user_id)
+    instance._schedule_day = current
+
+
+def _refresh_patient_days(patient_filter):
+    days = Appointment.objects.filter(**patient_filter).values_list(
+        "doctor_id", "appointment_date"
+    ).distinct()
+    for doctor_id, day in days:
+        queue_refresh(day, doctor_id=doctor_id)
+
+
+@receiver(post_save, sender=Patient)
+def refresh_patient_summary(sender, instance, created, **kwargs):
+    if not created:
+        _refresh_patient_days({"patient": instance})
+
+
+@receiver(post_save, sender=User)
+def refresh_patient_email(sender, instance, created, update_fields=None, **kwargs):
+    # Logins save last_login only; schedules only show the email
+    if created or (update_fields is not None and "email" not in update_fields):
+        return
+    _refresh_patient_days({"patient__user": instance})
@@ -0,0 +1,217 @@
+import threading
+import time as clock
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, time
+
+from django.db import transaction
+
+from config.db_router import read_your_writes
+
+from .cache import namespace_version, slots_namespace
+from .models import DoctorAvailability
+from .pagination import decode_cursor, encode_cursor
+from .slots import SLOT_ORDER
+
+
+# =====================================================
+# PROCESS-LOCAL SLOT INDEX
+# =====================================================
+# Each doctor's slots from today on, held as parallel arrays sorted by
+# (start, id), where start is date.toordinal() * 86400 + seconds into the
+# day. A lookup is a bisect plus a walk over the matching range: no query,
+# no model instances. A doctor's arrays are loaded with one query on first
+# use and reloaded when:
+#   - the doctor's slots namespace version (cache.py) has moved on: every
+#     slot or booking change bumps it, in any process. The version lives in
+#     the shared cache, so it is read at most every VERSION_CHECK_SECONDS
+#     per doctor to keep lookups off the network;
+#   - this process changes them (see signals.py);
+#   - the client is pinned to the primary (config.db_router), as cached()
+#     skips its entries then;
+#   - they are older than MAX_AGE_SECONDS. Versions are bumped before the
+#     change commits, so another process can load the old rows under the
+#     new version; the age limit bounds that, as the slot page cache does.
+MAX_AGE_SECONDS = 15
+VERSION_CHECK_SECONDS = 1
+MAX_DOCTORS = 10000
+
+DAY_SECONDS = 86400
+
+
+def _seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def _key(day, at):
+    return day.toordinal() * DAY_SECONDS + _seconds(at)
+
+
+def _time(seconds):
+    return time(seconds // 3600, seconds % 3600 // 60, seconds % 60)
+
+
+class SlotRecord:
+    """
+    The fields slot_to_dict() reads, for one slot out of the index.
+    """
+
+    __slots__ = ("id", "date", "start_time", "end_time", "capacity", "booked_count")
+
+    def __init__(self, id, date, start_time, end_time, capacity, booked_count):
+        self.id = id
+        self.date = date
+        self.start_time = start_time
+        self.end_time = end_time
+        self.capacity = capacity
+        self.booked_count = booked_count
+
+
+class DoctorSlots:
+    __slots__ = ("version", "loaded_at", "checked_at", "starts", "ends", "ids", "capacity", "booked")
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.loaded_at = self.checked_at = clock.monotonic()
+        self.starts = array("q")
+        self.ends = array("l")  # seconds into the day
+        self.ids = array("q")
+        self.capacity = array("l")
+        self.booked = array("l")
+        for slot_id, day, start, end, capacity, booked in rows:
+            self.starts.append(_key(day, start))
+            self.ends.append(_seconds(end))
+            self.ids.append(slot_id)
+            self.capacity.append(capacity)
+            self.booked.append(booked)
+
+    def record(self, i):
+        start = self.starts[i]
+        return SlotRecord(
+            self.ids[i],
+            date.fromordinal(start // DAY_SECONDS),
+            _time(start % DAY_SECONDS),
+            _time(self.ends[i]),
+            self.capacity[i],
+            self.booked[i],
+        )
+
+    def page(self, first_key, last_key, after=None, limit=20, include_full=False):
+        """
+        (records, more) for slots starting in [first_key, last_key] and
+        after the (start key, id) pair `after`.
+        """
+        starts, ids = self.starts, self.ids
+        i = bisect_left(starts, first_key)
+        if after is not None and after[0] >= first_key:
+            i = bisect_left(starts, after[0])
+            while i < len(starts) and starts[i] == after[0] and ids[i] <= after[1]:
+                i += 1
+
+        records = []
+        capacity, booked = self.capacity, self.booked
+        for i in range(i, len(starts)):
+            if starts[i] > last_key:
+                break
+            if include_full or booked[i] < capacity[i]:
+                if len(records) == limit:
+                    return records, True
+                records.append(self.record(i))
+
+        return records, False
+
+
+_doctors = {}
+_lock = threading.Lock()
+
+
+def _load(doctor_user_id, version):
+    rows = DoctorAvailability.objects.filter(
+        doctor_id=doctor_user_id, date__gte=date.today()
+    ).order_by(*SLOT_ORDER).values_list(
+        "id", "date", "start_time", "end_time", "capacity", "booked_count"
+    )
+    return DoctorSlots(version, rows)
+
+
+def doctor_index(doctor_user_id):
+    """
+    The current DoctorSlots of a doctor, loading it when missing or stale.
+    """
+    now = clock.monotonic()
+    entry = _doctors.get(doctor_user_id)
+    usable = (
+        entry is not None and now - entry.loaded_at < MAX_AGE_SECONDS
+        and not read_your_writes()
+    )
+    if usable and now - entry.checked_at < VERSION_CHECK_SECONDS:
+        return entry
+
+    version = namespace_version(slots_namespace(doctor_user_id))
+    if usable and entry.version == version:
+        entry.checked_at = now
+        return entry
+
+    # The version is read before the rows, so a change that lands in
+    # between is picked up by the next lookup
+    entry = _load(doctor_user_id, version)
+    with _lock:
+        _doctors.pop(doctor_user_id, None)
+        if len(_doctors) >= MAX_DOCTORS:
+            _doctors.pop(next(iter(_doctors)))  # least recently loaded
+        _doctors[doctor_user_id] = entry
+    return entry
+
+
+def forget(doctor_user_id):
+    _doctors.pop(doctor_user_id, None)
+
+
+def forget_changed(doctor_user_id):
+    """
+    Drop a doctor whose slots are being changed, now (this transaction
+    reads its own writes) and again once committed (other threads may
+    have reloaded the old rows in between).
+    """
+    forget(doctor_user_id)
+    transaction.on_commit(lambda: forget(doctor_user_id))
+
+
+def clear():
+    _doctors.clear()
+
+
+def doctor_slots(doctor_user_id, start, end, cursor=None, limit=20, include_full=False, now=None):
+    """
+    slots.doctor_slots() answered from the index: one page of a doctor's
+    upcoming slots between start and end as (records, next_cursor), with
+    the same cursors. Raises ValueError for a bad cursor.
+    """
+    now = now or datetime.now()
+    first_key = max(
+        _key(start, time.min),
+        _key(now.date(), now.time()) + (1 if now.microsecond else 0),
+    )
+    last_key = _key(end, time.max)
+
+    after = None
+    if cursor:
+        values = decode_cursor(cursor, len(SLOT_ORDER))
+        try:
+            after = (
+                _key(date.fromisoformat(values[0]), time.fromisoformat(values[1])),
+                int(values[2]),
+            )
+        except (TypeError, ValueError) as exc:
+            raise ValueError("Invalid cursor") from exc
+
+    records, more = doctor_index(doctor_user_id).page(
+        first_key, last_key, after=after, limit=limit, include_full=include_full
+    )
+
+    next_cursor = None
+    if more:
+        last = records[-1]
+        next_cursor = encode_cursor((last.date, last.start_time, last.id))
+
+    return records, next_cursor
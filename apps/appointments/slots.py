@@ -0,0 +1,123 @@
+import hashlib
+import json
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import F, Q
+
+from .models import DoctorAvailability
+from .pagination import paginate_keyset
+
+
+# =====================================================
+# OPEN SLOTS WITH REMAINING CAPACITY
+# =====================================================
+# Remaining capacity is capacity - booked_count, the denormalized counter
+# kept by booking.book_slot() and the Appointment post_delete signal, so
+# listing open slots is a single indexed query with no Count() join.
+SLOT_ORDER = ("date", "start_time", "id")
+
+DEFAULT_WINDOW_DAYS = 30
+MAX_WINDOW_DAYS = 90
+
+
+def parse_date_range(start, end, today=None):
+    """
+    (start, end) dates from ISO strings; defaults to the next
+    DEFAULT_WINDOW_DAYS days. Raises ValueError for malformed or
+    oversized ranges.
+    """
+    today = today or date.today()
+    start = date.fromisoformat(start) if start else today
+    end = date.fromisoformat(end) if end else start + timedelta(days=DEFAULT_WINDOW_DAYS)
+
+    if end < start:
+        raise ValueError("end is before start")
+    if (end - start).days > MAX_WINDOW_DAYS:
+        raise ValueError(f"date range is limited to {MAX_WINDOW_DAYS} days")
+
+    return start, end
+
+
+def upcoming(now=None):
+    """
+    Slots that have not started yet.
+    """
+    now = now or datetime.now()
+    return Q(date__gt=now.date()) | Q(date=now.date(), start_time__gte=now.time())
+
+
+def open_slots(queryset=None):
+    # Matches the avail_open_date_time_idx partial index
+    queryset = DoctorAvailability.objects.all() if queryset is None else queryset
+    return queryset.filter(booked_count__lt=F("capacity"))
+
+
+def doctor_slots(doctor_user_id, start, end, cursor=None, limit=20, include_full=False):
+    """
+    One page of a doctor's upcoming slots between start and end, earliest
+    first, as (slots, next_cursor). Full slots are left out unless asked for.
+    Raises ValueError for a bad cursor.
+    """
+    slots = DoctorAvailability.objects.filter(
+        upcoming(),
+        doctor_id=doctor_user_id,
+        date__range=(start, end),
+    )
+    if not include_full:
+        slots = open_slots(slots)
+
+    return paginate_keyset(slots, SLOT_ORDER, cursor=cursor, limit=limit)
+
+
+def nearest_open_slots(start, end, specialization="", city="", time_from=None,
+                       time_to=None, cursor=None, limit=20):
+    """
+    Earliest open slots across every doctor matching specialization/city
+    (case-insensitive exact match), optionally limited to slots starting
+    between time_from and time_to each day. One query: the open-slot
+    partial index walked in start order, joined to the doctor row, which
+    is selected along for the response; slots of a user with no doctor
+    row are left out. Returns (slots, next_cursor).
+    """
+    slots = open_slots(DoctorAvailability.objects.filter(
+        upcoming(),
+        date__range=(start, end),
+        doctor__doctor__isnull=False,
+    ))
+
+    if specialization:
+        slots = slots.filter(doctor__doctor__specialization__iexact=specialization)
+    if city:
+        slots = slots.filter(doctor__doctor__city__iexact=city)
+    if time_from:
+        slots = slots.filter(start_time__gte=time_from)
+    if time_to:
+        slots = slots.filter(start_time__lte=time_to)
+
+    return paginate_keyset(
+        slots.select_related("doctor__doctor"),
+        SLOT_ORDER, cursor=cursor, limit=limit
+    )
+
+
+def parse_time(value):
+    """
+    HH:MM -> time, empty -> None. Raises ValueError when malformed.
+    """
+    return time.fromisoformat(value) if value else None
+
+
+def slot_to_dict(slot):
+    return {
+        "id": slot.id,
+        "date": slot.date.isoformat(),
+        "start_time": slot.start_time.strftime("%H:%M"),
+        "end_time": slot.end_time.strftime("%H:%M"),
+        "capacity": slot.capacity,
+        "remaining": max(slot.capacity - slot.booked_count, 0),
+    }
+
+
+def etag_for(data):
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return '"%s"' % hashlib.md5(raw.encode()).hexdigest()
@@ -0,0 +1,36 @@
+from datetime import date
+
+from apps.accounts.models import Doctor
+from apps.jobs.queue import task
+
+from .day_schedules import refresh_day
+from .models import MedicalNote
+from .reports import get_or_render_report, report_appointments
+
+
+# =====================================================
+# BACKGROUND: PRE-RENDER MEDICAL REPORT
+# =====================================================
+@task("appointments.render_report", max_attempts=3, timeout=120)
+def render_report(appointment_id):
+    appointment = report_appointments().get(id=appointment_id)
+
+    try:
+        note = appointment.medical_note
+    except MedicalNote.DoesNotExist:
+        return  # notes deleted since the job was queued
+
+    get_or_render_report(appointment, note).close()
+
+
+# =====================================================
+# BACKGROUND: REBUILD A DOCTOR'S DAY (day_schedules.queue_refresh)
+# =====================================================
+@task("appointments.refresh_day_schedule", max_attempts=5, timeout=60)
+def refresh_day_schedule(day, doctor_id=None, doctor_user_id=None):
+    if doctor_id is None:
+        doctor_id = Doctor.objects.filter(user_id=doctor_user_id).values_list("id", flat=True).first()
+        if doctor_id is None:
+            return  # the doctor was deleted since the job was queued
+
+    refresh_day(doctor_id, date.fromisoformat(day))
@@ -1,3 +1,1007 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+from io import StringIO
+from datetime import date, datetime, time, timedelta
+from itertools import count, product
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from asgiref.sync import async_to_sync
+
+from apps.accounts.models import Doctor, Patient, Profile
+from apps.jobs.models import Job
+from apps.jobs.queue import claim_next, run_job
+
+from . import slot_index, slots
+from .benchmarks import SCENARIOS
+from .booking import BookingError, book_slot, change_status
+from .day_schedules import refresh_day
+from .events import subscribe, unsubscribe
+from .exports import HEADERS, async_batches, csv_lines, export_rows
+from .history import HISTORY_FILTERS, history_counts, patient_history
+from .models import Appointment, DoctorAvailability, DoctorDaySchedule, MedicalNote
+from .reports import (
+    NOTE_STYLE, TextBlock, batch_appointments, get_or_render_report, render_pool, render_report,
+    render_reports, report_appointments, report_key, report_name, report_storage,
+)
+from .schedules import create_recurring_slots
+from .signals import invalidate_booked_slot
+from .slots import MAX_WINDOW_DAYS
+
+_ids = count()
+
+
+# =====================================================
+# FIXTURES
+# =====================================================
+def make_doctor(**fields):
+    n = next(_ids)
+    user = User.objects.create_user(username=f"doctor{n}@x.com", email=f"doctor{n}@x.com", password="x")
+    Profile.objects.create(user=user, role="doctor")
+    return Doctor.objects.create(user=user, **{
+        "full_name": f"Doctor {n}", "phone": "9876543210", "specialization": "Cardiology",
+        "qualification": "MBBS", "experience_years": 5, "clinic_name": "Clinic",
+        "city": "Pune", "consultation_fee": 500, **fields,
+    })
+
+
+def make_patient(**fields):
+    n = next(_ids)
+    user = User.objects.create_user(username=f"patient{n}@x.com", email=f"patient{n}@x.com", password="x")
+    Profile.objects.create(user=user, role="patient")
+    return Patient.objects.create(user=user, **{
+        "full_name": f"Patient {n}", "phone": "9876543210", "gender": "Male",
+        "date_of_birth": date(1990, 1, 1), "city": "Pune", **fields,
+    })
+
+
+def make_slot(doctor, days=1, at=time(9), capacity=1, **fields):
+    return DoctorAvailability.objects.create(
+        doctor=doctor.user, date=date.today() + timedelta(days=days),
+        start_time=at, end_time=time(at.hour, 30), capacity=capacity, **fields,
+    )
+
+
+def run_jobs():
+    while (job := claim_next()) is not None:
+        run_job(job)
+        if job.status != "done":
+            raise AssertionError(job.last_error)
+
+
+# =====================================================
+# BOOKING
+# =====================================================
+class BookSlotTests(TestCase):
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+
+    def test_booking_claims_a_seat(self):
+        slot = make_slot(self.doctor, capacity=2)
+        appointment = book_slot(self.patient.id, slot.id)
+
+        slot.refresh_from_db()
+        self.assertEqual(slot.booked_count, 1)
+        self.assertEqual((appointment.doctor, appointment.appointment_date), (self.doctor, slot.date))
+
+    def test_full_slot_is_refused(self):
+        slot = make_slot(self.doctor, capacity=1)
+        book_slot(make_patient().id, slot.id)
+
+        with self.assertRaisesMessage(BookingError, "Slot is full"):
+            book_slot(self.patient.id, slot.id)
+
+    def test_second_booking_of_the_same_slot_is_refused_and_rolled_back(self):
+        slot = make_slot(self.doctor, capacity=3)
+        book_slot(self.patient.id, slot.id)
+
+        with self.assertRaisesMessage(BookingError, "You already booked this slot"):
+            book_slot(self.patient.id, slot.id)
+        slot.refresh_from_db()
+        self.assertEqual(slot.booked_count, 1)
+
+    def test_slot_can_be_booked_again_after_cancelling(self):
+        slot = make_slot(self.doctor, capacity=1)
+        change_status(book_slot(self.patient.id, slot.id), "cancelled_by_patient")
+
+        book_slot(self.patient.id, slot.id)
+        slot.refresh_from_db()
+        self.assertEqual(slot.booked_count, 1)
+        self.assertEqual(Appointment.objects.filter(availability=slot).count(), 2)
+
+    def test_other_integrity_errors_are_not_reported_as_double_bookings(self):
+        slot = make_slot(self.doctor, capacity=1)
+        with mock.patch.object(Appointment.objects, "create", side_effect=IntegrityError("fk")):
+            with self.assertRaisesMessage(IntegrityError, "fk"):
+                book_slot(self.patient.id, slot.id)
+        slot.refresh_from_db()
+        self.assertEqual(slot.booked_count, 0)
+
+    def test_undoing_a_cancellation_after_booking_again_is_refused(self):
+        slot = make_slot(self.doctor, capacity=2)
+        cancelled = change_status(book_slot(self.patient.id, slot.id), "cancelled_by_patient")
+        book_slot(self.patient.id, slot.id)
+
+        with self.assertRaisesMessage(BookingError, "The patient has booked this slot again"):
+            change_status(cancelled, "scheduled")
+        slot.refresh_from_db()
+        self.assertEqual((cancelled.status, slot.booked_count), ("cancelled_by_patient", 1))
+
+    def test_unknown_slot(self):
+        with self.assertRaises(DoctorAvailability.DoesNotExist):
+            book_slot(self.patient.id, 0)
+
+    def test_deleting_the_appointment_frees_the_seat(self):
+        slot = make_slot(self.doctor, capacity=1)
+        book_slot(self.patient.id, slot.id).delete()
+
+        slot.refresh_from_db()
+        self.assertEqual(slot.booked_count, 0)
+
+    def test_cancelling_frees_the_seat_once(self):
+        slot = make_slot(self.doctor, capacity=1)
+        appointment = book_slot(self.patient.id, slot.id)
+
+        change_status(appointment, "cancelled_by_patient")
+        change_status(appointment, "doctor_unavailable")
+        slot.refresh_from_db()
+        self.assertEqual(slot.booked_count, 0)
+
+        appointment.delete()
+        other = book_slot(make_patient().id, slot.id)
+        Appointment.objects.get(id=other.id).delete()
+        slot.refresh_from_db()
+        self.assertEqual(slot.booked_count, 0)
+
+    def test_undoing_a_cancellation_claims_the_seat_back(self):
+        slot = make_slot(self.doctor, capacity=1)
+        appointment = book_slot(self.patient.id, slot.id)
+        change_status(appointment, "cancelled_by_patient")
+
+        book_slot(make_patient().id, slot.id)
+        with self.assertRaisesMessage(BookingError, "Slot is full"):
+            change_status(appointment, "scheduled")
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.status, "cancelled_by_patient")
+
+    def test_patient_cancel_reopens_the_slot(self):
+        slot = make_slot(self.doctor, capacity=1)
+        appointment = book_slot(self.patient.id, slot.id)
+        self.client.force_login(self.patient.user)
+
+        def open_ids():
+            response = self.client.get(reverse("api_doctor_slots", args=[self.doctor.id]))
+            return [s["id"] for s in response.json()["results"]]
+
+        self.assertEqual(open_ids(), [])
+        self.client.get(reverse("patient_cancel_appointment", args=[appointment.id]))
+        self.assertEqual(open_ids(), [slot.id])
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    PATIENTS = 8
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("threads need a test database they can all connect to")
+
+    def test_last_seat_goes_to_exactly_one_patient(self):
+        doctor = make_doctor()
+        slot = make_slot(doctor, capacity=2)
+        book_slot(make_patient().id, slot.id)
+        patients = [make_patient() for _ in range(self.PATIENTS)]
+
+        barrier = threading.Barrier(self.PATIENTS)
+        outcomes = []
+
+        def book(patient):
+            try:
+                barrier.wait()
+                book_slot(patient.id, slot.id)
+                outcomes.append("booked")
+            except BookingError:
+                outcomes.append("full")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(patient,)) for patient in patients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        slot.refresh_from_db()
+        self.assertEqual(sorted(outcomes), ["booked"] + ["full"] * (self.PATIENTS - 1))
+        self.assertEqual(slot.booked_count, slot.capacity)
+        self.assertEqual(Appointment.objects.filter(availability=slot).count(), slot.capacity)
+
+
+# =====================================================
+# DOCTOR SEARCH
+# =====================================================
+class DoctorSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.substring = make_doctor(full_name="Meera Ashaan")
+        self.prefix = make_doctor(full_name="Asha Rao")
+        self.exact = make_doctor(full_name="Asha")
+        self.second_prefix = make_doctor(full_name="Asha Iyer", city="Delhi")
+        make_doctor(full_name="Rohan Das")
+
+    def search(self, **params):
+        response = self.client.get(reverse("api_search_doctors"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_best_matches_come_first(self):
+        results = self.search(name="asha")["results"]
+
+        # exact > prefix > substring, ties in id order
+        self.assertEqual(
+            [doctor["id"] for doctor in results],
+            [self.exact.id, self.prefix.id, self.second_prefix.id, self.substring.id],
+        )
+
+    def test_every_term_must_match(self):
+        results = self.search(name="asha", city="delhi")["results"]
+        self.assertEqual([doctor["id"] for doctor in results], [self.second_prefix.id])
+
+    def test_cursor_pages_through_every_match_once(self):
+        ids, cursor = [], None
+        while True:
+            page = self.search(name="asha", limit=1, **({"cursor": cursor} if cursor else {}))
+            ids += [doctor["id"] for doctor in page["results"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(ids, [doctor["id"] for doctor in self.search(name="asha")["results"]])
+
+    def test_bad_cursor(self):
+        response = self.client.get(reverse("api_search_doctors"), {"name": "asha", "cursor": "nope"})
+        self.assertEqual(response.status_code, 400)
+
+
+# =====================================================
+# QUERY BUDGETS
+# =====================================================
+@override_settings(QUERY_BUDGET_STRICT=True)
+class ViewQueryBudgetTests(TestCase):
+    """
+    Each request raises QueryBudgetExceeded if its view runs more
+    queries than its @query_budget allows.
+    """
+
+    def setUp(self):
+        cache.clear()
+        slot_index.clear()
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+        self.slot = make_slot(self.doctor, capacity=3)
+        self.appointment = book_slot(make_patient().id, self.slot.id)
+        MedicalNote.objects.create(appointment=self.appointment, notes="Rest", prescription="Water")
+        run_jobs()
+
+    def assertOk(self, response):
+        self.assertEqual(response.status_code, 200, response.content[:200])
+
+    def test_public_reads(self):
+        self.assertOk(self.client.get(reverse("api_search_doctors"), {"name": self.doctor.full_name}))
+        self.assertOk(self.client.get(reverse("api_doctor_slots", args=[self.doctor.id])))
+        self.assertOk(self.client.get(reverse("api_nearest_slots"), {"specialization": "Cardiology"}))
+
+    def test_booking(self):
+        self.client.force_login(self.patient.user)
+        response = self.client.post(
+            reverse("create_appointment_api"), {"availability_id": self.slot.id},
+            content_type="application/json",
+        )
+        self.assertOk(response)
+
+    def test_patient_pages(self):
+        self.client.force_login(self.patient.user)
+        self.assertOk(self.client.get(reverse("patient_appointment_status")))
+        self.assertOk(self.client.get(reverse("api_patient_appointments")))
+
+    def test_doctor_pages(self):
+        self.client.force_login(self.doctor.user)
+        self.assertOk(self.client.get(reverse("doctor_today_appointments")))
+        self.assertOk(self.client.get(reverse("doctor_availability_list")))
+
+
+# =====================================================
+# CACHE INVALIDATION
+# =====================================================
+class CacheInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        slot_index.clear()
+        self.doctor = make_doctor(full_name="Cached Doctor")
+        self.patient = make_patient()
+
+    def slot_ids(self):
+        response = self.client.get(reverse("api_doctor_slots", args=[self.doctor.id]))
+        return [slot["id"] for slot in response.json()["results"]]
+
+    def test_slot_page_follows_new_slots_and_bookings(self):
+        self.assertEqual(self.slot_ids(), [])
+        slot = make_slot(self.doctor, capacity=1)
+        self.assertEqual(self.slot_ids(), [slot.id])
+
+        book_slot(self.patient.id, slot.id)
+        self.assertEqual(self.slot_ids(), [])
+
+    def test_doctor_search_follows_doctor_changes(self):
+        def names():
+            response = self.client.get(reverse("api_search_doctors"), {"name": "Cached"})
+            return [doctor["name"] for doctor in response.json()["results"]]
+
+        self.assertEqual(names(), ["Cached Doctor"])
+        self.doctor.full_name = "Cached Renamed"
+        self.doctor.save()
+        self.assertEqual(names(), ["Cached Renamed"])
+
+    def test_doctor_search_keeps_the_original_profile_image(self):
+        self.doctor.profile_image = "image/upload/v1/doctors/cached.jpg"
+        self.doctor.save()
+
+        response = self.client.get(reverse("api_search_doctors"), {"name": "Cached"})
+        [doctor] = response.json()["results"]
+        self.assertTrue(doctor["profile_image"].endswith("/image/upload/v1/doctors/cached.jpg"))
+        self.assertIn("/c_fill,g_face,h_220,w_300/", doctor["profile_thumbnail"])
+
+    def test_booked_slot_invalidation_does_not_load_the_slot(self):
+        appointment = book_slot(self.patient.id, make_slot(self.doctor).id)
+        with self.assertNumQueries(0):
+            invalidate_booked_slot(Appointment, appointment, created=True)
+
+        reloaded = Appointment.objects.get(id=appointment.id)
+        with CaptureQueriesContext(connection) as queries:
+            reloaded.delete()
+        slot_reads = [q for q in queries if q["sql"].startswith('SELECT "appointments_doctoravailability"')]
+        # release_booked_slot's lookup is shared with the invalidation
+        self.assertEqual(len(slot_reads), 1)
+
+
+# =====================================================
+# PATIENT HISTORY
+# =====================================================
+class PatientHistoryTests(TestCase):
+    def setUp(self):
+        doctor = make_doctor()
+        self.patient = make_patient()
+
+        def book(days, hour, status="scheduled"):
+            appointment = book_slot(self.patient.id, make_slot(doctor, days=days, at=time(hour)).id)
+            if status != "scheduled":
+                change_status(appointment, status)
+            return appointment.id
+
+        self.upcoming = [book(1, 9), book(1, 10), book(3, 9)]
+        self.past = [book(-1, 11, "completed"), book(-1, 9), book(-5, 9, "completed")]
+        self.cancelled = [book(2, 9, "cancelled_by_patient"), book(-2, 9, "doctor_unavailable")]
+
+    def ids(self, history_filter, **kwargs):
+        page, next_cursor = patient_history(self.patient.id, history_filter, **kwargs)
+        return [appointment.id for appointment in page], next_cursor
+
+    def test_filters_split_the_history(self):
+        self.assertEqual(history_counts(self.patient.id), {"all": 8, "upcoming": 3, "past": 3, "cancelled": 2})
+
+        # upcoming soonest first, the rest most recent first
+        self.assertEqual(self.ids("upcoming"), (self.upcoming, None))
+        self.assertEqual(self.ids("past"), (self.past, None))
+        self.assertEqual(self.ids("cancelled"), (self.cancelled, None))
+        self.assertEqual(
+            sorted(self.ids("all")[0]), sorted(self.upcoming + self.past + self.cancelled)
+        )
+
+    def test_cursor_round_trip(self):
+        for history_filter in HISTORY_FILTERS:
+            expected, _ = self.ids(history_filter)
+            seen, cursor = [], None
+            while True:
+                page, cursor = self.ids(history_filter, cursor=cursor, limit=2)
+                seen += page
+                if cursor is None:
+                    break
+            self.assertEqual(seen, expected, history_filter)
+
+    def test_bad_filter_or_cursor(self):
+        with self.assertRaises(ValueError):
+            self.ids("deleted")
+        with self.assertRaises(ValueError):
+            self.ids("past", cursor="nope")
+
+
+# =====================================================
+# OPEN SLOTS API
+# =====================================================
+class DoctorSlotsApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        slot_index.clear()
+        self.addCleanup(slot_index.clear)
+        self.doctor = make_doctor()
+        self.open_slot = make_slot(self.doctor, at=time(9), capacity=3)
+        self.full_slot = make_slot(self.doctor, at=time(10), capacity=1)
+        book_slot(make_patient().id, self.open_slot.id)
+        book_slot(make_patient().id, self.full_slot.id)
+        self.url = reverse("api_doctor_slots", args=[self.doctor.id])
+
+    def remaining(self, **params):
+        response = self.client.get(self.url, params)
+        return {slot["id"]: slot["remaining"] for slot in response.json()["results"]}
+
+    def test_slots_report_remaining_capacity(self):
+        self.assertEqual(self.remaining(), {self.open_slot.id: 2})
+        self.assertEqual(self.remaining(include_full="1"), {self.open_slot.id: 2, self.full_slot.id: 0})
+
+    def test_unchanged_page_is_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        book_slot(make_patient().id, self.open_slot.id)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(self.remaining(), {self.open_slot.id: 1})
+
+    def test_unknown_doctor(self):
+        self.assertEqual(self.client.get(reverse("api_doctor_slots", args=[0])).status_code, 404)
+
+
+# =====================================================
+# APPOINTMENT EXPORT
+# =====================================================
+class ExportTests(TestCase):
+    ROWS = 7
+
+    def setUp(self):
+        doctor = make_doctor()
+        self.appointments = [
+            book_slot(make_patient().id, make_slot(doctor, days=0, at=time(8 + i)).id)
+            for i in range(self.ROWS)
+        ]
+        change_status(self.appointments[0], "cancelled_by_patient")
+        self.url = reverse("export_appointments")
+
+    def test_only_staff_can_export(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+        self.client.force_login(make_patient().user)
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_every_row_is_streamed(self):
+        self.client.force_login(User.objects.create_user(username="staff", password="x", is_staff=True))
+
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], HEADERS)
+        self.assertEqual([int(row[0]) for row in rows[1:]], [a.id for a in self.appointments])
+
+        response = self.client.get(self.url, {"format": "ndjson", "status": "scheduled"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["appointment_id"] for line in lines],
+                         [a.id for a in self.appointments[1:]])
+
+    def test_rows_are_read_in_chunks_without_losing_any(self):
+        rows = export_rows(date.today(), date.today(), chunk_size=2)
+        self.assertEqual([row[0] for row in rows], [a.id for a in self.appointments])
+
+        lines = csv_lines(export_rows(date.today(), date.today()))
+
+        async def collect():
+            return [batch async for batch in async_batches(lines, batch_size=3)]
+
+        batches = async_to_sync(collect)()
+        self.assertEqual(len(batches), 3)
+        self.assertEqual("".join(batches).count("\r\n"), self.ROWS + 1)
+
+
+# =====================================================
+# LIVE QUEUE EVENTS
+# =====================================================
+class AppointmentEventTests(TestCase):
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.appointment = book_slot(make_patient().id, make_slot(self.doctor).id)
+
+    def test_status_change_is_published_once_committed(self):
+        async def subscribed():
+            return subscribe(self.doctor.id)
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        subscription = loop.run_until_complete(subscribed())
+        self.addCleanup(unsubscribe, subscription)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            change_status(self.appointment, "checked_in")
+        self.assertIsNone(loop.run_until_complete(subscription.get(timeout=0.05)))
+
+        for callback in callbacks:
+            callback()
+        event = loop.run_until_complete(subscription.get(timeout=1))
+        self.assertEqual(event, {
+            "id": self.appointment.id, "date": str(self.appointment.appointment_date),
+            "status": "checked_in", "status_label": "Checked In", "deleted": False,
+        })
+
+    def test_rolled_back_change_is_not_published(self):
+        with mock.patch("apps.appointments.signals.publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        change_status(self.appointment, "in_progress")
+                        raise BookingError("changed our mind")
+                except BookingError:
+                    pass
+
+        publish.assert_not_called()
+
+
+# =====================================================
+# SLOT INDEX
+# =====================================================
+class SlotIndexParityTests(TestCase):
+    """
+    slot_index.doctor_slots() must page exactly like the ORM queries it
+    stands in for, cursors included.
+    """
+
+    def setUp(self):
+        slot_index.clear()
+        self.addCleanup(slot_index.clear)
+        self.doctor = make_doctor(specialization="Index Parity")
+        self.today = date.today()
+
+        rng = random.Random(1)
+        DoctorAvailability.objects.bulk_create([
+            DoctorAvailability(
+                doctor=self.doctor.user, date=self.today + timedelta(days=day),
+                start_time=time(hour, rng.choice((0, 30))), end_time=time(hour, 59),
+                capacity=2, booked_count=rng.choice((0, 1, 2)),
+            )
+            for day in range(-2, 20)
+            for hour in (8, 9, 9, 13, 17, 23)  # two slots may share a start
+        ])
+
+    def walk(self, page, **kwargs):
+        pages, cursor = [], None
+        while True:
+            records, cursor = page(cursor=cursor, **kwargs)
+            pages.append([
+                (r.id, r.date, r.start_time, r.end_time, r.capacity, r.booked_count)
+                for r in records
+            ])
+            if not cursor:
+                return pages
+
+    def test_pages_match_the_orm(self):
+        windows = [
+            (self.today, self.today + timedelta(days=30)),
+            (self.today - timedelta(days=5), self.today + timedelta(days=3)),
+            (self.today + timedelta(days=4), self.today + timedelta(days=4)),
+        ]
+        nine = datetime.combine(self.today, time(9))
+        for now in (datetime.now(), nine, nine.replace(microsecond=5)):
+            with mock.patch("apps.appointments.slots.datetime", wraps=datetime) as clock:
+                clock.now.return_value = now
+                for (start, end), include_full, limit in product(windows, (False, True), (1, 3, 20)):
+                    with self.subTest(now=now, start=start, end=end, include_full=include_full, limit=limit):
+                        expected = self.walk(
+                            lambda **kw: slots.doctor_slots(self.doctor.user_id, start, end, **kw),
+                            include_full=include_full, limit=limit,
+                        )
+                        actual = self.walk(
+                            lambda **kw: slot_index.doctor_slots(self.doctor.user_id, start, end, now=now, **kw),
+                            include_full=include_full, limit=limit,
+                        )
+                        self.assertEqual(actual, expected)
+
+                        if not include_full:
+                            nearest = self.walk(
+                                lambda **kw: slots.nearest_open_slots(start, end, specialization="Index Parity", **kw),
+                                limit=limit,
+                            )
+                            self.assertEqual(sum(actual, []), sum(nearest, []))
+
+    def test_bad_cursor(self):
+        with self.assertRaises(ValueError):
+            slot_index.doctor_slots(self.doctor.user_id, self.today, self.today, cursor="abc")
+
+    def test_recurring_slots_reach_a_loaded_index(self):
+        start = self.today + timedelta(days=40)
+        slot_index.doctor_index(self.doctor.user_id)
+
+        created, _ = create_recurring_slots(
+            self.doctor.user, start, weeks=1, weekdays=[start.weekday()],
+            start_time=time(10), end_time=time(11), slot_minutes=30, capacity=1,
+        )
+
+        records, _ = slot_index.doctor_slots(self.doctor.user_id, start, start)
+        self.assertEqual(created, 2)
+        self.assertEqual([r.start_time for r in records], [time(10), time(10, 30)])
+
+
+    def test_recurring_slots_skip_overlapping_ones(self):
+        start = self.today + timedelta(days=40)
+        DoctorAvailability.objects.create(
+            doctor=self.doctor.user, date=start, start_time=time(10, 15), end_time=time(10, 45),
+        )
+
+        created, skipped = create_recurring_slots(
+            self.doctor.user, start, weeks=2, weekdays=[start.weekday()],
+            start_time=time(10), end_time=time(11), slot_minutes=30, capacity=1,
+        )
+
+        self.assertEqual((created, skipped), (2, 2))
+        self.assertEqual(
+            list(DoctorAvailability.objects.filter(doctor=self.doctor.user, date__gte=start)
+                 .order_by("date", "start_time").values_list("date", "start_time")),
+            [(start, time(10, 15)), (start + timedelta(days=7), time(10)), (start + timedelta(days=7), time(10, 30))],
+        )
+
+
+class NearestSlotsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_slots_of_users_without_a_doctor_row_are_skipped(self):
+        doctor = make_doctor()
+        slot = make_slot(doctor)
+        orphan = User.objects.create_user(username="orphan@x.com", password="x")
+        DoctorAvailability.objects.create(
+            doctor=orphan, date=slot.date, start_time=time(8), end_time=time(8, 30),
+        )
+
+        response = self.client.get(reverse("api_nearest_slots"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(s["id"], s["doctor"]["id"]) for s in response.json()["results"]],
+            [(slot.id, doctor.id)],
+        )
+
+
+# =====================================================
+# DoctorDaySchedule UPKEEP
+# =====================================================
+class DayScheduleUpkeepTests(TestCase):
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+        self.slot = make_slot(self.doctor, capacity=2)
+        run_jobs()
+
+    def schedule(self, day=None):
+        return DoctorDaySchedule.objects.filter(doctor=self.doctor, date=day or self.slot.date).first()
+
+    def test_booking_queues_the_rebuild_instead_of_running_it(self):
+        book_slot(self.patient.id, self.slot.id)
+
+        self.assertEqual(self.schedule().appointments, [])
+        self.assertTrue(Job.objects.filter(name="appointments.refresh_day_schedule", status="pending").exists())
+
+        run_jobs()
+        schedule = self.schedule()
+        self.assertEqual([a["patient"]["full_name"] for a in schedule.appointments], [self.patient.full_name])
+        self.assertEqual((schedule.slots[0]["booked"], schedule.slots[0]["remaining"]), (1, 1))
+        self.assertEqual(schedule.status_counts["scheduled"], 1)
+
+    def test_status_and_patient_changes_are_picked_up(self):
+        appointment = book_slot(self.patient.id, self.slot.id)
+        appointment.status = "completed"
+        appointment.save()
+        self.patient.full_name = "Renamed Patient"
+        self.patient.save()
+        self.patient.user.email = "renamed@x.com"
+        self.patient.user.save()
+        run_jobs()
+
+        entry = self.schedule().appointments[0]
+        self.assertEqual(entry["status"], "completed")
+        self.assertEqual((entry["patient"]["full_name"], entry["patient"]["email"]), ("Renamed Patient", "renamed@x.com"))
+
+    def test_reschedule_refreshes_both_days(self):
+        appointment = book_slot(self.patient.id, self.slot.id)
+        run_jobs()
+        new_day = self.slot.date + timedelta(days=1)
+        appointment.appointment_date = new_day
+        appointment.save()
+        run_jobs()
+
+        self.assertEqual(self.schedule().appointments, [])
+        self.assertEqual(len(self.schedule(new_day).appointments), 1)
+
+    def test_recurring_slots_queue_a_rebuild_per_day(self):
+        start = self.slot.date + timedelta(days=7)
+        create_recurring_slots(
+            self.doctor.user, start, weeks=2, weekdays=[start.weekday()],
+            start_time=time(10), end_time=time(11), slot_minutes=30, capacity=1,
+        )
+
+        self.assertIsNone(self.schedule(start))
+        self.assertEqual(Job.objects.filter(name="appointments.refresh_day_schedule", status="pending").count(), 2)
+        run_jobs()
+        for day in (start, start + timedelta(days=7)):
+            self.assertEqual(len(self.schedule(day).slots), 2)
+
+    def test_failed_rebuild_fails_the_job(self):
+        with mock.patch("apps.appointments.day_schedules.build_day", side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                refresh_day(self.doctor.id, self.slot.date)
+
+    def test_emptied_day_is_deleted(self):
+        appointment = book_slot(self.patient.id, self.slot.id)
+        run_jobs()
+        appointment.delete()
+        self.slot.delete()
+        run_jobs()
+
+        self.assertIsNone(self.schedule())
+
+
+class DoctorOwnChangesTests(TestCase):
+    """
+    A doctor's own changes show on the page they are redirected to with
+    no worker running.
+    """
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.client.force_login(self.doctor.user)
+
+    def post(self, name, *args, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse(name, args=args), data)
+
+    def listed_slots(self):
+        response = self.client.get(reverse("doctor_availability_list"))
+        return [(slot["start_time"], slot["booked"]) for slot in response.context["slots"]]
+
+    def test_added_and_deleted_slots(self):
+        day = date.today() + timedelta(days=2)
+        self.post("doctor_set_availability", date=day, start_time="09:00", end_time="09:30", capacity=2)
+        self.assertEqual(self.listed_slots(), [(time(9), 0)])
+
+        slot = DoctorAvailability.objects.get(doctor=self.doctor.user)
+        self.post("delete_availability", slot.id)
+        self.assertEqual(self.listed_slots(), [])
+
+    def test_status_changes(self):
+        appointment = book_slot(make_patient().id, make_slot(self.doctor).id)
+        self.post("mark_present", appointment.id)
+
+        day = DoctorDaySchedule.objects.get(doctor=self.doctor, date=appointment.appointment_date)
+        self.assertEqual(day.appointments[0]["status"], "checked_in")
+
+        self.post("doctor_update_appointment", appointment.id, status="completed")
+        day.refresh_from_db()
+        self.assertEqual(day.status_counts["completed"], 1)
+
+
+class DoctorAppointmentsWindowTests(TestCase):
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.client.force_login(self.doctor.user)
+
+    def window(self, **params):
+        response = self.client.get(reverse("doctor_today_appointments"), {"window": "range", **params})
+        self.assertEqual(response.status_code, 200)
+        return response.context["window"], response.context["start"], response.context["end"]
+
+    def test_range_within_the_limit_is_used(self):
+        start = date.today()
+        end = start + timedelta(days=MAX_WINDOW_DAYS)
+        self.assertEqual(self.window(start=start.isoformat(), end=end.isoformat()), ("range", start, end))
+
+    @mock.patch("apps.appointments.views.DOCTOR_APPOINTMENTS_PAGE_SIZE", 2)
+    def test_bookings_are_listed_at_once_and_paged_by_cursor(self):
+        day = date.today() + timedelta(days=1)
+        booked = [
+            book_slot(make_patient().id, make_slot(self.doctor, at=time(hour)).id).id
+            for hour in (11, 9, 10)
+        ]
+        params = {"window": "range", "start": day.isoformat(), "end": day.isoformat()}
+
+        first = self.client.get(reverse("doctor_today_appointments"), params)
+        self.assertEqual(first.context["total_count"], 3)
+        second = self.client.get(
+            reverse("doctor_today_appointments") + first.context["next_url"]
+        )
+
+        listed = [appt.id for appt in first.context["appointments"]] + \
+            [appt.id for appt in second.context["appointments"]]
+        self.assertEqual(listed, [booked[1], booked[2], booked[0]])
+        self.assertIsNone(second.context["next_url"])
+
+    def test_oversized_or_malformed_range_falls_back_to_today(self):
+        today = date.today()
+        too_far = (today + timedelta(days=MAX_WINDOW_DAYS + 1)).isoformat()
+        for params in ({"start": today.isoformat(), "end": too_far}, {"start": "nope", "end": too_far}, {}):
+            self.assertEqual(self.window(**params), ("today", today, today))
+
+
+# =====================================================
+# STORED REPORTS
+# =====================================================
+@override_settings(REPORT_FILE_STORAGE="django.core.files.storage.InMemoryStorage")
+class ReportStorageTests(TestCase):
+    def setUp(self):
+        report_storage.cache_clear()
+        self.addCleanup(report_storage.cache_clear)
+        self.storage = report_storage()
+
+        appointment = book_slot(make_patient().id, make_slot(make_doctor()).id)
+        MedicalNote.objects.create(appointment=appointment, notes="Rest", prescription="Water")
+        self.appointment_id = appointment.id
+        self.appointment = self.reload()
+
+    def reload(self):
+        return Appointment.objects.select_related("doctor", "patient", "medical_note").get(id=self.appointment_id)
+
+    def stored(self):
+        return sorted(self.storage.listdir("reports")[1])
+
+    def render(self):
+        get_or_render_report(self.appointment, self.appointment.medical_note).close()
+
+    def test_report_is_stored_once_and_linked(self):
+        self.render()
+        self.render()
+
+        self.assertEqual(len(self.stored()), 1)
+        self.assertTrue(self.reload().report_pdf.endswith(self.stored()[0]))
+
+    def test_lost_race_leaves_no_renamed_copy(self):
+        name = report_name(report_key(self.appointment, self.appointment.medical_note))
+
+        def render_while_another_request_stores_it(appointment, note):
+            self.storage.save(name, ContentFile(b"%PDF theirs"))
+            return b"%PDF ours"
+
+        with mock.patch("apps.appointments.reports.render_report", render_while_another_request_stores_it):
+            self.render()
+
+        self.assertEqual(self.stored(), [name.split("/")[1]])
+        self.assertTrue(self.reload().report_pdf.endswith(name))
+
+    def test_edited_notes_replace_the_stored_report(self):
+        self.render()
+        first = self.stored()
+
+        note = self.appointment.medical_note
+        note.notes = "Rest for a week"
+        note.save()
+        self.appointment = self.reload()
+        self.render()
+
+        self.assertEqual(len(self.stored()), 1)
+        self.assertNotEqual(self.stored(), first)
+
+    def test_saving_notes_replaces_the_stored_report(self):
+        self.render()
+        first = self.reload().report_pdf
+
+        self.client.post(reverse("save_notes", args=[self.appointment_id]), {
+            "notes": "Rest for a week", "prescription": "Water", "follow_up": "",
+        })
+        run_jobs()
+
+        self.assertEqual(len(self.stored()), 1)
+        self.assertNotEqual(self.reload().report_pdf, first)
+        self.assertTrue(self.reload().report_pdf.endswith(self.stored()[0]))
+
+    def test_sweep_deletes_unreferenced_reports_only(self):
+        self.render()
+        linked = self.stored()
+        self.storage.save(f"reports/{'0' * 64}.pdf", ContentFile(b"%PDF"))
+
+        call_command("sweep_reports", older_than=0, stdout=StringIO())
+
+        self.assertEqual(self.stored(), linked)
+
+
+class BatchReportTests(TestCase):
+    def setUp(self):
+        self.doctor = make_doctor()
+        for hour in (9, 10, 11):
+            appointment = book_slot(make_patient().id, make_slot(self.doctor, days=0, at=time(hour)).id)
+            change_status(appointment, "completed")
+            MedicalNote.objects.create(appointment=appointment, notes=f"Seen at {hour}")
+        self.appointments = batch_appointments(self.doctor.id, date.today(), date.today())
+
+    @override_settings(REPORT_RENDER_WORKERS=2)
+    @mock.patch("apps.appointments.reports._pool", None)
+    def test_downloads_share_one_render_pool(self):
+        first = list(render_reports(self.appointments))
+        pool = render_pool()
+        self.addCleanup(pool.shutdown)
+        second = list(render_reports(self.appointments))
+
+        self.assertIs(render_pool(), pool)
+        for reports in (first, second):
+            self.assertEqual([appointment for appointment, _ in reports], self.appointments)
+            self.assertTrue(all(pdf.startswith(b"%PDF") for _, pdf in reports))
+
+    @override_settings(REPORT_RENDER_WORKERS=0)
+    def test_merged_pdf_takes_fewer_reports_than_the_zip(self):
+        self.client.force_login(self.doctor.user)
+        url = reverse("doctor_batch_reports")
+
+        with mock.patch("apps.appointments.views.MAX_MERGED_REPORTS", 2):
+            self.assertEqual(self.client.get(url, {"format": "pdf"}).status_code, 400)
+            response = self.client.get(url, {"format": "zip"})
+        self.assertEqual(response.status_code, 200)
+        b"".join(response.streaming_content)
+
+
+class ReportLayoutTests(TestCase):
+    def setUp(self):
+        appointment = book_slot(make_patient().id, make_slot(make_doctor()).id)
+        MedicalNote.objects.create(appointment=appointment, notes="Rest", prescription="Water")
+        self.appointment = report_appointments().get(id=appointment.id)
+        self.note = self.appointment.medical_note
+
+    def pages(self, notes):
+        self.note.notes = notes
+        return len(re.findall(rb"/Type /Page\b(?!s)", render_report(self.appointment, self.note)))
+
+    def test_long_notes_flow_onto_more_pages(self):
+        self.assertEqual(self.pages("Rest"), 1)
+
+        one_page_more = self.pages("Take the tablets after meals.\n" * 60)
+        self.assertGreater(one_page_more, 1)
+        self.assertGreater(self.pages("Take the tablets after meals.\n" * 200), one_page_more)
+
+    def test_text_block_splits_between_lines_without_losing_any(self):
+        text = "\n".join(f"line {i}" for i in range(100))
+        block = TextBlock(text, NOTE_STYLE)
+        block.wrap(400, 10_000)
+
+        first, rest = block.split(400, NOTE_STYLE.leading * 30 + 1)
+        self.assertEqual(len(first.lines), 30)
+        self.assertEqual(first.lines + rest.lines, [f"line {i}" for i in range(100)])
+        self.assertEqual(block.split(400, NOTE_STYLE.leading - 1), [])
+
+
+# =====================================================
+# BENCHMARK COMMAND
+# =====================================================
+# The production host list: the ASGI scenarios must not depend on the test
+# runner's extra "testserver"
+@override_settings(ALLOWED_HOSTS=["localhost"])
+class BenchmarkCommandTests(TestCase):
+    def test_tiny_run_writes_a_baseline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+            call_command(
+                "benchmark", doctors=3, patients=10, slots_per_doctor=8, appointments=20,
+                iterations=2, concurrency=2, save_baseline=path, stdout=StringIO(),
+            )
+            with open(path) as fh:
+                baseline = json.load(fh)
+
+        self.assertEqual(set(baseline["scenarios"]), set(SCENARIOS))
+        for name, row in baseline["scenarios"].items():
+            self.assertEqual(row["n"], 2, name)
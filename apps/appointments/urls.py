@@ -41,6 +41,20 @@ urlpatterns = [
         name="api_search_doctors"
     ),
 
+    # =============================
+    # DOCTOR SLOTS (API)
+    # =============================
+    path(
+        "api/doctors/<int:doctor_id>/slots/",
+        views.api_doctor_slots,
+        name="api_doctor_slots"
+    ),
+    path(
+        "api/slots/nearest/",
+        views.api_nearest_slots,
+        name="api_nearest_slots"
+    ),
+
  # =============================
     # BOOK APPOINTMENT
     # =============================
@@ -58,6 +72,11 @@ urlpatterns = [
         views.patient_appointments_status,
         name="patient_appointment_status"
     ),
+    path(
+        "api/patient/appointments/",
+        views.api_patient_appointments,
+        name="api_patient_appointments"
+    ),
     path(
         "patient/appointment/<int:appointment_id>/checkin/",
         views.patient_checkin_appointment,
@@ -82,6 +101,11 @@ urlpatterns = [
         views.doctor_today_appointments,
         name="doctor_today_appointments"
     ),
+    path(
+        "doctor/today/events/",
+        views.doctor_queue_events,
+        name="doctor_queue_events"
+    ),
     path(
         "doctor/appointment/<int:pk>/update/",
         views.doctor_update_appointment,
@@ -118,6 +142,11 @@ path(
 ),
 
    path("report/<int:appointment_id>/", views.generate_report, name="generate_report"),
+    path(
+        "doctor/reports/batch/",
+        views.doctor_batch_reports,
+        name="doctor_batch_reports"
+    ),
 
     # =====================================================
     # DOCTOR AVAILABILITY
@@ -132,6 +161,11 @@ path(
         views.doctor_set_availability,
         name="doctor_set_availability"
     ),
+    path(
+        "doctor/availability/recurring/",
+        views.doctor_set_recurring_availability,
+        name="doctor_set_recurring_availability"
+    ),
     path(
         "doctor/availability/delete/<int:pk>/",
         views.delete_availability,
@@ -148,4 +182,7 @@ path(
     ),
 
     path("doctors/", views.doctor_list_page, name="doctor_list_page"),
+
+    # APPOINTMENT EXPORT (STAFF)
+    path("export/appointments/", views.export_appointments, name="export_appointments"),
 ]
@@ -1,103 +1,105 @@
 
-from io import BytesIO
-from reportlab.lib.pagesizes import A4
-import cloudinary
-import cloudinary.uploader
-from django.http import HttpResponse, FileResponse
+from django.http import HttpResponse, FileResponse, Http404, StreamingHttpResponse
+import asyncio
 import json
-from datetime import date
+from datetime import date, timedelta
 from django.urls import reverse   
-from django.views.decorators.http import require_POST
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from django.contrib.auth.models import User
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.cache import get_conditional_response, patch_cache_control
+from asgiref.sync import sync_to_async
 
-from .forms import DoctorAvailabilityForm
+from .forms import DoctorAvailabilityForm, RecurringAvailabilityForm
 from .models import Doctor, Appointment, DoctorAvailability, MedicalNote
-from apps.accounts.models import Patient
-
-# DRF
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.response import Response
-from rest_framework import status
-
-@login_required
+from apps.accounts.identity import doctor_required, get_identity, patient_required
+from apps.accounts.middleware import query_budget
+from apps.jobs.queue import enqueue
+from config.db_router import use_replica
+from .async_db import async_require_GET, async_require_POST, run_db
+from .booking import book_slot, change_status, BookingError
+from .cache import cached, DOCTORS, slots_namespace
+from .day_schedules import day_slots, doctor_days, refresh_on_commit
+from .events import sse, subscribe, unsubscribe
+from .exports import FORMATS as EXPORT_FORMATS, async_batches, export_lines, parse_export_filters
+from .history import (
+    HISTORY_FILTERS, HISTORY_PAGE_SIZE, doctor_appointments, history_counts, history_to_dict,
+    patient_history, window_counts,
+)
+from .pagination import parse_limit
+from .reports import (
+    BATCH_FORMATS, MAX_BATCH_REPORTS, MAX_MERGED_REPORTS, batch_appointments,
+    get_or_render_report, merged_report, render_reports, report_appointments, report_key,
+    zip_reports,
+)
+from .schedules import create_recurring_slots
+from . import slot_index
+from .slots import (
+    MAX_WINDOW_DAYS, etag_for, nearest_open_slots, parse_date_range, parse_time, slot_to_dict,
+)
+from .search import doctor_listing, search_doctors, doctor_to_dict
+
+DOCTOR_APPOINTMENTS_PAGE_SIZE = 25
+
+@doctor_required
 def doctor_dashboard(request):
-    if not hasattr(request.user, "profile"):
-        return redirect("doctor_login")
-
-    if request.user.profile.role != "doctor":
-        return redirect("doctor_login")   # block patient
-
     return render(request, "appointments/doctor_dashboard.html")
 
 
-@login_required
+@patient_required
 def patient_dashboard(request):
-    if not hasattr(request.user, "profile"):
-        return redirect("patient_login")
-
-    if request.user.profile.role != "patient":
-        return redirect("patient_login")  # block doctor
-
     return render(request, "appointments/patient_dashboard.html")
 
 # =from django.shortcuts import get_object_or_404
 
 # =====================================================
-# API: SEARCH DOCTORS BY PROBLEM (SWAGGER)
+# API: SEARCH DOCTORS BY PROBLEM (ASYNC)
 # =====================================================
-from rest_framework.permissions import AllowAny, IsAuthenticated
-@api_view(['GET'])
-@permission_classes([AllowAny])
-def api_search_doctors(request):
-    name = request.GET.get("name", "").strip()
-    city = request.GET.get("city", "").strip()
-    specialization = request.GET.get("specialization", "").strip()
-
-    doctors = Doctor.objects.all()
-
-    if name:
-        doctors = doctors.filter(full_name__icontains=name)
-    if city:
-        doctors = doctors.filter(city__icontains=city)
-    if specialization:
-        doctors = doctors.filter(specialization__icontains=specialization)
-
-    data = []
-    for doc in doctors:
-        data.append({
-            "id": doc.id,
-            "name": doc.full_name,
-            "email": doc.user.email,
-            "phone": doc.phone,
-            "specialization": doc.specialization,
-            "qualification": doc.qualification,
-            "experience_years": doc.experience_years,
-            "clinic_name": doc.clinic_name,
-            "city": doc.city,
-            "consultation_fee": doc.consultation_fee,
-            "profile_image": doc.profile_image.url if doc.profile_image else None,
-        })
+# The API views below are async: under ASGI a request waiting on the
+# database parks a coroutine instead of a worker. ORM work goes through
+# run_db() (see async_db.py).
+@query_budget(3)
+@use_replica
+@async_require_GET
+async def api_search_doctors(request):
+    terms = {
+        "full_name": request.GET.get("name", "").strip(),
+        "city": request.GET.get("city", "").strip(),
+        "specialization": request.GET.get("specialization", "").strip(),
+    }
+
+    cursor = request.GET.get("cursor")
+    limit = parse_limit(request.GET.get("limit"))
+
+    def build():
+        doctors, next_cursor = search_doctors(terms, cursor=cursor, limit=limit)
+        return {
+            "results": [doctor_to_dict(doc) for doc in doctors],
+            "next_cursor": next_cursor,
+        }
+
+    try:
+        data = await run_db(cached, "doctor_search", [DOCTORS], (terms, cursor, limit), build)
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
 
-    return Response(data, status=status.HTTP_200_OK)
+    return JsonResponse(data)
 
 # =====================================================
-# API: CREATE APPOINTMENT (SWAGGER)
+# API: CREATE APPOINTMENT (ASYNC)
 # =====================================================
-from django.views.decorators.http import require_POST
-from django.urls import reverse
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
-from datetime import datetime
-import json
-@require_POST
-def create_appointment_api(request):
+# 7 for the booking + 1 to queue the rebuild of the doctor's day
+@query_budget(8)
+@async_require_POST
+async def create_appointment_api(request):
+    # Session and user are loaded off the event loop
+    identity = await run_db(get_identity, request)
 
     # 🔐 Not logged in
-    if not request.user.is_authenticated:
+    if identity is None:
         login_url = reverse("patient_login")
         next_url = request.headers.get("Referer", "/")
 
@@ -126,47 +128,20 @@ def create_appointment_api(request):
             status=400
         )
 
-    availability = get_object_or_404(
-        DoctorAvailability,
-        id=availability_id
-    )
-
-    patient = get_object_or_404(Patient, user=request.user)
-    doctor = get_object_or_404(Doctor, user=availability.doctor)
-
-    # 🔢 Count current bookings using availability FK
-    current_bookings = Appointment.objects.filter(
-        availability=availability
-    ).count()
-
-    # 🚫 Slot full check
-    if current_bookings >= availability.capacity:
-        return JsonResponse(
-            {"success": False, "error": "Slot is full"},
-            status=400
-        )
+    if not identity.is_patient:
+        raise Http404("No Patient matches the given query.")
 
-    # 🚫 Prevent same patient booking same slot
-    if Appointment.objects.filter(
-        patient=patient,
-        availability=availability
-    ).exists():
+    # ✅ Claim a seat and create the appointment in one transaction
+    try:
+        appointment = await run_db(book_slot, identity.patient_id, availability_id)
+    except (DoctorAvailability.DoesNotExist, Doctor.DoesNotExist):
+        raise Http404("No DoctorAvailability matches the given query.")
+    except BookingError as exc:
         return JsonResponse(
-            {"success": False, "error": "You already booked this slot"},
+            {"success": False, "error": str(exc)},
             status=400
         )
 
-    # ✅ Create appointment
-    appointment = Appointment.objects.create(
-        doctor=doctor,
-        patient=patient,
-        availability=availability,
-        appointment_date=availability.date,
-        start_time=availability.start_time,
-        end_time=availability.end_time,
-        status="scheduled"
-    )
-
     return JsonResponse({
         "success": True,
         "appointment_id": appointment.id
@@ -174,14 +149,12 @@ def create_appointment_api(request):
 # =====================================================
 # API: CHECK-IN APPOINTMENT (SWAGGER)
 # =====================================================
-@login_required
+@patient_required
 def patient_checkin_appointment(request, appointment_id):
-    patient = get_object_or_404(Patient, user=request.user)
-
     appointment = get_object_or_404(
         Appointment,
         id=appointment_id,
-        patient=patient
+        patient_id=request.identity.patient_id
     )
 
     if appointment.status == "scheduled":
@@ -195,19 +168,16 @@ def patient_checkin_appointment(request, appointment_id):
 # =====================================================
 # API: CANCEL APPOINTMENT (SWAGGER)
 # =====================================================
-@login_required
+@patient_required
 def patient_cancel_appointment(request, appointment_id):
-    patient = get_object_or_404(Patient, user=request.user)
-
     appointment = get_object_or_404(
         Appointment,
         id=appointment_id,
-        patient=patient
+        patient_id=request.identity.patient_id
     )
 
     if appointment.status not in ["completed", "cancelled_by_patient"]:
-        appointment.status = "cancelled_by_patient"
-        appointment.save()
+        change_status(appointment, "cancelled_by_patient")
 
     return redirect("patient_appointment_status")
 
@@ -217,30 +187,173 @@ def patient_cancel_appointment(request, appointment_id):
 # -----------------------------
 # Doctor Search Page (PUBLIC)
 # -----------------------------
+@use_replica
 def doctor_search_page(request):
     return render(request, "appointments/doctor_search.html")
 
 # -----------------------------
 # Book Appointment Page
 # -----------------------------
+@use_replica
 def book_appointment_page(request, doctor_id):
 
-    doctor = get_object_or_404(Doctor, id=doctor_id)
-
-    availability_slots = DoctorAvailability.objects.filter(
-        doctor=doctor.user,
-        date__gte=date.today()
-    ).order_by("date", "start_time")
+    doctor = cached(
+        "doctor_profile", [DOCTORS], (doctor_id,),
+        lambda: Doctor.objects.filter(id=doctor_id).first()
+    )
+    if doctor is None:
+        raise Http404("No Doctor matches the given query.")
 
+    # Open slots are loaded by the page from api_doctor_slots
     return render(
         request,
         "appointments/book_appointment.html",
-        {
-            "doctor": doctor,
-            "availability_slots": availability_slots
+        {"doctor": doctor}
+    )
+
+
+# =====================================================
+# API: OPEN SLOTS WITH REMAINING CAPACITY
+# =====================================================
+SLOT_CACHE_SECONDS = 15
+
+
+def _with_slot_cache_headers(response, etag):
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=SLOT_CACHE_SECONDS)
+    return response
+
+
+def _doctor_slot_page(doctor_id, start, end, cursor, limit, include_full):
+    """
+    (data, etag) for one page of a doctor's slots, None for an unknown
+    doctor. Raises ValueError for a bad cursor.
+    """
+    doctor = cached(
+        "doctor_profile", [DOCTORS], (doctor_id,),
+        lambda: Doctor.objects.filter(id=doctor_id).first()
+    )
+    if doctor is None:
+        return None
+
+    def build():
+        slots, next_cursor = slot_index.doctor_slots(
+            doctor.user_id, start, end,
+            cursor=cursor, limit=limit, include_full=include_full
+        )
+        data = {
+            "doctor_id": doctor.id,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "results": [slot_to_dict(slot) for slot in slots],
+            "next_cursor": next_cursor,
         }
+        return data, etag_for(data)
+
+    return cached(
+        "doctor_slot_page", [slots_namespace(doctor.user_id)],
+        (start, end, cursor, limit, include_full), build,
+        timeout=SLOT_CACHE_SECONDS
     )
 
+
+@query_budget(2)
+@async_require_GET
+async def api_doctor_slots(request, doctor_id):
+    """
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD&cursor=&limit=&include_full=1
+    """
+    try:
+        start, end = parse_date_range(request.GET.get("start"), request.GET.get("end"))
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    try:
+        page = await run_db(
+            _doctor_slot_page, doctor_id, start, end,
+            request.GET.get("cursor"),
+            parse_limit(request.GET.get("limit")),
+            request.GET.get("include_full") == "1",
+        )
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+    if page is None:
+        return JsonResponse({"error": "Doctor not found"}, status=404)
+    data, etag = page
+
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return _with_slot_cache_headers(not_modified, etag)
+
+    return _with_slot_cache_headers(JsonResponse(data), etag)
+
+
+# =====================================================
+# API: NEAREST OPEN SLOTS ACROSS DOCTORS
+# =====================================================
+def _nearest_slot_page(start, end, filters, cursor, limit):
+    """
+    (data, etag) for one page of nearest open slots. Raises ValueError
+    for a bad cursor.
+    """
+    def build():
+        slots, next_cursor = nearest_open_slots(
+            start, end, cursor=cursor, limit=limit, **filters
+        )
+        data = {
+            "results": [
+                {**slot_to_dict(slot), "doctor": doctor_to_dict(slot.doctor.doctor)}
+                for slot in slots
+            ],
+            "next_cursor": next_cursor,
+        }
+        return data, etag_for(data)
+
+    return cached(
+        "nearest_slots", [], (start, end, filters, cursor, limit), build,
+        timeout=SLOT_CACHE_SECONDS
+    )
+
+
+@query_budget(2)
+@async_require_GET
+async def api_nearest_slots(request):
+    """
+    ?specialization=&city=&start=YYYY-MM-DD&end=YYYY-MM-DD
+    &time_from=HH:MM&time_to=HH:MM&cursor=&limit=
+
+    Not tied to one doctor's slot namespace, so results may lag bookings
+    by up to SLOT_CACHE_SECONDS; create_appointment_api stays authoritative.
+    """
+    try:
+        start, end = parse_date_range(request.GET.get("start"), request.GET.get("end"))
+        time_from = parse_time(request.GET.get("time_from", "").strip())
+        time_to = parse_time(request.GET.get("time_to", "").strip())
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    filters = {
+        "specialization": request.GET.get("specialization", "").strip(),
+        "city": request.GET.get("city", "").strip(),
+        "time_from": time_from,
+        "time_to": time_to,
+    }
+    try:
+        data, etag = await run_db(
+            _nearest_slot_page, start, end, filters,
+            request.GET.get("cursor"),
+            parse_limit(request.GET.get("limit")),
+        )
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return _with_slot_cache_headers(not_modified, etag)
+
+    return _with_slot_cache_headers(JsonResponse(data), etag)
+
 # def doctor_search_page(request):
 #     return render(request, "appointments/doctor_search.html")
 
@@ -249,82 +362,261 @@ def book_appointment_page(request, doctor_id):
     # doctor who is being booked for is passed to the template, so that we can show doctor details and
     # also use doctor.id when creating appointment via API
 # ==============================
-@login_required
-def doctor_today_appointments(request):
-    if not hasattr(request.user, "profile") or request.user.profile.role != "doctor":
-        return redirect("doctor_login")
+def _date_window(request, today):
+    """
+    (start, end, window) for ?window=today|week|range&start=&end=.
+    Falls back to today when the range is missing, malformed or longer
+    than slots.MAX_WINDOW_DAYS: every day of the window is loaded and
+    paged in memory.
+    """
+    window = request.GET.get("window", "today")
+
+    if window == "week":
+        start = today - timedelta(days=today.weekday())
+        return start, start + timedelta(days=6), window
+
+    if window == "range" and request.GET.get("start") and request.GET.get("end"):
+        try:
+            start, end = parse_date_range(request.GET["start"], request.GET["end"], today)
+        except ValueError:
+            pass
+        else:
+            return start, end, window
 
+    return today, today, "today"
+
+
+@query_budget(4)
+@doctor_required
+def doctor_today_appointments(request):
     today = date.today()
+    start, end, window = _date_window(request, today)
+    doctor_id = request.identity.doctor_id
+
+    # Header counters: one aggregate query for every status
+    counts = window_counts(doctor_id, start, end)
+
+    try:
+        page, next_cursor = doctor_appointments(
+            doctor_id, start, end,
+            cursor=request.GET.get("cursor"),
+            limit=DOCTOR_APPOINTMENTS_PAGE_SIZE,
+        )
+    except ValueError:
+        return redirect("doctor_today_appointments")
 
-    appointments = Appointment.objects.filter(
-        doctor__user=request.user
-    ).select_related("patient", "patient__user").order_by("-appointment_date", "start_time")
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params["cursor"] = next_cursor
+        next_url = f"?{params.urlencode()}"
 
     return render(
         request,
         "appointments/doctor_today_appointments.html",
         {
-            "appointments": appointments,
-            "today": today
+            "appointments": page,
+            "today": today,
+            "window": window,
+            "start": start,
+            "end": end,
+            "max_range_days": MAX_WINDOW_DAYS,
+            "total_count": counts.pop("total"),
+            "status_counts": [
+                (label, counts[key]) for key, label in Appointment.STATUS_CHOICES
+            ],
+            "next_url": next_url,
+            "is_first_page": "cursor" not in request.GET,
         }
     )
-@login_required
-def doctor_update_appointment(request, pk):
-    # Doctor-only access
-    if not hasattr(request.user, "profile") or request.user.profile.role != "doctor":
-        return redirect("doctor_login")
 
+
+# =====================================================
+# LIVE QUEUE: SERVER-SENT EVENTS FOR TODAY'S APPOINTMENTS
+# =====================================================
+# Streams are closed after QUEUE_STREAM_SECONDS so a client that vanished
+# without the server noticing cannot hold a subscription forever; the
+# browser's EventSource reconnects and starts from a fresh snapshot.
+QUEUE_STREAM_SECONDS = 5 * 60
+QUEUE_HEARTBEAT_SECONDS = 15
+
+
+def _queue_doctor_id(request):
+    if not request.user.is_authenticated:
+        return None
+    identity = get_identity(request)
+    return identity.doctor_id if identity.is_doctor else None
+
+
+def _queue_snapshot(doctor_id, today):
+    labels = dict(Appointment.STATUS_CHOICES)
+    rows = Appointment.objects.filter(
+        doctor_id=doctor_id,
+        appointment_date=today
+    ).order_by("start_time", "id").values("id", "status")
+
+    return [
+        {"id": row["id"], "status": row["status"], "status_label": labels.get(row["status"])}
+        for row in rows
+    ]
+
+
+async def _queue_stream(subscription, today, snapshot):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + QUEUE_STREAM_SECONDS
+    today = today.isoformat()
+
+    try:
+        yield "retry: 3000\n\n"
+        yield sse("snapshot", snapshot)
+
+        while (remaining := deadline - loop.time()) > 0:
+            event = await subscription.get(min(QUEUE_HEARTBEAT_SECONDS, remaining))
+
+            if subscription.overflowed:
+                return  # reconnect resyncs from a new snapshot
+            if event is None:
+                yield ": ping\n\n"
+            elif event["date"] == today:
+                yield sse("status", event)
+    finally:
+        unsubscribe(subscription)
+
+
+async def doctor_queue_events(request):
+    doctor_id = await sync_to_async(_queue_doctor_id)(request)
+    if doctor_id is None:
+        return HttpResponse(status=403)
+
+    today = date.today()
+
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI a worker cannot be parked on a stream: answer with the
+        # snapshot and let EventSource poll via its reconnect interval
+        snapshot = await sync_to_async(_queue_snapshot)(doctor_id, today)
+        return HttpResponse(
+            "retry: 10000\n\n" + sse("snapshot", snapshot),
+            content_type="text/event-stream"
+        )
+
+    # Subscribe before reading the snapshot so no change falls in between
+    subscription = subscribe(doctor_id)
+    try:
+        snapshot = await sync_to_async(_queue_snapshot)(doctor_id, today)
+    except BaseException:
+        unsubscribe(subscription)
+        raise
+
+    response = StreamingHttpResponse(
+        _queue_stream(subscription, today, snapshot),
+        content_type="text/event-stream"
+    )
+    patch_cache_control(response, no_cache=True)
+    response["X-Accel-Buffering"] = "no"  # nginx: do not buffer the stream
+    return response
+
+
+@doctor_required
+def doctor_update_appointment(request, pk):
     appointment = get_object_or_404(
         Appointment,
         pk=pk,
-        doctor__user=request.user
+        doctor_id=request.identity.doctor_id
     )
 
     if request.method == "POST":
-        appointment.status = request.POST.get("status")
-        appointment.save()
+        try:
+            change_status(appointment, request.POST.get("status"))
+        except BookingError as exc:
+            return JsonResponse({"error": str(exc)}, status=400)
+        refresh_on_commit(appointment.doctor_id, appointment.appointment_date)
 
     return redirect("doctor_today_appointments")
 
-@login_required
+@doctor_required
 def doctor_delete_appointment(request, pk):
-    if not hasattr(request.user, "profile") or request.user.profile.role != "doctor":
-        return redirect("doctor_login")
-
     appointment = get_object_or_404(
         Appointment,
         pk=pk,
-        doctor__user=request.user
+        doctor_id=request.identity.doctor_id
     )
 
     appointment.delete()
+    refresh_on_commit(appointment.doctor_id, appointment.appointment_date)
     return redirect("doctor_today_appointments")
 
 # ==============================
 # patient_appointments_status
 # =============================
-@login_required
+@query_budget(4)
+@patient_required
 def patient_appointments_status(request):
-    if not hasattr(request.user, "profile") or request.user.profile.role != "patient":
-        return redirect("patient_login")
+    """
+    ?filter=all|upcoming|past|cancelled&cursor=<token>
+    """
+    history_filter = request.GET.get("filter", "all")
 
-    patient = get_object_or_404(Patient, user=request.user)
+    try:
+        page, next_cursor = patient_history(
+            request.identity.patient_id,
+            history_filter,
+            cursor=request.GET.get("cursor"),
+        )
+    except ValueError:
+        return redirect("patient_appointment_status")
 
-    appointments = Appointment.objects.filter(
-        patient=patient
-    ).select_related("doctor", "doctor__user").order_by("-appointment_date")
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params["cursor"] = next_cursor
+        next_url = f"?{params.urlencode()}"
 
     return render(
         request,
         "appointments/patient_appointment_status.html",
         {
-            "appointments": appointments
+            "appointments": page,
+            "filter": history_filter,
+            "counts": history_counts(request.identity.patient_id),
+            "filters": HISTORY_FILTERS,
+            "next_cursor": next_cursor,
+            "next_url": next_url,
         }
     )
+
+
+@query_budget(4)
+@patient_required
+@require_GET
+def api_patient_appointments(request):
+    """
+    ?filter=all|upcoming|past|cancelled&cursor=<token>&limit=n
+    Counts are sent with the first page only.
+    """
+    cursor = request.GET.get("cursor")
+
+    try:
+        page, next_cursor = patient_history(
+            request.identity.patient_id,
+            request.GET.get("filter", "all"),
+            cursor=cursor,
+            limit=parse_limit(request.GET.get("limit"), default=HISTORY_PAGE_SIZE),
+        )
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    data = {
+        "results": [history_to_dict(appointment) for appointment in page],
+        "next_cursor": next_cursor,
+    }
+    if not cursor:
+        data["counts"] = history_counts(request.identity.patient_id)
+
+    return JsonResponse(data)
 # ==============================
 # doctor availability management
 # ==============================
-@login_required
+@doctor_required
 def doctor_set_availability(request):
     if request.method == "POST":
         form = DoctorAvailabilityForm(request.POST)
@@ -332,6 +624,7 @@ def doctor_set_availability(request):
             availability = form.save(commit=False)
             availability.doctor = request.user
             availability.save()
+            refresh_on_commit(request.identity.doctor_id, availability.date)
             return redirect("doctor_availability_list")
     else:
         form = DoctorAvailabilityForm()
@@ -344,9 +637,29 @@ def doctor_set_availability(request):
     #============================================================
 
 
-@login_required
+@doctor_required
+def doctor_set_recurring_availability(request):
+    result = None
+
+    if request.method == "POST":
+        form = RecurringAvailabilityForm(request.POST)
+        if form.is_valid():
+            created, skipped = create_recurring_slots(request.user, **form.cleaned_data)
+            result = {"created": created, "skipped": skipped}
+    else:
+        form = RecurringAvailabilityForm(initial={"start_date": date.today()})
+
+    return render(request, "appointments/doctor_set_recurring_availability.html", {
+        "form": form,
+        "result": result,
+    })
+
+
+@query_budget(3)
+@doctor_required
 def doctor_availability_list(request):
-    slots = DoctorAvailability.objects.filter(doctor=request.user)
+    days = doctor_days(request.identity.doctor_id)
+    slots = day_slots(days)
     return render(
         request,
         "appointments/doctor_availability_list.html",
@@ -357,32 +670,31 @@ def doctor_availability_list(request):
 #=============================================================
 #DELETE AVAILABILITY
 #=============================================================
-@login_required
+@doctor_required
 def delete_availability(request, pk):
     slot = get_object_or_404(DoctorAvailability, pk=pk, doctor=request.user)
     slot.delete()
+    refresh_on_commit(request.identity.doctor_id, slot.date)
     return redirect("doctor_availability_list")
 
     #=============================================================
   
 
-@login_required
+@doctor_required
 def mark_present(request, id):
-    appointment = get_object_or_404(Appointment, id=id)
+    appointment = get_object_or_404(
+        Appointment,
+        id=id,
+        doctor_id=request.identity.doctor_id
+    )
 
     if request.method == "POST":
         appointment.status = "checked_in"
         appointment.save()
+        refresh_on_commit(appointment.doctor_id, appointment.appointment_date)
 
     return redirect("doctor_today_appointments")
 
-from django.views.decorators.csrf import csrf_exempt
-from django.conf import settings
-from reportlab.pdfgen import canvas
-import os
-
-from .models import Appointment, MedicalNote
-
 
 # -------------------
 # WRITE NOTES PAGE
@@ -397,6 +709,7 @@ def write_notes(request, appointment_id):
 # -------------------
 # SAVE NOTES (FETCH)
 # -------------------
+@query_budget(7)
 @csrf_exempt
 def save_notes(request, appointment_id):
     if request.method == "POST":
@@ -411,6 +724,11 @@ def save_notes(request, appointment_id):
             }
         )
 
+        # Render the report of the new notes in the job worker so the next
+        # view is served from storage. report_pdf keeps pointing at the old
+        # one until then; get_or_render_report() deletes it on replacing it
+        enqueue("appointments.render_report", {"appointment_id": appointment.pk})
+
         return JsonResponse({
             "status": "success",
             "message": "Notes saved successfully"
@@ -427,159 +745,107 @@ def save_notes(request, appointment_id):
 # views.py
 #==============================================================
 
-# ---------- helper functions ----------
-
-def draw_kv(c, x, y, label, value):
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(x, y, f"{label}:")
-    c.setFont("Helvetica", 11)
-    c.drawString(x + 120, y, str(value))
-
-
-def draw_section_title(c, x, y, title):
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(x, y, title)
-
-
-# ---------- main function ----------
-
+@query_budget(4)
 def generate_report(request, appointment_id):
-    appointment = get_object_or_404(Appointment, id=appointment_id)
+    appointment = get_object_or_404(report_appointments(), id=appointment_id)
 
     try:
         note = appointment.medical_note
     except MedicalNote.DoesNotExist:
         return HttpResponse("Medical note not found", status=404)
 
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    y = height - 50
-    line_gap = 18
-
-    # =====================
-    # HEADER
-    # =====================
-    c.setFont("Helvetica-Bold", 18)
-    c.drawCentredString(width / 2, y, "MEDICAL REPORT")
-    y -= 40
-
-    c.setFont("Helvetica", 11)
-    c.drawString(50, y, f"Appointment ID: {appointment.id}")
-    y -= line_gap
-    c.drawString(
-        50,
-        y,
-        f"Date: {appointment.appointment_date.strftime('%d %b %Y')}"
-    )
-    y -= line_gap
-    c.drawString(
-        50,
-        y,
-        f"Time: {appointment.start_time.strftime('%I:%M %p')} "
-        f"to {appointment.end_time.strftime('%I:%M %p')}"
-    )
+    # Same key → same bytes, so the key doubles as a strong ETag
+    key = report_key(appointment, note)
+    etag = f'"{key}"'
 
-    y -= 35
-
-    # =====================
-    # DOCTOR DETAILS (LEFT COLUMN)
-    # =====================
-    doctor = appointment.doctor
-    left_x = 50
-    right_x = 330
-
-    draw_section_title(c, left_x, y, "Doctor Details")
-    y_doctor = y - 25
-
-    draw_kv(c, left_x, y_doctor, "Name", f"Dr. {doctor.full_name}"); y_doctor -= line_gap
-    draw_kv(c, left_x, y_doctor, "Specialization", doctor.specialization); y_doctor -= line_gap
-    draw_kv(c, left_x, y_doctor, "Qualification", doctor.qualification); y_doctor -= line_gap
-    draw_kv(c, left_x, y_doctor, "Experience", f"{doctor.experience_years} years"); y_doctor -= line_gap
-    draw_kv(c, left_x, y_doctor, "Clinic", doctor.clinic_name); y_doctor -= line_gap
-    draw_kv(c, left_x, y_doctor, "City", doctor.city); y_doctor -= line_gap
-    draw_kv(c, left_x, y_doctor, "Contact", doctor.phone)
-
-    # =====================
-    # PATIENT DETAILS (RIGHT COLUMN)
-    # =====================
-    patient = appointment.patient
-    draw_section_title(c, right_x, y, "Patient Details")
-    y_patient = y - 25
-
-    draw_kv(c, right_x, y_patient, "Name", patient.full_name); y_patient -= line_gap
-    draw_kv(c, right_x, y_patient, "Gender", patient.gender); y_patient -= line_gap
-    draw_kv(c, right_x, y_patient, "Age", f"{patient.age} years"); y_patient -= line_gap
-    draw_kv(c, right_x, y_patient, "City", patient.city); y_patient -= line_gap
-    draw_kv(c, right_x, y_patient, "Contact", patient.phone)
-
-    # Move y below both columns
-    y = min(y_doctor, y_patient) - 30
-
-    # =====================
-    # MEDICAL NOTES
-    # =====================
-    draw_section_title(c, 50, y, "Medical Notes")
-    y -= 22
-    c.setFont("Helvetica", 11)
-    y = draw_paragraph(c, note.notes, 70, y, max_width=460)
-    y -= 25
-
-    # =====================
-    # PRESCRIPTION
-    # =====================
-    draw_section_title(c, 50, y, "Prescription")
-    y -= 22
-    y = draw_paragraph(c, note.prescription, 70, y, max_width=460)
-    y -= 25
-
-    # =====================
-    # FOLLOW UP
-    # =====================
-    draw_section_title(c, 50, y, "Follow Up")
-    y -= 22
-    y = draw_paragraph(c, note.follow_up, 70, y, max_width=460)
-
-    # =====================
-    # FOOTER
-    # =====================
-    c.setFont("Helvetica-Oblique", 9)
-    c.drawString(50, 40, "Generated by DocApp – Digital Medical Record")
-
-    c.showPage()
-    c.save()
-    buffer.seek(0)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    pdf = get_or_render_report(appointment, note, key=key)
+
+    response = FileResponse(pdf, content_type="application/pdf")
 
     if request.GET.get("download"):
-        response = FileResponse(buffer, content_type="application/pdf")
         response["Content-Disposition"] = (
             f'attachment; filename="medical_report_{appointment.id}.pdf"'
         )
-        return response
 
-    return FileResponse(buffer, content_type="application/pdf")
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# -------------------
+# BATCH REPORTS (ZIP / MERGED PDF)
+# -------------------
+@query_budget(4)
+@doctor_required
+@require_GET
+def doctor_batch_reports(request):
+    """
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD&status=a,b&format=zip|pdf
+    Every report of the doctor's appointments in the range (default:
+    today's completed ones).
+    """
+    fmt = request.GET.get("format", "zip")
+    if fmt not in BATCH_FORMATS:
+        return JsonResponse({"error": "format must be zip or pdf"}, status=400)
+
+    try:
+        filters = parse_export_filters(
+            request.GET.get("start"), request.GET.get("end"),
+            None, request.GET.get("status") or "completed",
+        )
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    appointments = batch_appointments(
+        request.identity.doctor_id, filters["start"], filters["end"], filters["statuses"]
+    )
+    if not appointments:
+        return JsonResponse({"error": "No medical reports in this range"}, status=404)
+    limit = MAX_MERGED_REPORTS if fmt == "pdf" else MAX_BATCH_REPORTS
+    if len(appointments) > limit:
+        return JsonResponse(
+            {"error": f"At most {limit} reports per {fmt} download; narrow the range"},
+            status=400
+        )
+
+    filename = f'medical_reports_{filters["start"]}_{filters["end"]}.{fmt}'
+
+    if fmt == "pdf":
+        response = HttpResponse(merged_report(appointments), content_type="application/pdf")
+    else:
+        chunks = zip_reports(render_reports(appointments))
+        if isinstance(request, ASGIRequest):
+            chunks = async_batches(chunks, batch_size=1)
+        response = StreamingHttpResponse(chunks, content_type="application/zip")
+
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    patch_cache_control(response, private=True, no_store=True)
+    return response
 
 
 #==============================================================
 #patient reschdule appointment
 #=============================================================
-@login_required
+@patient_required
 def patient_reschedule_appointment(request, appointment_id):
-    patient = get_object_or_404(Patient, user=request.user)
-
     appointment = get_object_or_404(
         Appointment,
         id=appointment_id,
-        patient=patient
+        patient_id=request.identity.patient_id
     )
 
     if request.method == "POST":
         appointment.appointment_date = request.POST.get("appointment_date")
         appointment.start_time = request.POST.get("start_time")
         appointment.end_time = request.POST.get("end_time")
-        appointment.status = "scheduled"
-        appointment.save()
+        try:
+            change_status(appointment, "scheduled")
+        except BookingError as exc:
+            return JsonResponse({"error": str(exc)}, status=400)
 
         return redirect("patient_appointment_status")
 
@@ -589,39 +855,49 @@ def patient_reschedule_appointment(request, appointment_id):
         {"appointment": appointment}
     )
 
-from reportlab.lib.units import inch
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import Paragraph
-from reportlab.lib.enums import TA_LEFT
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.lib.colors import black
-
-def draw_paragraph(canvas, text, x, y, max_width):
-    """
-    Draw wrapped text without black boxes
-    """
-    if not text:
-        return y
-
-    style = ParagraphStyle(
-        name="Normal",
-        fontName="Helvetica",
-        fontSize=12,
-        leading=16,
-        textColor=black,
-        alignment=TA_LEFT,
-    )
-
-    para = Paragraph(text.replace("\n", "<br/>"), style)
-    width, height = para.wrap(max_width, 1000)
-    para.drawOn(canvas, x, y - height)
-    return y - height - 10
-
 #=============================================================
 # DOCTOR LIST PAGE (HTML)
 #=============================================================
+@use_replica
 def doctor_list_page(request):
-    doctors = Doctor.objects.all().order_by('-id')  # latest first
+    doctors = cached(
+        "doctor_list", [DOCTORS], (),
+        lambda: list(doctor_listing())
+    )
     return render(request, 'appointments/doctor_list.html', {
         'doctors': doctors
-    })
\ No newline at end of file
+    })
+
+#=============================================================
+# APPOINTMENT EXPORT (STAFF, STREAMING CSV / NDJSON)
+#=============================================================
+@staff_member_required
+@require_GET
+def export_appointments(request):
+    """
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD&doctor=<id>&status=a,b&format=csv|ndjson
+    """
+    fmt = request.GET.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({"error": "format must be csv or ndjson"}, status=400)
+
+    try:
+        filters = parse_export_filters(
+            request.GET.get("start"), request.GET.get("end"),
+            request.GET.get("doctor"), request.GET.get("status"),
+        )
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    lines = export_lines(fmt, **filters)
+    if isinstance(request, ASGIRequest):
+        lines = async_batches(lines)
+
+    response = StreamingHttpResponse(
+        lines,
+        content_type="text/csv" if fmt == "csv" else "application/x-ndjson"
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="appointments_{filters["start"]}_{filters["end"]}.{fmt}"'
+    )
+    return response
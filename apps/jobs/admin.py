@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at', 'wait_ms', 'duration_ms')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created_at', 'locked_at', 'finished_at', 'wait_ms', 'duration_ms', 'last_error')
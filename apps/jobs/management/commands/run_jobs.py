@@ -0,0 +1,95 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Avg, Count, Max, Q
+from django.utils import timezone
+
+from apps.jobs.models import Job
+from apps.jobs.queue import claim_next, purge_finished, run_job
+
+# How often a long-running worker deletes old done jobs
+PURGE_EVERY = timedelta(hours=1)
+
+
+class Command(BaseCommand):
+    help = "Run the background job worker (or print per-task metrics with --stats)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Drain the due jobs and exit instead of polling.")
+        parser.add_argument("--sleep", type=float, default=1.0,
+                            help="Seconds to wait between polls of an idle queue.")
+        parser.add_argument("--max-jobs", type=int, default=0,
+                            help="Exit after this many jobs (0 = no limit).")
+        parser.add_argument("--stats", action="store_true",
+                            help="Print per-task counts and timings, then exit.")
+        parser.add_argument("--keep-days", type=float, default=7,
+                            help="Delete done jobs older than this many days (0 = keep them).")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            return self.print_stats()
+
+        processed = 0
+        next_purge = timezone.now()
+        self.stdout.write("Job worker started")
+
+        while True:
+            close_old_connections()
+            if options["keep_days"] and timezone.now() >= next_purge:
+                self.purge(options["keep_days"])
+                next_purge = timezone.now() + PURGE_EVERY
+
+            job = claim_next()
+
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+                continue
+
+            run_job(job)
+            processed += 1
+            self.stdout.write(
+                f"{job.name} #{job.id}: {job.status} "
+                f"(attempt {job.attempts}, waited {job.wait_ms:.0f} ms, "
+                f"ran {job.duration_ms:.1f} ms)"
+            )
+
+            if options["max_jobs"] and processed >= options["max_jobs"]:
+                break
+
+        self.stdout.write(f"Processed {processed} job(s)")
+
+    def purge(self, keep_days):
+        deleted = purge_finished(timezone.now() - timedelta(days=keep_days))
+        if deleted:
+            self.stdout.write(f"Deleted {deleted} done job(s) older than {keep_days:g} day(s)")
+
+    def print_stats(self):
+        rows = (
+            Job.objects
+            .values("name")
+            .annotate(
+                total=Count("id"),
+                pending=Count("id", filter=Q(status="pending")),
+                failed=Count("id", filter=Q(status="failed")),
+                avg_wait=Avg("wait_ms"),
+                avg_ms=Avg("duration_ms", filter=Q(status="done")),
+                max_ms=Max("duration_ms", filter=Q(status="done")),
+            )
+            .order_by("name")
+        )
+
+        self.stdout.write(
+            f"{'task':40} {'total':>7} {'pending':>8} {'failed':>7} "
+            f"{'avg wait':>10} {'avg run':>10} {'max run':>10}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['name']:40} {row['total']:>7} {row['pending']:>8} {row['failed']:>7} "
+                f"{row['avg_wait'] or 0:>8.1f}ms {row['avg_ms'] or 0:>8.1f}ms "
+                f"{row['max_ms'] or 0:>8.1f}ms"
+            )
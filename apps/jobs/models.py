@@ -0,0 +1,60 @@
+from django.db import models
+from django.utils import timezone
+
+
+#=================================
+# Background Job (DB-backed queue)
+#=================================
+class Job(models.Model):
+
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='pending'
+    )
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Timing of the latest attempt
+    wait_ms = models.FloatField(null=True, blank=True)
+    duration_ms = models.FloatField(null=True, blank=True)
+
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='jobs_job_due_idx'),
+            # claim_next: only the pending rows, in claim order, however
+            # many finished ones the table holds
+            models.Index(
+                fields=['run_at', 'id'],
+                condition=models.Q(status='pending'),
+                name='jobs_job_pending_idx',
+            ),
+            # purge_finished
+            models.Index(
+                fields=['finished_at'],
+                condition=models.Q(status='done'),
+                name='jobs_job_done_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
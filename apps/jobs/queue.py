@@ -0,0 +1,199 @@
+import logging
+import signal
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Retry n waits BACKOFF_BASE * 2 ** (n - 1) seconds, capped at BACKOFF_MAX
+BACKOFF_BASE = 10
+BACKOFF_MAX = 60 * 60
+
+# A job still "running" this long after being claimed is assumed to belong
+# to a dead worker and is handed out again, unless that was its last attempt.
+STALE_AFTER = timedelta(minutes=30)
+
+_registry = {}
+
+
+class JobTimeout(Exception):
+    pass
+
+
+# =====================================================
+# REGISTRATION / ENQUEUE
+# =====================================================
+def task(name, max_attempts=5, timeout=300):
+    """
+    Register a function as a job handler:
+
+        @task("appointments.render_report")
+        def render_report(appointment_id): ...
+
+    The job payload is passed to it as keyword arguments.
+    """
+    def decorator(func):
+        _registry[name] = {
+            "func": func,
+            "max_attempts": max_attempts,
+            "timeout": timeout,
+        }
+        return func
+
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0):
+    """
+    Queue a job. Runs inside the caller's transaction, so the job only
+    becomes visible to workers once the surrounding work commits.
+    """
+    handler = _registry.get(name, {})
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        max_attempts=handler.get("max_attempts", 5),
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+# =====================================================
+# WORKER SIDE
+# =====================================================
+def claim_next():
+    """
+    Lock and return the next due job, or None when the queue is idle.
+    SKIP LOCKED lets several workers poll the same table safely.
+    """
+    now = timezone.now()
+    stale = Q(status="running", locked_at__lt=now - STALE_AFTER)
+
+    with transaction.atomic():
+        # A killed worker never records its failure: a stale job whose
+        # last attempt was its final one fails instead of running again
+        Job.objects.filter(stale, attempts__gte=F("max_attempts")).update(
+            status="failed",
+            locked_at=None,
+            finished_at=now,
+            last_error=f"Worker stopped during the final attempt (no result after {STALE_AFTER})",
+        )
+
+        job = (
+            Job.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status="pending", run_at__lte=now)
+                | (stale & Q(attempts__lt=F("max_attempts")))
+            )
+            .order_by("run_at", "id")
+            .first()
+        )
+
+        if job is None:
+            return None
+
+        job.status = "running"
+        job.attempts += 1
+        job.locked_at = now
+        job.wait_ms = (now - job.run_at).total_seconds() * 1000
+        job.save(update_fields=["status", "attempts", "locked_at", "wait_ms"])
+
+    return job
+
+
+@contextmanager
+def _time_limit(seconds):
+    # SIGALRM only exists on Unix and only fires in the main thread
+    if not seconds or not hasattr(signal, "SIGALRM") \
+            or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def _raise(signum, frame):
+        raise JobTimeout(f"Job exceeded {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, _raise)
+    signal.alarm(seconds)
+    try:
+        yield
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def backoff(attempts):
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+def run_job(job):
+    """
+    Execute a claimed job and record its outcome and timing.
+    Failed attempts are rescheduled with exponential backoff until
+    max_attempts is reached.
+    """
+    handler = _registry.get(job.name)
+    started = time.perf_counter()
+
+    try:
+        if handler is None:
+            raise LookupError(f"No task registered as {job.name!r}")
+
+        with _time_limit(handler["timeout"]):
+            handler["func"](**job.payload)
+
+    except Exception:
+        job.duration_ms = (time.perf_counter() - started) * 1000
+        job.last_error = traceback.format_exc()
+        job.locked_at = None
+
+        if job.attempts >= job.max_attempts:
+            job.status = "failed"
+            job.finished_at = timezone.now()
+            logger.error("Job %s failed for good: %s", job, job.last_error)
+        else:
+            job.status = "pending"
+            job.run_at = timezone.now() + timedelta(seconds=backoff(job.attempts))
+            logger.warning("Job %s failed, retrying at %s", job, job.run_at)
+    else:
+        job.duration_ms = (time.perf_counter() - started) * 1000
+        job.status = "done"
+        job.finished_at = timezone.now()
+        job.last_error = ""
+        logger.info("Job %s done in %.1f ms", job, job.duration_ms)
+
+    job.save(update_fields=[
+        "status", "run_at", "locked_at", "finished_at", "duration_ms", "last_error",
+    ])
+    return job
+
+
+# =====================================================
+# RETENTION
+# =====================================================
+PURGE_BATCH = 1000
+
+
+def purge_finished(older_than):
+    """
+    Delete done jobs that finished before `older_than` (failed ones are
+    kept for inspection), PURGE_BATCH rows per statement so the table is
+    never locked for long. Returns the number deleted.
+    """
+    deleted = 0
+    while True:
+        ids = list(
+            Job.objects.filter(status="done", finished_at__lt=older_than)
+            .values_list("id", flat=True)[:PURGE_BATCH]
+        )
+        if not ids:
+            return deleted
+        deleted += Job.objects.filter(id__in=ids).delete()[0]
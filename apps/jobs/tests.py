@@ -0,0 +1,77 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Job
+from .queue import STALE_AFTER, claim_next, enqueue, purge_finished, run_job, task
+
+
+@task("jobs.tests.noop", max_attempts=2)
+def noop():
+    pass
+
+
+def stale_running(job, attempts):
+    Job.objects.filter(id=job.id).update(
+        status="running", attempts=attempts,
+        locked_at=timezone.now() - STALE_AFTER - timedelta(seconds=1),
+    )
+
+
+# =====================================================
+# CLAIMING
+# =====================================================
+class ClaimTests(TestCase):
+    def test_due_jobs_are_claimed_in_order(self):
+        first, second = enqueue("jobs.tests.noop"), enqueue("jobs.tests.noop")
+        enqueue("jobs.tests.noop", delay=60)
+
+        self.assertEqual([claim_next().id, claim_next().id, claim_next()], [first.id, second.id, None])
+
+    def test_stale_job_is_claimed_again_while_attempts_remain(self):
+        job = enqueue("jobs.tests.noop")
+        stale_running(job, attempts=1)
+
+        claimed = claim_next()
+        self.assertEqual((claimed.id, claimed.attempts), (job.id, 2))
+        self.assertEqual(run_job(claimed).status, "done")
+
+    def test_stale_job_on_its_last_attempt_fails(self):
+        job = enqueue("jobs.tests.noop")
+        stale_running(job, attempts=2)
+
+        self.assertIsNone(claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("final attempt", job.last_error)
+
+
+# =====================================================
+# RETENTION
+# =====================================================
+class PurgeTests(TestCase):
+    def finished(self, status, days_ago):
+        job = enqueue("jobs.tests.noop")
+        Job.objects.filter(id=job.id).update(
+            status=status, finished_at=timezone.now() - timedelta(days=days_ago)
+        )
+        return job.id
+
+    def test_only_old_done_jobs_are_deleted(self):
+        old_done = self.finished("done", 8)
+        kept = [self.finished("done", 1), self.finished("failed", 30), enqueue("jobs.tests.noop").id]
+
+        self.assertEqual(purge_finished(timezone.now() - timedelta(days=7)), 1)
+        self.assertFalse(Job.objects.filter(id=old_done).exists())
+        self.assertEqual(Job.objects.filter(id__in=kept).count(), 3)
+
+    def test_worker_purges_before_polling(self):
+        self.finished("done", 8)
+        out = StringIO()
+        call_command("run_jobs", once=True, stdout=out)
+
+        self.assertFalse(Job.objects.exists())
+        self.assertIn("Deleted 1 done job(s) older than 7 day(s)", out.getvalue())
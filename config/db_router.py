@@ -0,0 +1,123 @@
+"""
+Read-replica routing. Views decorated with @use_replica read the app
+models (doctors, slots, appointments) from settings.REPLICA_DATABASE;
+everything else, and every write, goes to the primary.
+
+Read-your-writes: ReplicaPinningMiddleware marks a response whose request
+wrote anything (a booking, a profile change, a login) with a short-lived
+cookie, and requests carrying it read from the primary until it expires
+(REPLICA_PIN_SECONDS, which should exceed the replica's lag).
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = "db_primary"
+
+# Sessions and users always come from the primary: a replica lagging
+# behind a login would make the user look logged out
+REPLICA_APPS = {"accounts", "appointments", "consultations"}
+
+
+class ReadState:
+    """
+    Per request: reads may use the replica, the client is pinned to the
+    primary, the request wrote something.
+    """
+
+    __slots__ = ("replica", "pinned", "wrote")
+
+    def __init__(self, pinned=False):
+        self.replica = False
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = ContextVar("db_read_state", default=None)
+
+
+def start_request(pinned):
+    state = ReadState(pinned)
+    return state, _state.set(state)
+
+
+def end_request(token):
+    _state.reset(token)
+
+
+def read_your_writes():
+    """
+    True while the current client has to see its own recent writes.
+    """
+    state = _state.get()
+    return state is not None and state.pinned
+
+
+@contextmanager
+def _replica_reads():
+    state = _state.get()
+    if state is None:
+        yield
+        return
+
+    previous, state.replica = state.replica, True
+    try:
+        yield
+    finally:
+        state.replica = previous
+
+
+def use_replica(view_func):
+    """
+    Serve the view's reads from the replica (sync or async views).
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def inner(request, *args, **kwargs):
+            with _replica_reads():
+                return await view_func(request, *args, **kwargs)
+    else:
+        @wraps(view_func)
+        def inner(request, *args, **kwargs):
+            with _replica_reads():
+                return view_func(request, *args, **kwargs)
+
+    return inner
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None or not state.replica or state.pinned
+            or not settings.REPLICA_DATABASE
+            or model._meta.app_label not in REPLICA_APPS
+            # inside a transaction, read what the transaction sees
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return None
+        return settings.REPLICA_DATABASE
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        # Explicit, or Django would write objects read from the replica
+        # back to the replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, settings.REPLICA_DATABASE}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == settings.REPLICA_DATABASE:
+            return False  # replicated from the primary
+        return None
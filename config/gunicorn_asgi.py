@@ -0,0 +1,22 @@
+"""
+Gunicorn settings for serving config.asgi with uvicorn workers:
+
+    gunicorn config.asgi:application -c config/gunicorn_asgi.py
+
+Each worker is one event loop; ORM work of the async views runs on
+ASYNC_DB_THREADS threads per worker, each with its own DB connection.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+# Read by config/settings.py when the workers import it. Keep
+# workers * ASYNC_DB_THREADS under the database's connection limit.
+os.environ.setdefault("ASYNC_DB_THREADS", "8")
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
@@ -0,0 +1,73 @@
+"""
+PostgreSQL backend that checks connections out of a psycopg_pool
+ConnectionPool instead of opening one per thread (Django 4.2 has no
+pooling of its own). Enabled with DB_POOL=true, see config/settings.py.
+"""
+
+import os
+import threading
+
+# One pool per database alias and process. Pools are opened lazily, so a
+# gunicorn worker never inherits its master's sockets.
+_pools = {}
+_lock = threading.Lock()
+
+
+def get_pool(alias, name, factory):
+    """
+    The pool for `alias`, built with factory() the first time it is needed
+    in this process (or after settings point the alias at another database,
+    as the test runner does).
+    """
+    key = (name, os.getpid())
+    entry = _pools.get(alias)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+
+    with _lock:
+        entry = _pools.get(alias)
+        if entry is None or entry[0] != key:
+            if entry is not None and entry[0][1] == os.getpid():
+                entry[1].close()
+            entry = _pools[alias] = (key, factory())
+        return entry[1]
+
+
+def _own_pools():
+    pid = os.getpid()
+    return [(alias, pool) for alias, ((_, owner), pool) in list(_pools.items()) if owner == pid]
+
+
+def close_pools():
+    with _lock:
+        for _, pool in _own_pools():
+            pool.close()
+        _pools.clear()
+
+
+def pool_stats():
+    """
+    {alias: stats} for the pools of this process: size, idle and waiting
+    connections plus counters since the pool opened (checkouts, waits,
+    wait time, timeouts, handshakes and their time, bad returns).
+    """
+    stats = {}
+    for alias, pool in _own_pools():
+        raw = pool.get_stats()
+        stats[alias] = {
+            "min_size": raw.get("pool_min", 0),
+            "max_size": raw.get("pool_max", 0),
+            "size": raw.get("pool_size", 0),
+            "idle": raw.get("pool_available", 0),
+            "waiting": raw.get("requests_waiting", 0),
+            "checkouts": raw.get("requests_num", 0),
+            "waits": raw.get("requests_queued", 0),
+            "wait_ms": raw.get("requests_wait_ms", 0),
+            "timeouts": raw.get("requests_errors", 0),
+            "handshakes": raw.get("connections_num", 0),
+            "handshake_ms": raw.get("connections_ms", 0),
+            "handshake_errors": raw.get("connections_errors", 0),
+            "lost": raw.get("connections_lost", 0),
+            "bad_returns": raw.get("returns_bad", 0),
+        }
+    return stats
@@ -0,0 +1,85 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base as postgresql
+from psycopg import IsolationLevel
+from psycopg_pool import ConnectionPool
+
+from . import get_pool
+
+# OPTIONS["pool"] keys and their defaults (seconds for the times)
+POOL_DEFAULTS = {
+    "min_size": 2,
+    "max_size": 10,
+    "timeout": 10.0,  # wait for a free connection before giving up
+    "max_idle": 300.0,  # close spare connections idle this long
+    "max_lifetime": 3600.0,  # recycle connections this old
+}
+
+
+class DatabaseWrapper(postgresql.DatabaseWrapper):
+    """
+    Checks a connection out of the alias' pool on connect and gives it back
+    on close. Use with CONN_MAX_AGE = 0: the connection then goes back at
+    the end of every request and stays open in the pool. With
+    CONN_HEALTH_CHECKS the pool checks each connection before handing it
+    out, so a dropped one is replaced instead of failing the request.
+    """
+
+    @property
+    def pooled(self):
+        # The no-db wrapper (CREATE/DROP DATABASE) connects directly
+        return self.alias != NO_DB_ALIAS
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict["NAME"], self._create_pool)
+
+    def _create_pool(self):
+        options = {**POOL_DEFAULTS, **self.settings_dict["OPTIONS"].get("pool", {})}
+        unknown = set(options) - set(POOL_DEFAULTS)
+        if unknown:
+            raise ImproperlyConfigured(f"Unknown pool options: {', '.join(sorted(unknown))}")
+
+        return ConnectionPool(
+            kwargs=self.get_connection_params(),
+            check=ConnectionPool.check_connection if self.settings_dict["CONN_HEALTH_CHECKS"] else None,
+            name=self.alias,
+            open=True,
+            **options,
+        )
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop("pool", None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        if not self.pooled:
+            return super().get_new_connection(conn_params)
+
+        level = self.settings_dict["OPTIONS"].get("isolation_level")
+        try:
+            self.isolation_level = IsolationLevel(level) if level is not None \
+                else IsolationLevel.READ_COMMITTED
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"Invalid transaction isolation level {level} specified. "
+                f"Use one of the psycopg.IsolationLevel values."
+            )
+
+        connection = self.pool.getconn()
+        if level is not None:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if not self.pooled:
+            return super()._close()
+
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # Django keeps the wrapper's reference until the atomic
+                # block exits, so the connection must not be reused: the
+                # pool discards closed connections.
+                self.connection.close()
+            self.pool.putconn(self.connection)
@@ -54,6 +54,7 @@ INSTALLED_APPS = [
     "apps.accounts",
     "apps.appointments",
     "apps.consultations",
+    "apps.jobs",
 ]
 
 # ==================================================
@@ -61,7 +62,9 @@ INSTALLED_APPS = [
 # ==================================================
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "apps.accounts.middleware.AsyncWhiteNoiseMiddleware",
+    "apps.accounts.middleware.QueryProfilingMiddleware",
+    "apps.accounts.middleware.ReplicaPinningMiddleware",
 
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -71,6 +74,15 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Server-Timing header with query/template/total time per response
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", str(DEBUG)).lower() == "true"
+# Raise instead of log when a view runs more queries than its @query_budget
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "").lower() == "true"
+
+# Threads (each with its own DB connection) for ORM work of async views;
+# 0 runs it on Django's single thread-sensitive thread. See config/gunicorn_asgi.py
+ASYNC_DB_THREADS = int(os.getenv("ASYNC_DB_THREADS", "0"))
+
 # ==================================================
 # URLS / WSGI
 # ==================================================
@@ -99,20 +111,85 @@ TEMPLATES = [
 # ==================================================
 # DATABASE
 # ==================================================
+# DB_POOL=true checks connections out of a per-process pool (needs
+# psycopg[pool]) and returns them after each request; each worker then
+# holds at most DB_POOL_MAX_SIZE connections, so keep
+# WEB_CONCURRENCY x DB_POOL_MAX_SIZE under the server's max_connections.
+DB_POOL = os.getenv("DB_POOL", "").lower() == "true"
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "config.pooled_postgresql" if DB_POOL else "django.db.backends.postgresql",
         "NAME": os.getenv("DB_NAME"),
         "USER": os.getenv("DB_USER"),
         "PASSWORD": os.getenv("DB_PASSWORD"),
         "HOST": os.getenv("DB_HOST"),
         "PORT": os.getenv("DB_PORT", "5432"),
-        "CONN_MAX_AGE": 60,
+        "CONN_MAX_AGE": 0 if DB_POOL else int(os.getenv("CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": os.getenv("CONN_HEALTH_CHECKS", "true").lower() == "true",
         "OPTIONS": {
             "sslmode": "require",
         },
     }
 }
+
+if DB_POOL:
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+        "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "3600")),
+    }
+
+# Optional read replica for the public read views (@use_replica, see
+# config/db_router.py). Unset DB_REPLICA_* values fall back to the primary's.
+if os.getenv("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.getenv("DB_REPLICA_NAME", DATABASES["default"]["NAME"]),
+        "USER": os.getenv("DB_REPLICA_USER", DATABASES["default"]["USER"]),
+        "PASSWORD": os.getenv("DB_REPLICA_PASSWORD", DATABASES["default"]["PASSWORD"]),
+        "HOST": os.getenv("DB_REPLICA_HOST"),
+        "PORT": os.getenv("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+
+REPLICA_DATABASE = "replica" if "replica" in DATABASES else None
+# How long a client reads from the primary after writing; keep it above
+# the replica's usual lag
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "10"))
+DATABASE_ROUTERS = ["config.db_router.ReplicaRouter"]
+
+# ==================================================
+# CACHE
+# ==================================================
+# Per-process memory by default. CACHE_URL switches to a shared backend:
+#   file:///var/tmp/docapp-cache   or   redis://host:6379/0 (needs `redis`)
+CACHE_URL = os.getenv("CACHE_URL", "")
+
+if CACHE_URL.startswith(("redis://", "rediss://")):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith("file://"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": CACHE_URL[len("file://"):],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "docapp",
+        }
+    }
+
 # ==================================================
 # PASSWORD VALIDATION
 # ==================================================
@@ -149,6 +226,10 @@ else:
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Uploads parked on local disk until the job worker (manage.py run_jobs)
+# pushes them to Cloudinary
+UPLOAD_STAGING_ROOT = MEDIA_ROOT / "staging"
+
 # ==================================================
 # DEFAULT PRIMARY KEY
 # ==================================================
@@ -178,7 +259,16 @@ if CLOUDINARY_URL:
     DEFAULT_FILE_STORAGE = (
         "cloudinary_storage.storage.MediaCloudinaryStorage"
     )
+    # Rendered medical report PDFs (apps.appointments.reports)
+    REPORT_FILE_STORAGE = (
+        "cloudinary_storage.storage.RawMediaCloudinaryStorage"
+    )
 else:
     DEFAULT_FILE_STORAGE = (
         "django.core.files.storage.FileSystemStorage"
     )
+    REPORT_FILE_STORAGE = DEFAULT_FILE_STORAGE
+
+# Size of each web process's pool rendering batch report downloads
+# (0: render in the web process)
+REPORT_RENDER_WORKERS = int(os.getenv("REPORT_RENDER_WORKERS", os.cpu_count() or 1))